@@ -0,0 +1,130 @@
+"""
+Micro-benchmarks of the CPU bound functions that slash commands and interactions go through, run with pytest-benchmark.
+
+    $ pytest benchmarks/bench_hot_paths.py --benchmark-autosave
+
+Each run is saved as json on .benchmarks. Compare a run against the last saved one, failing when the fastest round of
+any benchmark got slower by more than the threshold. Means of sub-microsecond functions are too noisy for it:
+
+    $ pytest benchmarks/bench_hot_paths.py --benchmark-compare --benchmark-compare-fail=min:20%
+
+Use --benchmark-json=results.json to write the results somewhere else, i.e as a build artifact.
+"""
+import datetime as dt
+import random
+import time
+
+import pytest
+
+from slacker.api.aws.aws import load_vms_info
+from slacker.api.feriados.utils import prettify_feriados
+from slacker.api.hoypido.utils import prettify_food_offers
+from slacker.api.rooms.api import RoomFinder, bsas, format_room_availability
+from slacker.api.subte.subte import prettify_updates
+from slacker.middleware import sign, verify_signature
+from slacker.models.poll import Poll, Option, Vote
+from slacker.utils import USER_REGEX
+
+SECRET = 'e3b0c44298fc1c149afbf4c8996fb924'
+BODY = ('token=gIkuvaNzQIHg97ATvDxqgjtO&team_id=T0001&team_domain=example&enterprise_id=E0001&'
+        'enterprise_name=Globular%20Construct%20Inc&channel_id=C2147483705&channel_name=test&user_id=U2147483697&'
+        'user_name=Steve&command=%2Fpoll&text=lunch%3F%20pizza%2C%20sushi%2C%20tacos&'
+        'response_url=https%3A%2F%2Fhooks.slack.com%2Fcommands%2F1234%2F5678&'
+        'trigger_id=13345224609.738474920.8088930838d88f008e0').encode()
+POLL = 'Where do we have lunch today? pizza place, sushi bar, tacos, the usual, salad, burgers'
+MENTIONS = ' '.join(f'<@U{n:08}|user.{n}>' for n in range(8))
+VMS = '\n'.join(f'vm{n} = i-0{n:016x}' for n in range(10))
+START = bsas.localize(dt.datetime(2019, 8, 19, 9))
+END = START.replace(hour=20)
+
+
+def freebusy():
+    """Freebusy answer for every room: half hour meetings on a third of the slots of the day, some outside of it"""
+    rnd = random.Random(0)
+    calendars = {}
+    for room in RoomFinder.ROOMS:
+        busy = []
+        for half_hour in range(0, 30):
+            if rnd.random() < 0.33:
+                start = START.replace(hour=7) + dt.timedelta(minutes=30 * half_hour)
+                end = start + dt.timedelta(minutes=30)
+                busy.append({'start': start.isoformat(), 'end': end.isoformat()})
+        calendars[room] = {'busy': busy}
+    return calendars
+
+
+FREEBUSY = freebusy()
+BUSIEST = max(FREEBUSY.values(), key=lambda calendar: len(calendar['busy']))['busy']
+
+
+def test_verify_signature(benchmark):
+    timestamp = int(time.time())
+    signature = sign(timestamp, BODY, SECRET)
+
+    assert benchmark(verify_signature, timestamp, BODY, signature, SECRET)
+
+
+def test_poll_from_string(benchmark, monkeypatch):
+    # Parsing only, the poll is not saved
+    monkeypatch.setattr(Poll, 'create', classmethod(lambda cls, **kwargs: cls(**kwargs)))
+
+    poll, error = benchmark(Poll.from_string, POLL)
+
+    assert error is None and len(poll.options) == 6
+
+
+def test_poll_str(benchmark):
+    options = [Option(number=n, text=text) for n, text in enumerate(['pizza', 'sushi', 'tacos', 'salad'], 1)]
+    for n in range(20):
+        options[n % 3].votes.append(Vote(user_id=f'U{n}'))
+    poll = Poll(question='Lunch', options=options)
+
+    assert benchmark(str, poll).startswith('*Lunch?*')
+
+
+def test_get_free_slots(benchmark):
+    free_slots, _ = benchmark(RoomFinder._get_free_slots, BUSIEST, START, END)
+
+    assert free_slots
+
+
+def test_get_rooms_free_slots(benchmark):
+    rooms = benchmark(RoomFinder.get_rooms_free_slots, FREEBUSY, START, END, skip_occupied_rooms=False)
+
+    assert len(rooms) == len(RoomFinder.ROOMS)
+
+
+def test_format_room_availability(benchmark):
+    rooms = RoomFinder.get_rooms_free_slots(FREEBUSY, START, END, skip_occupied_rooms=False)
+
+    assert benchmark(format_room_availability, rooms)
+
+
+def test_prettify_feriados(benchmark):
+    feriados = [{'motivo': f'Feriado {n}', 'tipo': 'inamovible', 'dia': n % 28 + 1, 'mes': n % 12 + 1, 'id': str(n)}
+                for n in range(19)]
+
+    assert benchmark(prettify_feriados, feriados).count('👉') == 19
+
+
+def test_prettify_food_offers(benchmark):
+    categories = ('pastas', 'tartas', 'especiales', 'ensaladas', 'carnes', 'milanesas', 'vegetarianos', 'pollo')
+    menu = {day: {category: [f'{category} {n}' for n in range(3)] for category in categories} for day in range(5)}
+
+    assert benchmark(prettify_food_offers, menu)
+
+
+def test_prettify_updates(benchmark):
+    updates = {linea: 'Servicio con demoras por obras en la estación. ' for linea in 'ABCDEH'}
+
+    assert benchmark(prettify_updates, updates).count('\n') == 5
+
+
+def test_load_vms_info(benchmark):
+    assert len(benchmark(load_vms_info, VMS)) == 10
+
+
+@pytest.mark.parametrize('text', [MENTIONS, 'no mentions at all, just a long retro item ' * 4],
+                         ids=['mentions', 'no mentions'])
+def test_user_regex(benchmark, text):
+    benchmark(lambda: [match.groupdict() for match in USER_REGEX.finditer(text)])
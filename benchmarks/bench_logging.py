@@ -0,0 +1,93 @@
+"""
+Compare requests per second with the enqueued, leveled log sink of slacker.logs against the old synchronous one.
+
+Before: every line down to debug is written on the request thread, and every request dumps its headers.
+After: debug is off in production, sampled when on, and lines are written by a background thread.
+
+Both are run against a fast sink (a file) and a slow one that takes --sink-delay seconds per line, like a blocked
+stderr pipe or a busy log shipper.
+
+Usage:
+    $ python -m benchmarks.bench_logging [--requests N] [--sink-delay SECONDS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from flask import request
+from loguru import logger
+
+from slacker import logs
+from slacker.app import create_app
+from slacker.database import db
+from slacker.middleware import SlackSignatureMiddleware
+from slacker.models import Sticker
+from slacker.tracing import add_request_id
+
+FORM = {'user_id': 'U1', 'channel_id': 'C1', 'text': 'ricardo'}
+ROUTES = ('/sticker/send', '/sticker/list')
+
+
+def legacy_logging(sink):
+    logger.configure(handlers=[{'sink': sink, 'format': logs.LOG_FORMAT}], patcher=add_request_id)
+
+
+def enqueued_logging(sink):
+    logs.configure(sink=sink)
+
+
+def slow_sink(delay):
+    def write(message):
+        time.sleep(delay)
+    return write
+
+
+def make_app(log_headers):
+    app = create_app()
+    if isinstance(app.wsgi_app, SlackSignatureMiddleware):
+        app.wsgi_app = app.wsgi_app.app
+    if log_headers:
+        app.before_request(lambda: logger.debug('Headers:\n{}', request.headers))
+
+    with app.app_context():
+        db.create_all()
+        if not Sticker.find(name='ricardo'):
+            db.session.add(Sticker(author='U1', name='ricardo', image_url='https://i.imgur.com/12345678.png'))
+            db.session.commit()
+    return app
+
+
+def requests_per_second(app, requests):
+    client = app.test_client()
+    start = time.perf_counter()
+    for i in range(requests):
+        client.post(ROUTES[i % len(ROUTES)], data=FORM)
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--sink-delay', type=float, default=0.0005)
+    args = parser.parse_args()
+
+    legacy_app, app = make_app(log_headers=True), make_app(log_headers=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        sinks = [
+            ('file', lambda: os.path.join(tmp, 'slacker.log')),
+            (f'slow sink ({args.sink_delay * 1000:g}ms)', lambda: slow_sink(args.sink_delay)),
+        ]
+        print(f'{"":<20} {"before":>12} {"after":>12}')
+        for name, sink in sinks:
+            legacy_logging(sink())
+            before = requests_per_second(legacy_app, args.requests)
+            enqueued_logging(sink())
+            after = requests_per_second(app, args.requests)
+            print(f'{name:<20} {before:>8.0f} r/s {after:>8.0f} r/s  x{after / before:.1f}')
+        logger.configure(handlers=[{'sink': sys.stderr}])  # Closes the log file
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Memory of each gunicorn worker with and without --preload: RSS, pages shared with other processes and unique pages.
+
+PSS splits shared pages among the processes that map them, so the PSS total is what the workers really cost.
+Linux only, it reads /proc/<pid>/smaps_rollup.
+
+Usage:
+    $ python -m benchmarks.bench_memory [--workers N] [--requests N]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from slacker.app_config import CUERVOT_SIGNATURE
+from slacker.middleware import sign
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(preload, workers, port):
+    env = dict(os.environ, PRELOAD=str(preload).lower(), WEB_CONCURRENCY=str(workers), PORT=str(port))
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'python:slacker.gunicorn_conf', 'slacker.app:create_app()']
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def worker_pids(master_pid):
+    pids = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                # pid (comm) state ppid ...
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(pid))
+    return sorted(pids)
+
+
+def wait_until_ready(server, port, workers, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('gunicorn exited. Run it by hand to see why')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+        except requests.RequestException:  # Listening, but workers are still booting
+            pass
+        else:
+            if len(worker_pids(server.pid)) == workers:
+                return
+        time.sleep(0.2)
+
+    raise TimeoutError('gunicorn workers did not start')
+
+
+def warm_up(port, count):
+    """Signed requests, so that workers run the views and not just the signature check"""
+    for i in range(count):
+        body = f'user_id=U{i}&text='.encode()
+        timestamp = int(time.time())
+        requests.post(f'http://127.0.0.1:{port}/help', data=body, timeout=5, headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-Slack-Signature': sign(timestamp, body, CUERVOT_SIGNATURE),
+            'X-Slack-Request-Timestamp': str(timestamp),
+        })
+
+
+def memory(pid):
+    """Memory of a process in MB, by smaps field"""
+    usage = dict.fromkeys(FIELDS, 0)
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            field, _, value = line.partition(':')
+            if field in usage:
+                usage[field] = int(value.split()[0]) / 1024
+    return usage
+
+
+def report(preload, workers, requests_count):
+    port = free_port()
+    server = start_server(preload, workers, port)
+    try:
+        wait_until_ready(server, port, workers)
+        warm_up(port, requests_count)
+        return [(pid, memory(pid)) for pid in worker_pids(server.pid)]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='Requests to warm up workers before measuring')
+    args = parser.parse_args()
+
+    print(f'{"mode":<10} {"worker":>8} {"rss":>9} {"pss":>9} {"shared":>9} {"unique":>9}')
+    for preload in (False, True):
+        mode = 'preload' if preload else 'no preload'
+        totals = dict.fromkeys(FIELDS, 0)
+        for pid, usage in report(preload, args.workers, args.requests):
+            shared = usage['Shared_Clean'] + usage['Shared_Dirty']
+            unique = usage['Private_Clean'] + usage['Private_Dirty']
+            print(f'{mode:<10} {pid:>8} {usage["Rss"]:>6.1f} MB {usage["Pss"]:>6.1f} MB '
+                  f'{shared:>6.1f} MB {unique:>6.1f} MB')
+            totals = {field: totals[field] + usage[field] for field in FIELDS}
+
+        shared = totals['Shared_Clean'] + totals['Shared_Dirty']
+        unique = totals['Private_Clean'] + totals['Private_Dirty']
+        print(f'{mode:<10} {"total":>8} {totals["Rss"]:>6.1f} MB {totals["Pss"]:>6.1f} MB '
+              f'{shared:>6.1f} MB {unique:>6.1f} MB\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Latency and queries of the model paths commands go through, as their tables grow.
+
+For each of --sizes, the database is seeded with that many rows per table by benchmarks/seed.py and every path is run
+--repeat times, or for --seconds, on random polls, users and teams:
+
+    user_has_voted      the check of every poll vote
+    Poll.__str__        poll text with its votes, built on every vote
+    show_items          /show_retro_items, the items of the running sprint of the user team
+    list_stickers       /show_stickers, every sticker
+    get_team_members    members of a team, on /team_members
+    get_or_create_user  lookup of the user of most retro commands
+
+Compare runs before and after an index or schema change, on the database the bot uses in production:
+
+    $ python -m benchmarks.bench_queries --database postgresql://slacker@localhost/slacker_bench --sizes 10000,1000000
+
+THE TABLES OF THE DATABASE ARE DROPPED AND CREATED AGAIN. By default it is a new sqlite file.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.loadtest import percentile
+from benchmarks.seed import counts, make_app, seed
+
+
+def paths(app, sizes):
+    """Name and a function that runs each path once, on random rows"""
+    from slacker.api.poll import user_has_voted
+    from slacker.database import db
+    from slacker.middleware import SlackSignatureMiddleware
+    from slacker.models.poll import Poll
+    from slacker.models.retro.crud import get_team_members
+    from slacker.models.user import get_or_create_user
+
+    if isinstance(app.wsgi_app, SlackSignatureMiddleware):
+        app.wsgi_app = app.wsgi_app.app
+    client = app.test_client()
+    voters = sizes['vote'] // sizes['poll'] + 1
+
+    def user():
+        return f"U{random.randrange(sizes['user'])}"
+
+    def poll_str():
+        poll = Poll.query.get(random.randint(1, sizes['poll']))
+        return str(poll)
+
+    def view(path):
+        def run():
+            response = client.post(path, data={'user_id': user(), 'channel_id': 'C1'})
+            assert response.status_code == 200, response.status_code
+        return run
+
+    return [
+        ('user_has_voted', lambda: user_has_voted(f'U{random.randrange(voters)}', random.randint(1, sizes['poll']))),
+        ('Poll.__str__', poll_str),
+        ('show_items', view('/retro/show_items')),
+        ('list_stickers', view('/sticker/list')),
+        ('get_team_members', lambda: get_team_members(random.randint(1, sizes['team']))),
+        ('get_or_create_user', lambda: get_or_create_user(None, user())),
+    ], db
+
+
+def measure(run, db, repeat, seconds):
+    """Seconds and queries of each run. Sessions are removed after each, so nothing is read from the identity map"""
+    from slacker.queries import track
+
+    latencies, queries = [], []
+    deadline = time.perf_counter() + seconds
+    while len(latencies) < repeat and (not latencies or time.perf_counter() < deadline):
+        with track() as stats:
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+        queries.append(stats.count)
+        db.session.remove()
+    return latencies, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='Url of the database. Its tables are dropped. Default: a new sqlite file')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma separated rows per table')
+    parser.add_argument('--repeat', type=int, default=200, help='Runs of each path')
+    parser.add_argument('--seconds', type=float, default=10, help='Stop running a path after this many seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(args.database or f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        with app.app_context():
+            results = []
+            for rows in map(int, args.sizes.split(',')):
+                print(f'Seeding {rows} rows per table..')
+                sizes = counts(rows)
+                functions, db = paths(app, sizes)
+                seed(db, rows, verbose=False)
+                for name, run in functions:
+                    latencies, queries = measure(run, db, args.repeat, args.seconds)
+                    results.append((rows, name, latencies, queries))
+
+            print(f'\n{"rows":>9} {"path":<20} {"runs":>6} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9} {"queries":>8}')
+            for rows, name, latencies, queries in results:
+                p50, p95, worst = (percentile(latencies, p) * 1000 for p in (50, 95, 100))
+                print(f'{rows:>9} {name:<20} {len(latencies):>6} {p50:>9.2f} {p95:>9.2f} {worst:>9.2f} '
+                      f'{sum(queries) / len(queries):>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Overhead of the rate limit check per request, against the redis of REDIS_URL.
+
+Usage:
+    $ python -m benchmarks.bench_ratelimit [--checks N] [--users N]
+"""
+import argparse
+import statistics
+import time
+
+from slacker.app_config import REDIS_URL
+from slacker.ratelimit import RateLimiter, Limit
+
+
+class Command:
+    name = '/bench_ratelimit'
+    limit = Limit(10 ** 6, 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=50, help='Windows the checks are spread over')
+    args = parser.parse_args()
+
+    limiter = RateLimiter()
+    config = {'REDIS_URL': REDIS_URL}
+    limiter.check(config, Command, 'U0', '')  # Load the script
+
+    latencies = []
+    for n in range(args.checks):
+        start = time.perf_counter()
+        limiter.check(config, Command, f'U{n % args.users}', '')
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(f'checks: {args.checks}  redis: {REDIS_URL}')
+    for name, value in (('mean', statistics.mean(latencies)), ('p50', latencies[len(latencies) // 2]),
+                        ('p99', latencies[int(len(latencies) * 0.99)])):
+        print(f'{name:<6} {value * 1000:>7.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
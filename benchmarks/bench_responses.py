@@ -0,0 +1,130 @@
+"""
+Compare responses built per second by the orjson templates against the old jsonify helpers.
+
+Poll and ping blocks are sent to celery, so they're measured up to the json of the task message.
+
+Usage:
+    $ python -m benchmarks.bench_responses [--responses N]
+"""
+import argparse
+import json
+import time
+
+from flask import jsonify
+
+from slacker.app import create_app
+from slacker.blueprints.commands import POLL, PING, poll_buttons
+from slacker.utils import command_response, ephemeral_reply, sticker_response, BOT_ICON, JSON_TYPE
+
+POLL_TEXT = '*lunch?*\n1. pizza\n2. sushi\n3. tacos'
+IMAGE = 'https://i.imgur.com/12345678.png'
+
+
+def legacy_command_response(text):
+    return jsonify({
+        'text': text,
+        "attachments": [{"footer": "Cuervot", "footer_icon": BOT_ICON, "ts": time.time()}]
+    }), 200, JSON_TYPE
+
+
+def legacy_ephemeral_reply(text):
+    return jsonify({'text': text, "response_type": 'ephemeral'}), 200, JSON_TYPE
+
+
+def legacy_sticker_response(sticker_name, sticker_image):
+    return jsonify({
+        "response_type": 'ephemeral',
+        "blocks": [
+            {
+                "type": "image",
+                "title": {"type": "plain_text", "text": sticker_name},
+                "image_url": sticker_image,
+                "alt_text": sticker_name
+            },
+            {
+                "type": "actions",
+                "block_id": "send_sticker_block_id",
+                "elements": [{
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": "Send!"},
+                    "value": sticker_image,
+                    "style": "primary",
+                    "action_id": f"send_sticker_action_id:{sticker_name}"
+                }]
+            }],
+    }), 200, JSON_TYPE
+
+
+def legacy_poll_blocks(text, poll_id, options):
+    return json.dumps([
+        {"type": "section", "text": {"type": "mrkdwn", "text": text}},
+        {'type': 'actions', 'block_id': f'{poll_id}', 'elements': [
+            {
+                "type": "button",
+                "text": {"type": "plain_text", "text": str(option_number)},
+                "value": f'{option_number}',
+                "action_id": f'poll_vote:{option_number}'
+            }
+            for option_number in range(1, options + 1)
+        ]}
+    ])
+
+
+def legacy_ping_blocks(name, user_id, defied_id, defied_name):
+    return json.dumps([
+        {"type": "section", "text": {"type": "mrkdwn", "text": f"Ping.. :table_tennis_paddle_and_ball: from `{name}`"}},
+        {
+            "type": "actions",
+            'block_id': f'ping_block:{user_id}:{defied_id}',
+            "elements": [
+                {"type": "button", "text": {"type": "plain_text", "text": "Pong"}, "style": "primary",
+                 "value": "YES", "action_id": f"{defied_name}"},
+                {"type": "button", "text": {"type": "plain_text", "text": "Not now"}, "style": "danger",
+                 "value": "NO"},
+            ]
+        }
+    ])
+
+
+def poll_blocks(text, poll_id, options):
+    return json.dumps(POLL.render(text=text, poll_id=str(poll_id), buttons=poll_buttons(options)).decode())
+
+
+def ping_blocks(name, user_id, defied_id, defied_name):
+    blocks = PING.render(text=f"Ping.. :table_tennis_paddle_and_ball: from `{name}`",
+                         block_id=f'ping_block:{user_id}:{defied_id}', action_id=defied_name)
+    return json.dumps(blocks.decode())
+
+
+CASES = [
+    ('command_response', legacy_command_response, command_response, ('Los subtes funcionan normalmente',)),
+    ('ephemeral_reply', legacy_ephemeral_reply, ephemeral_reply, ('Working on it..',)),
+    ('sticker_response', legacy_sticker_response, sticker_response, ('ricardo', IMAGE)),
+    ('poll blocks', legacy_poll_blocks, poll_blocks, (POLL_TEXT, 1234, 3)),
+    ('ping blocks', legacy_ping_blocks, ping_blocks, ('John', 'U1', 'U2', 'Carla')),
+]
+
+
+def per_second(build, args, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        build(*args)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--responses', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.test_request_context():
+        print(f'{"":<18} {"before":>12} {"after":>12}')
+        for name, legacy, current, build_args in CASES:
+            before = per_second(legacy, build_args, args.responses)
+            after = per_second(current, build_args, args.responses)
+            print(f'{name:<18} {before:>8.0f} r/s {after:>8.0f} r/s  x{after / before:.1f}')
+
+
+if __name__ == '__main__':
+    main()
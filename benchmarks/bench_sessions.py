@@ -0,0 +1,86 @@
+"""
+Latency of GETs to an external api through the pooled sessions of slacker/sessions.py, against requests.get, which
+opens a new connection on every call as the api clients used to.
+
+Each client makes --calls GETs, one after the other and then from --threads threads at once. By default they go to a
+local stand-in over plain http, so the difference is the TCP connect alone. Give an https --url to add the TLS
+handshake of the real apis, and mind their rate limits.
+
+Usage:
+    $ python -m benchmarks.bench_sessions [--calls 500] [--threads 8] [--latency 0.01]
+    $ python -m benchmarks.bench_sessions --url https://nolaborables.com.ar/api/v2/feriados/2020 --calls 50
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from benchmarks.loadtest import percentile
+from benchmarks.standins import JSONHandler, StandIn
+from slacker import sessions
+
+FERIADO = {'motivo': 'Año Nuevo', 'tipo': 'inamovible', 'dia': 1, 'mes': 1, 'id': 'año-nuevo'}
+
+
+class FeriadosHandler(JSONHandler):
+
+    def do_GET(self):
+        if self.server.standin.latency:
+            time.sleep(self.server.standin.latency)
+        self.send_json([FERIADO] * 20)
+
+
+class FeriadosStandIn(StandIn):
+    handler = FeriadosHandler
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0):
+        super().__init__(host, port)
+        self.latency = latency
+
+
+def run(get, url, calls, threads):
+    """Seconds each call took"""
+    def call(_):
+        start = time.perf_counter()
+        get(url, timeout=10).raise_for_status()
+        return time.perf_counter() - start
+
+    if threads == 1:
+        return [call(n) for n in range(calls)]
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Url to GET. Default: a local stand-in')
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8, help='Threads of the concurrent runs')
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds the stand-in takes to answer')
+    args = parser.parse_args()
+
+    standin = FeriadosStandIn(latency=args.latency).start() if args.url is None else None
+    url = args.url or f'{standin.url}api/v2/feriados/2020'
+    host = urlsplit(url).hostname
+    try:
+        print(f'{args.calls} GETs to {url}\n')
+        print(f'{"client":<14} {"threads":>7} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8} {"connections":>11}')
+        for threads in (1, args.threads):
+            pool = sessions.Sessions()
+            for name, get in (('requests.get', requests.get), ('sessions.get', pool.get)):
+                opened = sessions.connections_made[host]
+                latencies = run(get, url, args.calls, threads)
+                # requests.get opens and closes a connection per call
+                connections = args.calls if get is requests.get else sessions.connections_made[host] - opened
+                p50, p95, worst = (percentile(latencies, p) * 1000 for p in (50, 95, 100))
+                print(f'{name:<14} {threads:>7} {p50:>8.2f} {p95:>8.2f} {worst:>8.2f} {connections:>11}')
+            pool.close()
+    finally:
+        if standin:
+            standin.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare requests per second of the WSGI signature middleware against the old `before_request` check.
+
+Usage:
+    $ python -m benchmarks.bench_signature [--requests N]
+"""
+import argparse
+import hashlib
+import hmac
+import time
+
+from flask import request
+from loguru import logger
+
+from slacker.app import create_app
+from slacker.app_config import CUERVOT_SIGNATURE, OVIBOT_SIGNATURE
+from slacker.middleware import SlackSignatureMiddleware, sign
+
+BODY = b'token=abc&team_id=T1&channel_id=C1&user_id=U1&command=%2Fsubte&text=&trigger_id='
+FORGED = 'v0=' + '0' * 64
+
+
+def legacy_app():
+    """App that checks signatures like create_app did before the middleware"""
+    app = create_app()
+    if isinstance(app.wsgi_app, SlackSignatureMiddleware):
+        app.wsgi_app = app.wsgi_app.app
+
+    def verify_signature(timestamp, signature, signing_secret):
+        req = f'v0:{timestamp}:'.encode('utf-8') + request.get_data()
+        request_hash = 'v0=' + hmac.new(signing_secret.encode('utf-8'), req, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(request_hash, signature)
+
+    @app.before_request
+    def verify_request_signature():
+        logger.debug('Headers:\n{}', request.headers)
+        try:
+            request_hash = request.headers['X-Slack-Signature']
+            timestamp = request.headers['X-Slack-Request-Timestamp']
+        except KeyError:
+            return 'Missing required headers'
+
+        if abs(time.time() - int(timestamp)) > 60 * 2:
+            return 'Request too old'
+
+        secrets = (CUERVOT_SIGNATURE, OVIBOT_SIGNATURE)
+        if not any(verify_signature(timestamp, request_hash, secret) for secret in secrets):
+            return 'Failed request authenticity check. You are not slack..'
+
+    return app
+
+
+def middleware_app():
+    app = create_app()
+    if not isinstance(app.wsgi_app, SlackSignatureMiddleware):
+        app.wsgi_app = SlackSignatureMiddleware(app.wsgi_app, CUERVOT_SIGNATURE, [('/ovi', OVIBOT_SIGNATURE)])
+    return app
+
+
+def requests_per_second(app, requests, forged=False, replayed=False):
+    client = app.test_client()
+    timestamp = int(time.time())
+    start = time.perf_counter()
+    for i in range(requests):
+        # Slack requests are all different. Replays repeat the first one
+        body = BODY + str(0 if replayed else i).encode()
+        signature = FORGED if forged else sign(timestamp, body, CUERVOT_SIGNATURE)
+        client.post('/', data=body, content_type='application/x-www-form-urlencoded', headers={
+            'X-Slack-Signature': signature,
+            'X-Slack-Request-Timestamp': str(timestamp),
+        })
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    # Loguru formats debug messages only if a sink accepts them, as in a production debug run
+    logger.remove()
+    logger.add(lambda _: None, level='DEBUG')
+
+    scenarios = {
+        'valid': {},
+        'forged': {'forged': True},
+        'replayed': {'replayed': True},
+    }
+    print(f'{"signature":<12} {"before_request":>16} {"middleware":>16}')
+    for name, kwargs in scenarios.items():
+        legacy = requests_per_second(legacy_app(), args.requests, **kwargs)
+        middleware = requests_per_second(middleware_app(), args.requests, **kwargs)
+        print(f'{name:<12} {legacy:>12.0f} rps {middleware:>12.0f} rps')
+
+
+if __name__ == '__main__':
+    main()
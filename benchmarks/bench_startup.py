@@ -0,0 +1,77 @@
+"""
+Measure the cold start of a worker: `slacker.app` import time, `create_app()` time and the import cost of each package.
+
+Every run is a fresh interpreter, as a respawned worker is. Module costs need python 3.7+ (-X importtime).
+
+Usage:
+    $ python -m benchmarks.bench_startup [--runs N] [--top N] [--blueprints commands,stickers ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from slacker.app_config import ALL_BLUEPRINTS
+
+CHILD = '''
+import time
+start = time.perf_counter()
+from slacker.app import create_app
+imported = time.perf_counter()
+create_app()
+print(imported - start, time.perf_counter() - imported)
+'''
+
+
+def cold_start(blueprints):
+    """Start a worker with the given blueprints enabled.
+
+    Returns:
+        tuple[float, float, dict]: import seconds, create_app seconds and import seconds by top level package
+    """
+    command = [sys.executable, '-X', 'importtime', '-c', CHILD]
+    env = dict(os.environ, BLUEPRINTS=blueprints)
+    result = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    import_time, init_time = map(float, result.stdout.split()[-2:])
+    return import_time, init_time, package_costs(result.stderr)
+
+
+def package_costs(importtime_output):
+    """Add up the self time of the modules of each top level package"""
+    costs = defaultdict(float)
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        self_us, _, module = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():  # Skip the header
+            costs[module.strip().split('.')[0]] += int(self_us) / 10 ** 6
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Packages to show, by import cost')
+    parser.add_argument('--blueprints', action='append', help='Enabled blueprints. Can be repeated to compare')
+    args = parser.parse_args()
+
+    for blueprints in args.blueprints or [ALL_BLUEPRINTS, 'commands,stickers,interactivity']:
+        runs = [cold_start(blueprints) for _ in range(args.runs)]
+        import_time = statistics.median(run[0] for run in runs)
+        init_time = statistics.median(run[1] for run in runs)
+        print(f'\nBLUEPRINTS={blueprints}')
+        print(f'{"import slacker.app":<24} {import_time * 1000:>8.1f} ms')
+        print(f'{"create_app()":<24} {init_time * 1000:>8.1f} ms')
+
+        packages = {package for run in runs for package in run[2]}
+        costs = {package: statistics.median(run[2].get(package, 0) for run in runs) for package in packages}
+        for package, cost in sorted(costs.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'  {package:<22} {cost * 1000:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Throughput of the task queue worker against slack: messages per second and the latency from publishing a task to
+slack getting its message, for send_message, send_message_with_blocks and upload_file.
+
+Starts `celery -A tasks worker` on task_queue with its api calls going to the slack stand-in of benchmarks/standins.py,
+publishes --tasks tasks as slacker does and waits until the stand-in gets all of them. Each message carries the task
+number, so latency spans the broker, the wait for a free worker process and the slack call.
+
+The worker runs on its own processes, so the broker must be shared, redis as in docker-compose. Tasks that slack rate
+limits or fails raise on the worker and are counted as failed. Each of them also posts the error to the errors
+channel, which shows on the calls of chat.postEphemeral.
+
+Usage:
+    $ python -m benchmarks.bench_worker [--broker redis://] [--tasks 3000] [--concurrency 16] [--channels 50]
+    $ python -m benchmarks.bench_worker --latency 0.3 --error-rate 0.01 --rate-limits --tier-scale 10
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import celery
+
+from benchmarks.bench_memory import free_port
+from benchmarks.loadtest import percentile
+from benchmarks.standins import SlackStandIn
+
+TASK_QUEUE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'task_queue')
+TASKS = ('send_message', 'send_message_with_blocks', 'upload_file')
+MARK = re.compile(r'bench-(-?\d+)')
+MESSAGE_METHODS = ('chat.postMessage', 'files.upload')  # Not the error notifications, they quote the task args
+WARM_UP = -1
+
+
+def start_worker(broker, backend, concurrency, slack, directory):
+    env = dict(
+        os.environ,
+        SLACK_API_URL=slack.url,
+        CELERY_BROKER=broker,
+        CELERY_BACKEND=backend,
+        WORKER_METRICS_PORT=str(free_port()),
+        prometheus_multiproc_dir=os.path.join(directory, 'metrics'),
+    )
+    for name, value in (('BOT_TOKEN', 'xoxb-bench'), ('OVIBOT', 'xoxb-bench'), ('ERRORS_CHANNEL', 'C0ERRORS'),
+                        ('BOT_FATHER', 'U0ADMIN')):
+        env.setdefault(name, value)
+    # Given on the command line, as tasks.py and the celery command read the broker from different variables
+    command = [sys.executable, '-m', 'celery', '-A', 'tasks', '-b', broker, '--result-backend', backend, 'worker',
+               '--concurrency', str(concurrency), '--loglevel', 'error']
+    return subprocess.Popen(command, cwd=TASK_QUEUE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def publish(app, number, task, channel, image):
+    """Send a task like slacker does, with the task number on its message"""
+    text = f'bench-{number}'
+    if task == 'send_message':
+        args, kwargs = (channel,), {'text': text}
+    elif task == 'send_message_with_blocks':
+        blocks = [{'type': 'section', 'text': {'type': 'mrkdwn', 'text': text}}]
+        args, kwargs = (json.dumps(blocks), channel), {}
+    else:
+        args, kwargs = (image, channel, 'office.png', text), {}
+    app.send_task(f'tasks.{task}', args=args, kwargs=kwargs, headers={'published_at': time.time()})
+
+
+def answers(slack):
+    """Time, status and ok of the call that carried each task number"""
+    calls = {}
+    for at, method, args, status, ok in list(slack.log):
+        match = MARK.search(json.dumps(args)) if method in MESSAGE_METHODS else None
+        if match:
+            calls.setdefault(int(match.group(1)), (at, status, ok))
+    return calls
+
+
+def wait_for(slack, numbers, server, timeout):
+    """Wait until slack got a call for each task number, or it got none in `timeout` seconds"""
+    seen, last_change = 0, time.time()
+    while True:
+        calls = answers(slack)
+        done = sum(number in calls for number in numbers)
+        if done == len(numbers):
+            return calls
+        if server.poll() is not None:
+            raise RuntimeError('The worker exited. Run it by hand to see why')
+        if done != seen:
+            seen, last_change = done, time.time()
+        elif time.time() - last_change > timeout:
+            return calls
+        time.sleep(0.2)
+
+
+def report(tasks, published, calls, start):
+    print(f'{"task":<26} {"tasks":>6} {"sent":>6} {"429":>6} {"failed":>6} {"msg/s":>7} '
+          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    by_task = defaultdict(list)
+    for number, task in enumerate(tasks):
+        by_task[task].append(number)
+
+    for task, numbers in sorted(by_task.items()) + [('total', list(range(len(tasks))))]:
+        answered = [(number, calls[number]) for number in numbers if number in calls]
+        sent = [(number, at) for number, (at, status, ok) in answered if ok]
+        limited = sum(status == 429 for _, (_, status, _) in answered)
+        failed = len(numbers) - len(sent)
+        latencies = [at - published[number] for number, at in sent] or [0]
+        elapsed = max((at for _, at in sent), default=start) - start
+        p50, p95, p99, worst = (percentile(latencies, p) * 1000 for p in (50, 95, 99, 100))
+        print(f'{task:<26} {len(numbers):>6} {len(sent):>6} {limited:>6} {failed:>6} '
+              f'{len(sent) / elapsed if elapsed else 0:>7.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {worst:>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--broker', default=os.getenv('CELERY_BROKER', 'redis://'))
+    parser.add_argument('--backend', default=os.getenv('CELERY_BACKEND', 'redis://'), help='Result backend')
+    parser.add_argument('--tasks', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=16, help='Worker processes')
+    parser.add_argument('--channels', type=int, default=50, help='Channels the messages are spread on')
+    parser.add_argument('--latency', type=float, default=0.1, help='Mean seconds slack takes to answer')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of slack calls that fail')
+    parser.add_argument('--rate-limits', action='store_true', help='Answer 429 over the tier limits of slack')
+    parser.add_argument('--tier-scale', type=float, default=1, help='Multiplies the calls allowed by each tier')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for slack to get more messages')
+    args = parser.parse_args()
+
+    app = celery.Celery('bench_worker', broker=args.broker)
+    slack = SlackStandIn(latency=args.latency, error_rate=args.error_rate, rate_limits=args.rate_limits,
+                         tier_scale=args.tier_scale, record=True)
+    with tempfile.TemporaryDirectory() as directory, slack:
+        image = os.path.join(directory, 'office.png')
+        with open(image, 'wb') as f:
+            f.write(os.urandom(50 * 1024))
+
+        app.control.purge()  # Tasks left by a previous run
+        worker = start_worker(args.broker, args.backend, args.concurrency, slack, directory)
+        try:
+            publish(app, WARM_UP, 'send_message', 'C0WARMUP', image)
+            wait_for(slack, [WARM_UP], worker, timeout=60)
+            slack.log.clear()
+            slack.calls.clear()
+
+            tasks = [TASKS[number % len(TASKS)] for number in range(args.tasks)]
+            published = {}
+            start = time.time()
+            for number, task in enumerate(tasks):
+                published[number] = time.time()
+                publish(app, number, task, f'C{random.randrange(args.channels):04}', image)
+            print(f'Published {args.tasks} tasks in {time.time() - start:.1f}s\n')
+
+            calls = wait_for(slack, range(args.tasks), worker, args.timeout)
+            report(tasks, published, calls, start)
+            print('\nSlack api calls:', dict(sorted(slack.calls.items())))
+        finally:
+            worker.terminate()
+            worker.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+Load test of the bot server: throughput and latency percentiles of each command, at increasing concurrency.
+
+Starts gunicorn with the bot against a seeded database, with Slack and Google calendar replaced by the local stand-ins
+of benchmarks/standins.py, and sends it signed slash commands and poll vote clicks like Slack does, from --concurrency
+threads at a time for --duration seconds each. Commands run inline (DEFERRED_COMMANDS=false) and the tasks they send go
+to an in memory broker, so what is measured is the bot server and its database.
+
+The database is a new sqlite file by default. Its writes are serialized, so use --database with a postgres url to load
+test the writes of polls, votes and retro items at high concurrency. It is created and seeded, not emptied.
+
+Usage:
+    $ python -m benchmarks.loadtest [--concurrency 1,8,32] [--duration SECONDS] [--mix poll=1,vote=4,..]
+    $ python -m benchmarks.loadtest --url http://127.0.0.1:3000/ --database postgresql://..  # A running server
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlencode
+
+import requests
+
+from benchmarks.standins import CalendarStandIn, SlackStandIn
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEAM_ID = 'T0LOADTEST'
+STICKERS = 20
+POLL_OPTIONS = ('pizza', 'sushi', 'tacos', 'salad')
+MIX = 'poll=1,send_sticker=3,vote=4,add_item=1,find_free_rooms=1'
+
+
+class Scenario:
+    """Builds the signed requests of a command"""
+
+    def __init__(self, users, polls, secret):
+        self.users = users
+        self.polls = polls
+        self.secret = secret
+
+    def user(self):
+        return f'U{random.randrange(self.users)}'
+
+    def slash_command(self, command, text):
+        return {
+            'token': 'load-test',
+            'team_id': TEAM_ID,
+            'team_domain': 'loadtest',
+            'channel_id': 'C0LOADTEST',
+            'channel_name': 'load-test',
+            'user_id': self.user(),
+            'user_name': 'load.test',
+            'command': command,
+            'text': text,
+            'response_url': 'https://hooks.slack.com/commands/T0LOADTEST/1/load-test',
+            'trigger_id': uuid.uuid4().hex,  # Bodies must differ, the replay cache rejects repeated signatures
+        }
+
+    def block_action(self, action, block_id, value):
+        user = self.user()
+        payload = {
+            'type': 'block_actions',
+            'team': {'id': TEAM_ID, 'domain': 'loadtest'},
+            'user': {'id': user, 'username': user.lower(), 'team_id': TEAM_ID},
+            'channel': {'id': 'C0LOADTEST', 'name': 'load-test'},
+            'trigger_id': uuid.uuid4().hex,
+            'response_url': 'https://hooks.slack.com/actions/T0LOADTEST/1/load-test',
+            'message': {
+                'type': 'message',
+                'ts': f'{time.time():.6f}',
+                'blocks': [{'type': 'section', 'block_id': 'poll', 'text': {'type': 'mrkdwn', 'text': ''}}],
+            },
+            'actions': [{'type': 'button', 'action_id': f'{action}:{value}', 'block_id': block_id, 'value': value,
+                         'action_ts': f'{time.time():.6f}'}],
+        }
+        return {'payload': json.dumps(payload)}
+
+    def signed(self, form):
+        from slacker.middleware import sign
+
+        body = urlencode(form).encode()
+        timestamp = int(time.time())
+        return body, {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-Slack-Request-Timestamp': str(timestamp),
+            'X-Slack-Signature': sign(timestamp, body, self.secret),
+        }
+
+    def request(self, name):
+        """Path, body and headers of a request of the named scenario"""
+        if name == 'poll':
+            path, form = 'poll', self.slash_command('/poll', f'Lunch {uuid.uuid4().hex[:6]}? {", ".join(POLL_OPTIONS)}')
+        elif name == 'send_sticker':
+            path, form = 'sticker/send', self.slash_command('/send_sticker', f'sticker{random.randrange(STICKERS)}')
+        elif name == 'vote':
+            poll, option = random.randint(1, self.polls), random.randint(1, len(POLL_OPTIONS))
+            path, form = 'interactive/message_actions', self.block_action('poll_vote', str(poll), str(option))
+        elif name == 'add_item':
+            path, form = 'retro/add_item', self.slash_command('/add_retro_item', 'We need better estimations')
+        elif name == 'find_free_rooms':
+            path, form = 'rooms/find_free_rooms', self.slash_command('/find_free_rooms', '--all')
+        else:
+            raise ValueError(f'Unknown scenario {name}')
+        return (path, *self.signed(form))
+
+
+def seed(database_url, users, polls):
+    """Team with all the load test users on a running sprint, stickers and polls"""
+    from slacker.app import create_app
+    from slacker.database import db
+    from slacker.models import Sticker
+    from slacker.models.poll import Poll, Option
+    from slacker.models.retro import Sprint, Team
+    from slacker.models.user import User
+
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    with app.app_context():
+        db.create_all()
+        if Team.query.filter_by(name='load-test').one_or_none():
+            return
+
+        team = Team(name='load-test')
+        team.members = [User(user_id=f'U{n}', first_name='User', last_name=f'U{n}', real_name=f'User U{n}')
+                        for n in range(users)]
+        db.session.add(team)
+        db.session.add(Sprint(name='load test', team=team, running=True))
+        db.session.add_all(Sticker(author='U0', name=f'sticker{n}', image_url=f'https://i.imgur.com/{n:08}.png')
+                           for n in range(STICKERS))
+        db.session.add_all(Poll(id=n, question=f'Lunch {n}?', author='U0',
+                                options=[Option(number=i, text=text) for i, text in enumerate(POLL_OPTIONS, 1)])
+                           for n in range(1, polls + 1))
+        db.session.commit()
+
+
+def save_credentials(database_url):
+    """Calendar credentials that never expire, on the db the bot reads them from"""
+    from google.oauth2.credentials import Credentials
+    from slacker.api.rooms.login import ApiLogin
+    from slacker.app import create_app
+
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    with app.app_context():
+        ApiLogin.save_credentials(Credentials(token='load-test'))
+
+
+def start_server(args, directory, slack, calendar):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.getenv('PYTHONPATH')])),
+        PORT=str(args.port),
+        WEB_CONCURRENCY=str(args.workers),
+        THREADS=str(args.threads),
+        FLASK_ENV='production',
+        DATABASE_URL=args.database,
+        DEFERRED_COMMANDS='false',
+        REDIS_URL='',  # No rate limits
+        CELERY_BROKER='memory://',
+        CELERY_BACKEND='cache+memory://',
+        SLACK_API_URL=slack.url,
+        GOOGLE_DISCOVERY_URL=calendar.discovery_url,
+        LOG_LEVEL='WARNING',
+        prometheus_multiproc_dir=os.path.join(directory, 'metrics'),
+    )
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'python:slacker.gunicorn_conf', 'slacker.app:create_app()']
+    return subprocess.Popen(command, cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url, server=None, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError('gunicorn exited. Run it by hand to see why')
+        try:
+            if requests.get(f'{url}healthz', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+
+    raise TimeoutError('The bot server did not start')
+
+
+def parse_mix(text):
+    mix = {}
+    for pair in text.split(','):
+        name, _, weight = pair.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def is_error(response):
+    if response.status_code != 200:
+        return True
+    try:
+        return 'error' in response.json()
+    except ValueError:
+        return False  # Plain text replies
+
+
+def run(url, scenario, mix, concurrency, duration):
+    """Latencies in seconds and error count of each scenario"""
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            path, body, headers = scenario.request(name)
+            start = time.perf_counter()
+            try:
+                failed = is_error(session.post(url + path, data=body, headers=headers, timeout=30))
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[name].append(elapsed)
+                errors[name] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def report(concurrency, duration, latencies, errors):
+    for name, values in sorted(latencies.items()):
+        p50, p95, p99 = (percentile(values, p) * 1000 for p in (50, 95, 99))
+        print(f'{concurrency:>5} {name:<16} {len(values):>8} {errors[name]:>7} {len(values) / duration:>9.1f} '
+              f'{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}')
+    total = sum(len(values) for values in latencies.values())
+    print(f'{concurrency:>5} {"total":<16} {total:>8} {sum(errors.values()):>7} {total / duration:>9.1f}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma separated concurrent clients of each run')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of each run')
+    parser.add_argument('--mix', default=MIX, help=f'Weight of each scenario. Default: {MIX}')
+    parser.add_argument('--url', help='Load test the server at this url instead of starting one')
+    parser.add_argument('--database', help='Database url of the server. Default: a new sqlite file')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--port', type=int, default=3999)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, SlackStandIn() as slack, CalendarStandIn() as calendar:
+        server = None
+        url = args.url
+        if url is None:
+            args.database = args.database or f"sqlite:///{os.path.join(directory, 'loadtest.db')}"
+        if args.database:
+            seed(args.database, args.users, args.polls)
+        if url is None:
+            save_credentials(args.database)
+            server = start_server(args, directory, slack, calendar)
+            url = f'http://127.0.0.1:{args.port}/'
+        url = url.rstrip('/') + '/'
+
+        from slacker.app_config import CUERVOT_SIGNATURE
+
+        scenario = Scenario(args.users, args.polls, CUERVOT_SIGNATURE)
+        mix = parse_mix(args.mix)
+        try:
+            wait_until_ready(url, server)
+            print(f'{"conc":>5} {"command":<16} {"requests":>8} {"errors":>7} {"req/s":>9} '
+                  f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+            for concurrency in map(int, args.concurrency.split(',')):
+                latencies, errors = run(url, scenario, mix, concurrency, args.duration)
+                report(concurrency, args.duration, latencies, errors)
+            print('Slack api calls:', dict(sorted(slack.calls.items())))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Fill a database with --rows votes, options, retro items, sprints and stickers, to see how the models behave at size.
+
+Rows are made by the factories of tests/factorium.py. Building each of millions of rows with them would take hours, so
+a pool of factory rows is built once per model and reused with new keys, and rows are inserted in batches.
+
+Every table gets --rows rows but users, teams and polls, which are sized to them:
+    users: 1 in 100 rows, on teams of 10. Each team has one running sprint and many finished ones
+    polls: 4 options each. Users U0, U1, ... vote once on every poll until there are --rows votes
+
+THE TABLES OF THE DATABASE ARE DROPPED AND CREATED AGAIN. Run it on a database of its own.
+
+Usage:
+    $ python -m benchmarks.seed --database postgresql://slacker@localhost/slacker_seed --rows 1000000
+"""
+import argparse
+import datetime as dt
+import itertools
+import time
+
+import factory
+
+from tests import factorium
+
+BATCH = 10000
+POOL = 1000
+OPTIONS_PER_POLL = 4
+
+
+def counts(rows):
+    """Rows of each table"""
+    users = max(rows // 100, 10)
+    return {
+        'team': max(users // 10, 1),
+        'user': users,
+        'sprint': rows,
+        'retro_item': rows,
+        'poll': -(-rows // OPTIONS_PER_POLL),
+        'option': rows,
+        'vote': rows,
+        'sticker': rows,
+    }
+
+
+def pool(factory_class, model, size=POOL, **overrides):
+    """Column values of `size` rows built by a factory"""
+    columns = set(model.__table__.columns.keys())
+    rows = factory.build_batch(dict, size, FACTORY_CLASS=factory_class, **overrides)
+    return [{key: value for key, value in row.items() if key in columns} for row in rows]
+
+
+def generate(sizes):
+    """Model and rows of each table, in insert order"""
+    from slacker.models import Sticker
+    from slacker.models.poll import Poll, Option, Vote
+    from slacker.models.retro import Sprint, Team, RetroItem
+    from slacker.models.user import User
+
+    teams, users, sprints = sizes['team'], sizes['user'], sizes['sprint']
+    options, polls = sizes['option'], sizes['poll']
+    now = dt.datetime.now(dt.timezone.utc)
+
+    def rows(model, count, row, **overrides):
+        values = itertools.cycle(pool(getattr(factorium, f'{model.__name__}Factory'), model, **overrides))
+        return model, (row(i, dict(next(values))) for i in range(count))
+
+    def team(i, values):
+        return dict(values, id=i + 1, name=f"{values['name']} {i}")
+
+    def user(i, values):
+        return dict(values, id=i + 1, user_id=f'U{i}', team_id=i % teams + 1,
+                    real_name=f"{values['first_name']} {values['last_name']}")
+
+    def sprint(i, values):
+        # The last sprint of each team is running
+        return dict(values, id=i + 1, team_id=i % teams + 1, running=i >= sprints - teams,
+                    start_date=now - dt.timedelta(days=14 * ((sprints - i) // teams)))
+
+    def retro_item(i, values):
+        return dict(values, id=i + 1, sprint_id=i % sprints + 1, author_id=i % users + 1, author=f'U{i % users}',
+                    datetime=now)
+
+    def poll(i, values):
+        return dict(values, id=i + 1, question=f"{values['question']} {i}", author=f'U{i % users}', created_at=now,
+                    ended=False)
+
+    def option(i, values):
+        return dict(values, id=i + 1, poll_id=i // OPTIONS_PER_POLL + 1, number=i % OPTIONS_PER_POLL + 1)
+
+    def vote(i, values):
+        # One vote per user and poll
+        poll, voter = i % polls, i // polls
+        return dict(values, poll_id=poll + 1, option_id=poll * OPTIONS_PER_POLL + (poll + voter) % OPTIONS_PER_POLL + 1,
+                    user_id=f'U{voter}')
+
+    def sticker(i, values):
+        return dict(values, author=f'U{i % users}', name=f'sticker{i}', image_url=f'https://i.imgur.com/{i:08}.png')
+
+    return [
+        rows(Team, teams, team),
+        rows(User, users, user, team=None),
+        rows(Sprint, sprints, sprint, team=None),
+        rows(RetroItem, sizes['retro_item'], retro_item, sprint=None),
+        rows(Poll, sizes['poll'], poll),
+        rows(Option, options, option),
+        (Vote, (vote(i, {}) for i in range(sizes['vote']))),
+        rows(Sticker, sizes['sticker'], sticker),
+    ]
+
+
+def insert(db, model, rows):
+    table = model.__table__
+    count = 0
+    while True:
+        batch = list(itertools.islice(rows, BATCH))
+        if not batch:
+            break
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+
+def reset_sequences(db):
+    """Ids were given explicitly. Move postgres sequences past them, for the rows the bot inserts"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in db.metadata.sorted_tables:
+        if 'id' in table.columns and table.columns['id'].autoincrement:
+            db.session.execute(f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                               f"coalesce(max(id), 0) + 1, false) FROM \"{table.name}\"")
+    db.session.commit()
+
+
+def seed(db, rows, verbose=True):
+    """Drop the tables and fill them again. Needs an app context"""
+    db.drop_all()
+    db.create_all()
+    for model, table_rows in generate(counts(rows)):
+        start = time.perf_counter()
+        count = insert(db, model, table_rows)
+        if verbose:
+            print(f'{model.__tablename__:<12} {count:>10} rows in {time.perf_counter() - start:.1f}s')
+    reset_sequences(db)
+
+
+def make_app(database):
+    from slacker.app import create_app
+
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = database
+    if database.startswith('postgres'):
+        # One statement per batch instead of one per row
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'executemany_mode': 'values'}
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='Url of the database to fill. Its tables are dropped')
+    parser.add_argument('--rows', type=int, default=1000000, help='Rows of each table')
+    args = parser.parse_args()
+
+    from slacker.database import db
+
+    with make_app(args.database).app_context():
+        seed(db, args.rows)
+
+
+if __name__ == '__main__':
+    main()
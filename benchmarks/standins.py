@@ -0,0 +1,305 @@
+"""
+Local stand-ins of the apis the bot calls, so that it can be load tested without slack or google.
+
+SlackStandIn answers every Slack Web API method with ok=true, as SLACK_API_URL. It can take --latency seconds on
+average to answer, fail --error-rate of the calls and rate limit each method to its tier, answering 429 with the
+Retry-After header like slack does. CalendarStandIn serves the discovery document of the calendar api, as
+GOOGLE_DISCOVERY_URL, and answers freebusy queries with a busy calendar for every room asked for.
+
+    with SlackStandIn() as slack, CalendarStandIn() as calendar:
+        env = {'SLACK_API_URL': slack.url, 'GOOGLE_DISCOVERY_URL': calendar.discovery_url}
+
+Run the slack one on its own to try the task queue worker without slack:
+
+    $ python -m benchmarks.standins --port 8099 --latency 0.2 --error-rate 0.01 --rate-limits
+    $ cd task_queue && SLACK_API_URL=http://127.0.0.1:8099/ celery -A tasks worker
+"""
+import argparse
+import datetime as dt
+import email
+import json
+import math
+import random
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+
+from dateutil.parser import isoparse
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real apis
+    # Headers and body are written apart. With Nagle the body waits for the ack the client delays on kept-alive
+    # connections, 40ms on linux
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandIn:
+    """HTTP server on a free local port, served from a background thread while in a with block"""
+    handler = JSONHandler
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), self.handler)
+        self.server.standin = self
+        self._thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Calls per minute of each tier. https://api.slack.com/docs/rate-limits
+TIERS = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    'chat.postEphemeral': 4,
+    'chat.update': 3,
+    'dialog.open': 4,
+    'files.upload': 2,
+    'users.info': 4,
+}
+
+
+class RateLimits:
+    """Calls allowed per method in a sliding window. chat.postMessage is limited to one message per second and
+    channel, the rest of the methods to the calls per minute of their tier times `scale`"""
+
+    def __init__(self, scale=1):
+        self.scale = scale
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def limit(self, method, args):
+        """Key, calls and window in seconds that apply to a call"""
+        if method == 'chat.postMessage':
+            return (method, args.get('channel')), max(round(self.scale), 1), 1
+        return method, max(round(TIERS[METHOD_TIERS.get(method, 3)] * self.scale), 1), 60
+
+    def retry_after(self, method, args, now=None):
+        """Seconds to wait until the call is allowed, or None if it is, in which case it counts"""
+        now = time.monotonic() if now is None else now
+        key, calls, window = self.limit(method, args)
+        with self._lock:
+            made = self._calls.setdefault(key, deque())
+            while made and made[0] <= now - window:
+                made.popleft()
+            if len(made) >= calls:
+                return max(math.ceil(made[0] + window - now), 1)
+            made.append(now)
+        return None
+
+
+def form_args(content_type, body):
+    if 'json' in content_type:
+        return json.loads(body or b'{}')
+    if 'multipart' in content_type:
+        message = email.message_from_bytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+        return {
+            part.get_param('name', header='content-disposition'): part.get_payload(decode=True).decode(errors='replace')
+            for part in message.get_payload()
+        }
+    return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+
+class SlackHandler(JSONHandler):
+
+    def do_POST(self):
+        method = self.path.strip('/').split('/')[-1]
+        args = form_args(self.headers.get('Content-Type', ''), self.read_body())
+        status, payload, headers = self.server.standin.call(method, args)
+        self.send_json(payload, status, headers)
+
+    do_GET = do_POST
+
+
+class SlackStandIn(StandIn):
+    """Slack Web API. Set its url as SLACK_API_URL
+
+    Args:
+        latency (float): mean seconds to answer. Answer times are exponentially distributed, so there is a long tail
+        error_rate (float): share of the calls answered with ok=false
+        rate_limits (bool): answer 429 to the calls over the limit of the method. See RateLimits
+        tier_scale (float): multiplies the calls allowed by each tier
+        record (bool): keep every call on `log`, as (time, method, args, status, ok)
+    """
+    handler = SlackHandler
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, error_rate=0, rate_limits=False, tier_scale=1,
+                 record=False):
+        super().__init__(host, port)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limits = RateLimits(tier_scale) if rate_limits else None
+        self.record = record
+        self.calls = {}
+        self.log = []
+        self._lock = threading.Lock()
+
+    def call(self, method, args):
+        """Status, payload and headers of the answer to a call"""
+        if self.latency:
+            time.sleep(random.expovariate(1 / self.latency))
+
+        status, headers = 200, {}
+        retry_after = self.rate_limits and self.rate_limits.retry_after(method, args)
+        if retry_after:
+            status, headers, payload = 429, {'Retry-After': str(retry_after)}, {'ok': False, 'error': 'ratelimited'}
+        elif random.random() < self.error_rate:
+            payload = {'ok': False, 'error': 'internal_error'}
+        else:
+            payload = self.answer(method, args)
+
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if self.record:
+                self.log.append((time.time(), method, args, status, payload['ok']))
+        return status, payload, headers
+
+    def answer(self, method, args):
+        if method == 'users.info':
+            user = args.get('user', 'U0')
+            return {'ok': True, 'user': {'id': user, 'name': user.lower(), 'real_name': f'User {user}',
+                                         'tz': 'America/Buenos_Aires',
+                                         'profile': {'first_name': 'User', 'last_name': user,
+                                                     'real_name': f'User {user}', 'display_name': user.lower()}}}
+        if method in ('chat.postMessage', 'chat.update'):
+            return {'ok': True, 'channel': args.get('channel', 'C0'), 'ts': f'{time.time():.6f}',
+                    'message': {'text': args.get('text', ''), 'blocks': args.get('blocks', [])}}
+        if method == 'chat.postEphemeral':
+            return {'ok': True, 'message_ts': f'{time.time():.6f}'}
+        if method == 'files.upload':
+            return {'ok': True, 'file': {'id': 'F0', 'name': args.get('filename', 'file')}}
+        return {'ok': True}
+
+
+def discovery_document(root_url):
+    """Enough of the calendar v3 discovery document for the client to build freebusy queries"""
+    return {
+        'kind': 'discovery#restDescription',
+        'discoveryVersion': 'v1',
+        'id': 'calendar:v3',
+        'name': 'calendar',
+        'version': 'v3',
+        'rootUrl': root_url,
+        'servicePath': 'calendar/v3/',
+        'batchPath': 'batch/calendar/v3',
+        'parameters': {},
+        'schemas': {
+            'FreeBusyRequest': {'id': 'FreeBusyRequest', 'type': 'object'},
+            'FreeBusyResponse': {'id': 'FreeBusyResponse', 'type': 'object'},
+        },
+        'resources': {
+            'freebusy': {
+                'methods': {
+                    'query': {
+                        'id': 'calendar.freebusy.query',
+                        'path': 'freeBusy',
+                        'httpMethod': 'POST',
+                        'parameters': {},
+                        'request': {'$ref': 'FreeBusyRequest'},
+                        'response': {'$ref': 'FreeBusyResponse'},
+                    },
+                },
+            },
+        },
+    }
+
+
+def busy_slots(start, end, rnd, busy=0.4):
+    """Half hour meetings on a share of the half hours between start and end"""
+    slots = []
+    slot = start.replace(minute=0 if start.minute < 30 else 30, second=0, microsecond=0)
+    while slot < end:
+        if rnd.random() < busy:
+            slots.append({'start': slot.isoformat(), 'end': (slot + dt.timedelta(minutes=30)).isoformat()})
+        slot += dt.timedelta(minutes=30)
+    return slots
+
+
+class CalendarHandler(JSONHandler):
+
+    def do_GET(self):
+        self.send_json(discovery_document(self.server.standin.url))
+
+    def do_POST(self):
+        query = json.loads(self.read_body() or b'{}')
+        self.send_json(self.server.standin.freebusy(query))
+
+
+class CalendarStandIn(StandIn):
+    """Google calendar api with freebusy queries. Set its discovery_url as GOOGLE_DISCOVERY_URL"""
+    handler = CalendarHandler
+
+    def __init__(self, host='127.0.0.1', port=0, busy=0.4):
+        super().__init__(host, port)
+        self.busy = busy
+
+    @property
+    def discovery_url(self):
+        return f'{self.url}discovery/v1/apis/{{api}}/{{apiVersion}}/rest'
+
+    def freebusy(self, query):
+        start, end = isoparse(query['timeMin']), isoparse(query['timeMax'])
+        rnd = random.Random()
+        calendars = {item['id']: {'busy': busy_slots(start, end, rnd, self.busy)} for item in query.get('items', [])}
+        return {'kind': 'calendar#freeBusy', 'timeMin': query['timeMin'], 'timeMax': query['timeMax'],
+                'calendars': calendars}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0, help='Mean seconds to answer')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of calls answered with ok=false')
+    parser.add_argument('--rate-limits', action='store_true', help='Answer 429 over the tier limit of each method')
+    parser.add_argument('--tier-scale', type=float, default=1, help='Multiplies the calls allowed by each tier')
+    args = parser.parse_args()
+
+    slack = SlackStandIn(args.host, args.port, args.latency, args.error_rate, args.rate_limits, args.tier_scale)
+    print(f'Slack api stand-in on {slack.url}')
+    try:
+        slack.server.serve_forever()
+    except KeyboardInterrupt:
+        print('Calls:', dict(sorted(slack.calls.items())))
+
+
+if __name__ == '__main__':
+    main()
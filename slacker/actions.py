@@ -0,0 +1,109 @@
+"""
+Router of slack interactions: buttons, menus and dialog submissions.
+
+Handlers are registered by the prefix of the id slack sends back, the part before the first `:`.
+i.e `poll_vote:2` is routed to the `poll_vote` action handler:
+
+    router = ActionRouter()
+
+    @router.action('poll_vote', deferred=True)
+    def vote(action):
+        ...
+
+Finding a handler is a dict lookup, no matter how many there are. When DEFERRED_COMMANDS is on, deferred handlers
+run on the commands worker and slack gets its answer right away.
+"""
+import time
+
+from loguru import logger
+
+from slacker.deferred import actions as deferred_actions
+from slacker.metrics import ACTION_LATENCY
+from slacker.tasks_proxy import run_action_async
+from slacker.utils import OK
+
+ACTION_ID = 'action_id'
+BLOCK_ID = 'block_id'
+CALLBACK_ID = 'callback_id'
+
+
+class Handler:
+    """Interaction handler. Its runs are timed on the slacker_action_duration_seconds histogram"""
+
+    def __init__(self, func, deferred=False):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.deferred = deferred
+
+    def __repr__(self):
+        return f'<Handler {self.name}>'
+
+    def observe(self, seconds):
+        ACTION_LATENCY.labels(self.name).observe(seconds)
+
+    def __call__(self, action):
+        start = time.perf_counter()
+        try:
+            return self.func(action)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed)
+            logger.debug('Action handled by {} in {:.1f} ms', self.name, elapsed * 1000)
+
+
+class ActionRouter:
+
+    def __init__(self):
+        self.routes = {ACTION_ID: {}, BLOCK_ID: {}, CALLBACK_ID: {}}
+
+    def route(self, kind, prefix, deferred=False):
+        """Register a handler of the interactions whose `kind` id starts with prefix"""
+        def decorator(func):
+            handler = Handler(func, deferred)
+            self.routes[kind][prefix] = handler
+            deferred_actions[handler.name] = handler
+            return func
+        return decorator
+
+    def action(self, prefix, deferred=False):
+        return self.route(ACTION_ID, prefix, deferred)
+
+    def block(self, prefix, deferred=False):
+        return self.route(BLOCK_ID, prefix, deferred)
+
+    def dialog(self, prefix, deferred=False):
+        return self.route(CALLBACK_ID, prefix, deferred)
+
+    def find(self, action):
+        """Handler of the action or None"""
+        if action['type'] == 'dialog_submission':
+            return self._match(CALLBACK_ID, action.get('callback_id'))
+
+        if action['type'] == 'block_actions':
+            the_action = action['actions'][0]
+            return (self._match(ACTION_ID, the_action.get('action_id')) or
+                    self._match(BLOCK_ID, the_action.get('block_id')))
+
+        return None
+
+    def _match(self, kind, id_):
+        return self.routes[kind].get((id_ or '').split(':', 1)[0])
+
+    def dispatch(self, action, defer=False):
+        """Handle the action, or send it to the commands worker if its handler is deferred and defer is on.
+
+        Returns:
+            The response for slack
+        """
+        handler = self.find(action)
+        if handler is None:
+            logger.error('No handler for this action')
+            return OK
+
+        if defer and handler.deferred:
+            task = run_action_async(handler.name, action)
+            logger.debug('Action deferred to {}. Task {}', handler.name, task.id)
+            return OK
+
+        resp = handler(action)
+        return OK if resp is None else resp
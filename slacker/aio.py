@@ -0,0 +1,400 @@
+"""
+Asyncio serving mode.
+
+Commands that spend their time waiting on external apis are coroutines that share one event loop and non-blocking
+http and slack clients, so a single process serves hundreds of concurrent slash commands. Every other route is
+served by the flask app on a thread pool, the same views the sync mode runs.
+
+Coroutine commands and interactions get COMMAND_DEADLINE seconds, as flask requests do. Their Deadline is passed along
+to the calls they make, see slacker.deadline. Those deferred get DEFERRED_DEADLINE.
+
+Run it with:
+    $ gunicorn "slacker.aio:create_aio_app()" -k aiohttp.GunicornWebWorker -b 0.0.0.0:3000
+"""
+import asyncio
+import io
+import json
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, partial
+from urllib.parse import unquote
+
+import aiohttp
+from aiohttp import web
+from loguru import logger
+from multidict import CIMultiDict
+
+from slacker.api.feriados import get_feriadosarg_async
+from slacker.api.hoypido import get_hoypido_async
+from slacker.api.subte import get_subte_async
+from slacker.app import create_app
+from slacker.app_config import CUERVOT, DEFERRED_DEADLINE, SLACK_API_URL
+from slacker.deadline import Deadline, OUT_OF_TIME_MESSAGE
+from slacker.metrics import REQUEST_LATENCY, RESPONSES, IN_FLIGHT, SIGNATURE_REJECTIONS, TIMED
+from slacker.middleware import SlackSignatureMiddleware, Rejected
+from slacker.ratelimit import limiter, throttled_message
+from slacker.registry import registry, LATE_MESSAGE
+from slacker.slack_telemetry import ObservedWebClient
+from slacker.utils import command_payload
+
+THREADS = 16  # Flask views and clients without async support (db, google apis) run here
+HOP_BY_HOP = {'content-length', 'transfer-encoding', 'connection'}
+
+
+def create_aio_app(flask_app=None, executor=None):
+    """Serve the slacker flask app on an event loop.
+
+    Args:
+        flask_app: app that serves the routes without a coroutine handler. Built with create_app if missing
+        executor: pool where flask and blocking clients run
+    """
+    flask_app = flask_app or create_app()
+    signature = flask_app.wsgi_app if isinstance(flask_app.wsgi_app, SlackSignatureMiddleware) else None
+
+    app = web.Application()
+    app['flask'] = flask_app
+    app['signature'] = signature
+    app['wsgi'] = flask_app.wsgi_app
+    app['verified_wsgi'] = signature.app if signature else flask_app.wsgi_app
+    app['executor'] = executor or ThreadPoolExecutor(THREADS)
+    app['background'] = set()
+    app.on_startup.append(start_clients)
+    app.on_cleanup.append(close_clients)
+
+    # Disabled blueprints are left to flask, that answers them as not found
+    if 'commands' in flask_app.blueprints:
+        add_route(app, 'commands', '/subte', command(subte, '/subte'))
+        add_route(app, 'commands', '/feriados', command(feriados, '/feriados'))
+        add_route(app, 'commands', '/hoypido', command(hoypido, '/hoypido'))
+    if 'rooms' in flask_app.blueprints:
+        add_route(app, 'rooms', '/rooms/find_free_rooms', command(find_rooms, '/find_free_rooms'))
+    if 'interactive' in flask_app.blueprints:
+        add_route(app, 'interactive', '/interactive/message_actions', message_actions)
+    app.router.add_route('*', '/{path:.*}', wsgi_bridge)
+
+    return app
+
+
+def add_route(app, blueprint, path, handler):
+    """Add rules with and without slash, as BaseBlueprint does. Requests are timed as the flask route they replace"""
+    handler = timed(blueprint, path, handler)
+    app.router.add_route('*', path, handler)
+    app.router.add_route('*', f'{path}/', handler)
+
+
+def timed(blueprint, route, handler):
+    """Time and count the requests of a coroutine handler. Flask doesn't time them again if it ends up serving them"""
+
+    @wraps(handler)
+    async def view(request):
+        request[TIMED] = True
+        IN_FLIGHT.labels(blueprint, route).inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        finally:
+            REQUEST_LATENCY.labels(blueprint, route).observe(time.perf_counter() - start)
+            RESPONSES.labels(blueprint, route, status).inc()
+            IN_FLIGHT.labels(blueprint, route).dec()
+
+    return view
+
+
+async def start_clients(app):
+    app['http'] = aiohttp.ClientSession()
+    app['slack'] = ObservedWebClient(CUERVOT, base_url=SLACK_API_URL, run_async=True, session=app['http'])
+
+
+async def close_clients(app):
+    if app['background']:
+        await asyncio.wait(app['background'])
+    await app['http'].close()
+    app['executor'].shutdown(wait=False)
+
+
+def spawn(app, coro):
+    """Run coro in the background. Pending tasks are awaited on shutdown"""
+    task = asyncio.ensure_future(coro)
+    app['background'].add(task)
+    task.add_done_callback(app['background'].discard)
+    return task
+
+
+async def run_blocking(app, func, *args, deadline=None):
+    """Run func on the app executor, inside a flask app context so that it can use the db, and within deadline"""
+    def in_app_context():
+        with app['flask'].app_context(), (deadline or Deadline()).within():
+            return func(*args)
+
+    return await asyncio.get_event_loop().run_in_executor(app['executor'], in_app_context)
+
+
+async def verify(request):
+    """Do the checks of the signature middleware. Returns the response for rejected requests"""
+    checker = request.app['signature']
+    if checker is None:
+        return None
+
+    signature = request.headers.get('X-Slack-Signature')
+    timestamp = request.headers.get('X-Slack-Request-Timestamp')
+    try:
+        checker.check_headers(signature, timestamp, request.headers.get('Content-Length'))
+        body = await request.read()
+        # Replays are checked on the shared redis, with the sync client
+        await asyncio.get_event_loop().run_in_executor(request.app['executor'], checker.check_signature,
+                                                       request.path, signature, timestamp, body)
+    except Rejected as e:
+        SIGNATURE_REJECTIONS.labels(e.reason).inc()
+        if e.replayed:
+            logger.info('Replayed request dropped. Signature {}', signature)
+            return web.Response()
+        return web.Response(body=checker.rejection_body(e.reason), content_type='application/json')
+
+    return None
+
+
+def as_response(result):
+    """Build the http response of a command handler result, a slack payload or plain text"""
+    if isinstance(result, str):
+        return web.Response(text=result)
+    return web.json_response(result)
+
+
+def as_payload(result):
+    return {'text': result} if isinstance(result, str) else result
+
+
+def request_deadline(app):
+    """Deadline of a request, from the moment it came in. COMMAND_DEADLINE=0 disables it"""
+    return Deadline(app['flask'].config.get('COMMAND_DEADLINE') or None)
+
+
+def command(handler, name):
+    """Serve a coroutine slash command handler, with the spec of the registered command `name`.
+
+    Same as registered views, deferred commands ack right away and the handler result is posted to the
+    response_url. It runs on this loop instead of the commands worker.
+    """
+
+    @wraps(handler)
+    async def view(request):
+        deadline = request_deadline(request.app)
+        rejected = await verify(request)
+        if rejected is not None:
+            return rejected
+
+        cmd = registry[name]
+        form = await request.post()
+        limit, wait = limiter.check(request.app['flask'].config, cmd, form.get('user_id'), form.get('text', ''))
+        if wait:
+            return web.json_response({'text': throttled_message(cmd.name, limit, wait), 'response_type': 'ephemeral'})
+
+        response_url = form.get('response_url')
+        if response_url and cmd.should_defer(request.app['flask'].config):
+            spawn(request.app, respond_later(request.app, handler, form, response_url))
+            return web.json_response({'text': cmd.message, 'response_type': 'ephemeral'})
+
+        start = time.perf_counter()
+        try:
+            response = as_response(await handler(request.app, form, deadline))
+            cmd.record(time.perf_counter() - start)
+            return response
+        except Exception as e:
+            if deadline.expired():
+                cmd.record(time.perf_counter() - start)
+                return out_of_time(request.app, cmd, handler, form, e)
+            logger.error(f'Error: {repr(e)}\nTraceback:\n{traceback.format_exc()}')
+            return web.json_response({'text': 'Oops ¯\\_(ツ)_/¯. Errors happen', 'error': repr(e)})
+
+    return view
+
+
+def out_of_time(app, cmd, handler, form, error):
+    """Same as Command.out_of_time, deferred runs finish on this loop"""
+    logger.warning(f'{cmd.name} ran out of time. {error!r}')
+    response_url = form.get('response_url')
+    if response_url and cmd.deferrable and cmd.idempotent:
+        spawn(app, respond_later(app, handler, form, response_url))
+        return web.json_response({'text': LATE_MESSAGE, 'response_type': 'ephemeral'})
+    return web.json_response({'text': OUT_OF_TIME_MESSAGE, 'response_type': 'ephemeral'})
+
+
+async def respond_later(app, handler, form, response_url):
+    try:
+        result = await handler(app, form, Deadline(DEFERRED_DEADLINE))
+    except Exception as e:
+        logger.exception(f'Command {handler.__name__} failed')
+        result = f'Oops ¯\\_(ツ)_/¯. Errors happen\n`{repr(e)}`'
+
+    await respond(app['http'], response_url, as_payload(result))
+
+
+async def respond(session, response_url, payload):
+    """Post a response to slack. Like the commands worker does, it's not bound by the deadline of the command"""
+    try:
+        async with session.post(response_url, json=payload, timeout=aiohttp.ClientTimeout(total=5)) as r:
+            if r.status != 200:
+                logger.error(f'Response not delivered to slack. {r.status} {await r.text()}')
+    except Exception:
+        logger.exception('Response not delivered to slack')
+
+
+async def subte(app, form, deadline):
+    return command_payload(await get_subte_async(app['http'], deadline))
+
+
+async def feriados(app, form, deadline):
+    return command_payload(await get_feriadosarg_async(app['http'], deadline))
+
+
+async def hoypido(app, form, deadline):
+    return command_payload(await get_hoypido_async(app['http'], form.get('text', ''), deadline))
+
+
+async def find_rooms(app, form, deadline):
+    from slacker.blueprints.rooms import find_free_rooms
+
+    # googleapiclient has no async transport, its calls wait on a thread instead
+    return await run_blocking(app, find_free_rooms, form.get('text', ''), deadline=deadline)
+
+
+async def message_actions(request):
+    """Handle sticker and poll buttons on the loop, flask handles the rest of the interactions"""
+    deadline = request_deadline(request.app)
+    rejected = await verify(request)
+    if rejected is not None:
+        return rejected
+
+    form = await request.post()
+    action = json.loads(form['payload'])
+    handler, coroutine = action_handler(action)
+    if coroutine is None:
+        # The signature was already checked, flask must not see it as replayed
+        return await call_flask(request, request.app['verified_wsgi'])
+
+    start = time.perf_counter()
+    try:
+        await coroutine(request.app, action, deadline)
+    except Exception as e:
+        logger.exception('Interaction failed')
+        await respond(request.app['http'], action['response_url'], {
+            'text': f'Something bad happened.\n`{repr(e)}`',
+            'response_type': 'ephemeral',
+            'replace_original': False,
+        })
+    finally:
+        handler.observe(time.perf_counter() - start)
+
+    return web.Response()
+
+
+def action_handler(action):
+    """Find the interactivity router handler of the action and its coroutine version, if there is one"""
+    from slacker.blueprints.interactivity import router
+
+    handler = router.find(action)
+    if handler is None:
+        return None, None
+    return handler, {'send_sticker': send_sticker, 'vote': vote}.get(handler.func.__name__)
+
+
+async def send_sticker(app, action, deadline):
+    from slacker.blueprints.interactivity import sticker_message
+
+    the_action = action['actions'][0]
+    _, sticker_name = the_action['action_id'].split(':', 1)
+    logger.debug('Sending sticker.. {}', the_action['value'])
+    await asyncio.wait_for(app['slack'].chat_postMessage(channel=action['channel']['id'],
+                                                         blocks=sticker_message(sticker_name, the_action['value'])),
+                           deadline.timeout(call='slack call chat.postMessage'))
+
+
+async def vote(app, action, deadline):
+    from slacker.blueprints.interactivity import add_vote
+
+    the_action = action['actions'][0]
+    poll_text, error = await run_blocking(app, add_vote, the_action['block_id'], the_action['value'],
+                                          action['user']['id'], deadline=deadline)
+    if error:
+        await respond(app['http'], action['response_url'], {
+            'text': error,
+            'response_type': 'ephemeral',
+            'replace_original': False,
+        })
+        return
+
+    blocks = action['message']['blocks']
+    # Update block's text with new votes
+    blocks[0]['text']['text'] = poll_text
+    await asyncio.wait_for(app['slack'].chat_update(channel=action['channel']['id'], ts=action['message']['ts'],
+                                                    blocks=blocks),
+                           deadline.timeout(call='slack call chat.update'))
+    logger.debug('Poll vote was updated.')
+
+
+async def wsgi_bridge(request):
+    return await call_flask(request, request.app['wsgi'])
+
+
+async def call_flask(request, wsgi_app):
+    body = await request.read()
+    environ = wsgi_environ(request, body)
+    environ[TIMED] = request.get(TIMED, False)
+    loop = asyncio.get_event_loop()
+    status, headers, body = await loop.run_in_executor(request.app['executor'], partial(run_wsgi, wsgi_app, environ))
+    return web.Response(status=status, headers=headers, body=body)
+
+
+def wsgi_environ(request, body):
+    """PEP 3333 environ of an aiohttp request"""
+    path, _, query = request.raw_path.partition('?')
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote(path, encoding='latin-1'),
+        'QUERY_STRING': query,
+        'SERVER_NAME': request.url.host or 'localhost',
+        'SERVER_PORT': str(request.url.port or 80),
+        'SERVER_PROTOCOL': f'HTTP/{request.version.major}.{request.version.minor}',
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in request.headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            continue
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+    return environ
+
+
+def run_wsgi(wsgi_app, environ):
+    response, chunks = [], []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [status, headers]
+        return chunks.append
+
+    result = wsgi_app(environ, start_response)
+    try:
+        chunks.extend(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    status, headers = response
+    headers = CIMultiDict((name, value) for name, value in headers if name.lower() not in HOP_BY_HOP)
+    return int(status.split(' ', 1)[0]), headers, b''.join(chunks)
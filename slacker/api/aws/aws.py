@@ -23,7 +23,7 @@ def load_vms_info(vms):
             vm_name, vmid = vm.split('=')
             vms_info.update({f'{vm_name.strip()}': f'{vmid.strip()}'})
         except Exception:
-            logger.info("Bad vsm info format. '%r'" % vms)
+            logger.info("Bad vsm info format. '{!r}'", vms)
             return None
 
     return vms_info
@@ -42,7 +42,7 @@ def save_user_vms(user, ovi_name, ovi_token, new_user_vms):
         )
 
     for alias, vm_id in new_user_vms.items():
-        logger.debug(f"Atttempting to add VM with alias={alias} and id={vm_id}")
+        logger.debug('Atttempting to add VM with alias={} and id={}', alias, vm_id)
         vm = VM.query.get(vm_id)
         if not vm:
             vm = VM(id=vm_id)
@@ -53,7 +53,7 @@ def save_user_vms(user, ovi_name, ovi_token, new_user_vms):
             owned_vm = VMOwnership(vm=vm, user=user, alias=alias)
             db.session.add(owned_vm)
         else:
-            logger.debug(f"Ignoring {str(owned_vm)} because it's already on database.")
+            logger.debug("Ignoring {} because it's already on database.", owned_vm)
 
     user.ovi_name = ovi_name
     user.ovi_token = ovi_token
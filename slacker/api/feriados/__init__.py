@@ -1 +1 @@
-from .feriados import get_feriadosarg
\ No newline at end of file
+from .feriados import get_feriadosarg, get_feriadosarg_async
\ No newline at end of file
@@ -3,17 +3,33 @@ import logging
 
 from slacker.api.feriados.utils import (
     get_feriados,
+    get_feriados_async,
     prettify_feriados,
     filter_feriados,
     next_feriado_message
 )
+from slacker.breakers import age_note
 
 logger = logging.getLogger(__name__)
 
 
 def get_feriadosarg() -> str:
-    today = datetime.now(tz=timezone(timedelta(hours=-3)))
-    feriados = get_feriados(today.year)
+    today = _today()
+    feriados, saved_at = get_feriados(today.year)
+    return feriados_message(today, feriados) + age_note(saved_at)
+
+
+async def get_feriadosarg_async(session, deadline=None) -> str:
+    today = _today()
+    feriados, saved_at = await get_feriados_async(session, today.year, deadline)
+    return feriados_message(today, feriados) + age_note(saved_at)
+
+
+def _today():
+    return datetime.now(tz=timezone(timedelta(hours=-3)))
+
+
+def feriados_message(today, feriados) -> str:
     if not feriados:
         return '🏳️ La api de feriados no responde'
 
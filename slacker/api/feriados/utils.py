@@ -1,27 +1,64 @@
 import datetime
 import logging
 
-import requests
-
+from slacker import sessions
 from slacker.api.feriados.constants import month_names, FERIADOS_URL
+from slacker.breakers import CircuitBreaker, Unavailable
+from slacker.deadline import Deadline
+from slacker.exceptions import SlackerException
 
 logger = logging.getLogger(__name__)
+breaker = CircuitBreaker('feriados')
 
 
 def get_feriados(year):
+    """Feriados of the year, and the time they were saved at if the api is down and they are the last good answer.
+    None if the api is down and there is no good answer kept"""
     try:
-        url = FERIADOS_URL.format(year=year)
-        r = requests.get(url)
-        logger.info(f'Retrieved feriados from {r.url}')
-    except Exception:
+        return breaker.call(lambda: fetch_feriados(year), key=str(year))
+    except Unavailable:
         logger.error("Error requestion feriados", exc_info=True)
-        return None
+        return None, None
+
+
+def fetch_feriados(year):
+    url = FERIADOS_URL.format(year=year)
+    r = sessions.get(url, timeout=5)
+    logger.info('Retrieved feriados from %s', r.url)
     if r.status_code != 200:
-        logger.info(f"Response not 200. {r.status_code} {r.reason}")
-        return None
+        logger.info('Response not 200. %s %s', r.status_code, r.reason)
+        raise SlackerException(f'Feriados api answered {r.status_code} {r.reason}')
 
     feriados = r.json()
-    logger.info("Feriados: %s", feriados)
+    # The payload is the whole year, only worth reading when debugging
+    logger.debug('Feriados: %s', feriados)
+
+    return feriados
+
+
+async def get_feriados_async(session, year, deadline=None):
+    """Same as get_feriados, without blocking the event loop"""
+    try:
+        return await breaker.call_async(lambda: fetch_feriados_async(session, year, deadline), key=str(year))
+    except Unavailable:
+        logger.error("Error requestion feriados", exc_info=True)
+        return None, None
+
+
+async def fetch_feriados_async(session, year, deadline=None):
+    from aiohttp import ClientTimeout  # Only the asyncio serving mode loads aiohttp
+
+    url = FERIADOS_URL.format(year=year)
+    timeout = ClientTimeout(total=(deadline or Deadline()).timeout(5, call='GET to feriados'))
+    async with session.get(url, timeout=timeout) as r:
+        logger.info('Retrieved feriados from %s', r.url)
+        if r.status != 200:
+            logger.info('Response not 200. %s %s', r.status, r.reason)
+            raise SlackerException(f'Feriados api answered {r.status} {r.reason}')
+
+        feriados = await r.json(content_type=None)
+
+    logger.debug('Feriados: %s', feriados)
 
     return feriados
 
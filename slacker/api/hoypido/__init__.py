@@ -1 +1 @@
-from .hoypido import get_hoypido_specials, get_hoypido_by_day, get_hoypido_all
\ No newline at end of file
+from .hoypido import get_hoypido, get_hoypido_async
\ No newline at end of file
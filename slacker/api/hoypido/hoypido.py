@@ -1,16 +1,42 @@
+import re
+
 from loguru import logger
 
 from slacker.api.hoypido.utils import (
     get_comidas,
+    get_comidas_async,
     prettify_food_offers,
     day_to_int,
     filter_comidas,
     day_names,
 )
+from slacker.breakers import age_note
+
+BY_DAY = re.compile(r'-d (\w)')
+
+
+def get_hoypido(args: str) -> str:
+    week_menu, saved_at = get_comidas()
+    return hoypido_menu(args, week_menu) + age_note(saved_at)
+
 
+async def get_hoypido_async(session, args: str, deadline=None) -> str:
+    week_menu, saved_at = await get_comidas_async(session, deadline)
+    return hoypido_menu(args, week_menu) + age_note(saved_at)
 
-def get_hoypido_specials() -> str:
-    week_menu = get_comidas()
+
+def hoypido_menu(args: str, week_menu: dict) -> str:
+    """Show the menu the user asked for. Week specials by default, a given day with `-d L` or all with `--all`"""
+    by_day = BY_DAY.search(args)
+    if by_day:
+        return get_hoypido_by_day(week_menu, by_day.group(1))
+    elif '--all' in args:
+        return get_hoypido_all(week_menu)
+
+    return get_hoypido_specials(week_menu)
+
+
+def get_hoypido_specials(week_menu) -> str:
     final = []
     for day, menu in week_menu.items():
         daily_specials = menu.get('especiales')
@@ -25,9 +51,7 @@ def get_hoypido_specials() -> str:
     return res
 
 
-def get_hoypido_by_day(day) -> str:
-    comidas = get_comidas()
-
+def get_hoypido_by_day(comidas, day) -> str:
     day_num = day_to_int.get(day.upper())
     if day_num is None:
         return 'No entiendo ese día.\nLas opciones son `L`, `M`, `X`, `J` y `V`'
@@ -39,6 +63,5 @@ def get_hoypido_by_day(day) -> str:
     return msg
 
 
-def get_hoypido_all() -> str:
-    week_menu = get_comidas()
+def get_hoypido_all(week_menu) -> str:
     return prettify_food_offers(week_menu)
@@ -4,15 +4,17 @@ from datetime import datetime
 from collections import defaultdict
 from typing import Optional
 
-import requests
-
+from slacker import sessions
 from slacker.app_config import HOYPIDO_USER, HOYPIDO_MENU, HOYPIDO_TOKEN
+from slacker.breakers import CircuitBreaker, Unavailable
+from slacker.deadline import Deadline
 from slacker.exceptions import SlackerException
 
 logger = logging.getLogger(__name__)
 
 url = 'https://hoypido-api-v2.herokuapp.com/customer'
 ONAPSIS_SALUDABLE = f"{url}/{HOYPIDO_USER}/location/{HOYPIDO_MENU}/menus"
+breaker = CircuitBreaker('hoypido')
 
 
 MONDAY, TUESDAY, WEDNESDAY, THURSDAY, FRIDAY, SATURDAY, SUNDAY = range(0, 7)
@@ -37,7 +39,7 @@ day_to_int = {
 
 
 def get_comidas():
-    """
+    """Menu of the week by day, and the time it was saved at if the api is down and it is the last good one.
     Output:
     {
         0: {
@@ -52,14 +54,49 @@ def get_comidas():
             'ensaladas': ['Ensalada de Lechuga, lentejas, tomate, pepino, zanahorias.']
             'sandwiches': ['6 Triples de Miga de Jamxf3n y Queso', 'Figazza de Jamon y queso']
         }
-    }
+    }, None
     """
-    menu_por_dia = {}
-    r = requests.get(ONAPSIS_SALUDABLE, params={'access_token': HOYPIDO_TOKEN}, timeout=2)
+    try:
+        week_menu, saved_at = breaker.call(fetch_week_menu)
+    except Unavailable as e:
+        raise SlackerException(f'Could not connect to hoypido API. Try again later. {e.__cause__ or e}') from e
+
+    return parse_week_menu(week_menu), saved_at
+
+
+def fetch_week_menu():
+    r = sessions.get(ONAPSIS_SALUDABLE, params={'access_token': HOYPIDO_TOKEN}, timeout=2)
     if r.status_code != 200:
-        raise SlackerException(f'Could not connect to hoypido API. Try again later. {r.status_code}-{r.reason}-{r.url}')
+        raise SlackerException(f'{r.status_code}-{r.reason}-{r.url}')
+
+    return r.json()
+
 
-    week_menu = r.json()
+async def get_comidas_async(session, deadline=None):
+    """Same as get_comidas, without blocking the event loop"""
+    try:
+        week_menu, saved_at = await breaker.call_async(lambda: fetch_week_menu_async(session, deadline))
+    except Unavailable as e:
+        raise SlackerException(f'Could not connect to hoypido API. Try again later. {e.__cause__ or e}') from e
+
+    return parse_week_menu(week_menu), saved_at
+
+
+async def fetch_week_menu_async(session, deadline=None):
+    from aiohttp import ClientTimeout  # Only the asyncio serving mode loads aiohttp
+
+    params = {'access_token': HOYPIDO_TOKEN}
+    timeout = ClientTimeout(total=(deadline or Deadline()).timeout(2, call='GET to hoypido'))
+    async with session.get(ONAPSIS_SALUDABLE, params=params, timeout=timeout) as r:
+        if r.status != 200:
+            raise SlackerException(f'{r.status}-{r.reason}-{r.url}')
+
+        return await r.json(content_type=None)
+
+
+def parse_week_menu(week_menu):
+    """Group the dishes of each day menu by food category"""
+    menu_por_dia = {}
     for day_menu in week_menu:
         date = datetime.strptime(day_menu["active_date"], "%Y-%m-%dT%H:%M:%S")
         menu = defaultdict(list)
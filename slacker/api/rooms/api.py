@@ -16,16 +16,27 @@ import datetime as dt
 from functools import partial
 
 from attr import dataclass
-from dateparser import parse
+from dateutil.parser import isoparse
 from typing import List, Tuple, Dict
 import pytz
 from docopt import docopt, DocoptExit
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from loguru import logger
 import unidecode
 
+from slacker import deadline
+from slacker.app_config import GOOGLE_DISCOVERY_URL
+
 bsas = pytz.timezone('America/Argentina/Buenos_Aires')
-parse_date = partial(parse, settings={'TIMEZONE': 'America/Buenos_Aires', 'RETURN_AS_TIMEZONE_AWARE': True})
+TIMEOUT = 10  # Seconds of each call to the calendar api
+
+
+def parse_date(text):
+    # dateparser takes longer to import than the rest of the app together, and only --start and --end use it
+    from dateparser import parse
+    return parse(text, settings={'TIMEZONE': 'America/Buenos_Aires', 'RETURN_AS_TIMEZONE_AWARE': True})
 
 
 class RoomDoesNotExist(Exception):
@@ -106,8 +117,12 @@ class RoomFinder:
         room_id = cls.ROOM_IDS_BY_NAME[ascii_name]
         return cls.ROOMS[room_id]
 
-    def __init__(self, creds):
-        self.api = build('calendar', 'v3', credentials=creds)
+    def __init__(self, creds, timeout=TIMEOUT):
+        discovery = {'discoveryServiceUrl': GOOGLE_DISCOVERY_URL} if GOOGLE_DISCOVERY_URL else {}
+        # Connections take their timeout when opened, so the discovery and freebusy calls get what's left of the
+        # deadline of the request now, at most
+        http = httplib2.Http(timeout=deadline.timeout(timeout, call='calendar discovery'))
+        self.api = build('calendar', 'v3', http=AuthorizedHttp(creds, http=http), **discovery)
 
     def calendar_list(self):
         return self.api.calendarList().list().execute()
@@ -120,6 +135,7 @@ class RoomFinder:
             "items": calendars
         }
 
+        deadline.check('freebusy query')
         return self.api.freebusy().query(body=body).execute()
 
     @classmethod
@@ -131,7 +147,8 @@ class RoomFinder:
         free_slots = []
         cursor = start_date
         for slot in busy_slots:
-            start, end = parse(slot['start']), parse(slot['end'])
+            # Freebusy times are RFC 3339, no need to guess their format
+            start, end = isoparse(slot['start']), isoparse(slot['end'])
             if start < start_date or end > end_date:
                 # Event does not belong to the current timeframe
                 continue
@@ -233,7 +250,7 @@ def get_free_rooms(credentials, args):
     start = parse_date(opt['--start']).replace(microsecond=0) if opt['--start'] else now
     end = parse_date(opt['--end']).replace(microsecond=0) if opt['--end'] else start.replace(hour=23, minute=59)
 
-    logger.debug(f"Looking for free slots between '{start.isoformat()}' and '{end.isoformat()}'.")
+    logger.debug("Looking for free slots between '{}' and '{}'.", start, end)
 
     # Prepare request for calendars with min and max date
     request_calendars = partial(finder.request_calendars, start=start.isoformat(), end=end.isoformat())
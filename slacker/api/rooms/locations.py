@@ -4,6 +4,7 @@ from PIL import Image, ImageDraw, ImageFont
 from loguru import logger
 
 from slacker.api.rooms.api import RoomFinder, Room
+from slacker.utils import atomic_path
 
 office_map = """
 ╔══════════════════╗          ╔═══════════════╦═════╗
@@ -147,13 +148,14 @@ def normalize(name):
 
 def create_image(text, image_path, size=(620, 240), text_pos_xy=(15, 5), font_size=14):
     black = (0, 0, 0)
-    logger.debug(f'Creating image at {image_path}')
+    logger.debug('Creating image at {}', image_path)
     img = Image.new('RGB', size, color='white')
     drawer = ImageDraw.Draw(img)
     font = ImageFont.truetype('/Library/Fonts/DejaVuSansMono.ttf', font_size)
     drawer.text(text_pos_xy, text, font=font, fill=black)
-    img.save(image_path, quality=95)
-    logger.debug(f'Image saved at {image_path}')
+    with atomic_path(image_path) as path:
+        img.save(path, quality=95)
+    logger.debug('Image saved at {}', image_path)
     return image_path
 
 
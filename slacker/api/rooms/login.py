@@ -1,6 +1,6 @@
+import calendar
 import datetime as dt
-import os
-import pickle
+import threading
 
 import requests_oauthlib
 from google.oauth2.credentials import Credentials
@@ -9,14 +9,23 @@ from google.auth.transport.requests import Request
 from loguru import logger
 
 from slacker.app_config import CALENDAR_CLIENT, CALENDAR_SECRET
+from slacker.models.credentials import CalendarCredentials
 
 
 class ApiLogin(Flow):
-    """Helper class to interact with google apis in a more dev-friendly/slack-compatible way"""
+    """Helper class to interact with google apis in a more dev-friendly/slack-compatible way
+
+    One instance serves all the requests of a process, so the oauth session it mutates is guarded by a lock.
+    Credentials are kept on the db, so that /set_token and the commands that read the calendars may run on any
+    web or commands worker.
+    """
     APP_TYPE = 'installed'
     AUTHORIZE_PROMPT = 'Please visit this URL to authorize the app: {url}'
     ENTER_CODE_MSG = 'Enter the authorization code: '
-    CRED_FILE = 'calendar.pk'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()
 
     @classmethod
     def from_secrets(cls, client_id, client_secret):
@@ -55,23 +64,34 @@ class ApiLogin(Flow):
     def get_authorization_url(self):
         """Return url that the user should follow to get an auth code"""
         # Set redirect uri that will be used on auth url
-        auth_url, _state = self.authorization_url()
+        with self._lock:
+            auth_url, _state = self.authorization_url()
         return auth_url
 
     def get_token(self, **kwargs):
-        """Fetch token, build credentials and save them into pickle file"""
+        """Fetch token, build credentials and save them on the db"""
         logger.debug('Fetching api token')
-        tk = self.fetch_token(**kwargs)
-        logger.debug(f'Api token: {tk}')
-        creds = self.credentials
+        with self._lock:
+            tk = self.fetch_token(**kwargs)
+            logger.debug('Api token: {}', tk)
+            creds = self.credentials
         logger.debug('Credentials built with api token')
         self.save_credentials(creds)
         logger.debug('Credentials stored.')
 
     @staticmethod
-    def save_credentials(token):
-        with open(ApiLogin.CRED_FILE, 'wb') as tk:
-            pickle.dump(token, tk)
+    def save_credentials(credentials):
+        expiry = credentials.expiry and calendar.timegm(credentials.expiry.utctimetuple())
+        CalendarCredentials.save({
+            'token': credentials.token,
+            'refresh_token': credentials.refresh_token,
+            'id_token': credentials.id_token,
+            'token_uri': credentials.token_uri,
+            'client_id': credentials.client_id,
+            'client_secret': credentials.client_secret,
+            'scopes': credentials.scopes,
+            'expires_at': expiry,
+        })
 
     @staticmethod
     def get_credentials():
@@ -87,21 +107,32 @@ class ApiLogin(Flow):
         Raises:
             ValueError: If there is no access token in the session.
         """
-        # Load it from file it is saved
-        if not os.path.exists(ApiLogin.CRED_FILE):
-            raise ValueError('No credentials file found. Have you completed auth flow?')
-
-        with open(ApiLogin.CRED_FILE, 'rb') as tk:
-            creds = pickle.load(tk)
+        info = CalendarCredentials.load()
+        if info is None:
+            raise ValueError('No credentials saved. Have you completed auth flow?')
+
+        creds = Credentials(
+            info['token'],
+            refresh_token=info['refresh_token'],
+            id_token=info['id_token'],
+            token_uri=info['token_uri'],
+            client_id=info['client_id'],
+            client_secret=info['client_secret'],
+            scopes=info['scopes'],
+        )
+        if info['expires_at'] is not None:
+            creds.expiry = dt.datetime.utcfromtimestamp(info['expires_at'])
         if creds.expired and creds.refresh_token:
             creds.refresh(Request())
+            ApiLogin.save_credentials(creds)
 
         return creds
 
     @property
     def credentials(self):
         """Just a wrapper property to give a friendly attribute name"""
-        return self.credentials_from_session(self.oauth2session, self.client_config)
+        with self._lock:
+            return self.credentials_from_session(self.oauth2session, self.client_config)
 
     @staticmethod
     def credentials_from_session(session, client_config: dict):
@@ -122,7 +153,17 @@ class ApiLogin(Flow):
         return credentials
 
 
-calendar = ApiLogin.from_secrets(
-    client_id=CALENDAR_CLIENT,
-    client_secret=CALENDAR_SECRET,
-)
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_calendar():
+    """The oauth session of the process, built on first use"""
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = ApiLogin.from_secrets(
+                client_id=CALENDAR_CLIENT,
+                client_secret=CALENDAR_SECRET,
+            )
+    return _calendar
@@ -1 +1 @@
-from .subte import get_subte
\ No newline at end of file
+from .subte import get_subte, get_subte_async
\ No newline at end of file
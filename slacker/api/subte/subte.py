@@ -3,17 +3,31 @@ import re
 import logging
 
 import os
-import requests
 
+from slacker import sessions
 from slacker.app_config import CABA_CLI_ID, CABA_SECRET
+from slacker.breakers import CircuitBreaker, Unavailable, age_note
+from slacker.deadline import Deadline
+from slacker.exceptions import SlackerException
 
 logger = logging.getLogger(__name__)
 
 LINEA = re.compile(r'Linea([A-Z]{1})')
+SUBTE_URL = 'https://apitransporte.buenosaires.gob.ar/subtes/serviceAlerts'
+breaker = CircuitBreaker('subte')
 
 
 def get_subte() -> str:
-    update = check_update()
+    update, saved_at = check_update()
+    return subte_message(update) + age_note(saved_at)
+
+
+async def get_subte_async(session, deadline=None) -> str:
+    update, saved_at = await check_update_async(session, deadline)
+    return subte_message(update) + age_note(saved_at)
+
+
+def subte_message(update) -> str:
     if update is None:
         msg = 'Internal error'
     elif not update:
@@ -26,30 +40,66 @@ def get_subte() -> str:
 
 def check_update():
     """Returns status incidents per line.
-    None if response code is not 200
+    None if the api fails and there is no good answer of it kept
     empty dict if there are no updates
     dict with linea as keys and incident details as values.
     Returns:
-        dict|None: mapping of line incidents
+        tuple[dict|None, float|None]: mapping of line incidents, and the time it was saved at if the api is down
+        and it is the last good answer
         {
           'A': 'rota',
           'E': 'demorada',
         }
     """
-    url = 'https://apitransporte.buenosaires.gob.ar/subtes/serviceAlerts'
-    params = {
+    try:
+        data, saved_at = breaker.call(fetch_alerts)
+    except Unavailable:
+        return None, None
+
+    return parse_alerts(data), saved_at
+
+
+def fetch_alerts():
+    r = sessions.get(SUBTE_URL, params=_params(), timeout=5)
+
+    if r.status_code != 200:
+        logger.info('Response failed. %s, %s', r.status_code, r.reason)
+        raise SlackerException(f'Subte api answered {r.status_code} {r.reason}')
+
+    return r.json()
+
+
+async def check_update_async(session, deadline=None):
+    """Same as check_update, without blocking the event loop"""
+    try:
+        data, saved_at = await breaker.call_async(lambda: fetch_alerts_async(session, deadline))
+    except Unavailable:
+        return None, None
+
+    return parse_alerts(data), saved_at
+
+
+async def fetch_alerts_async(session, deadline=None):
+    from aiohttp import ClientTimeout  # Only the asyncio serving mode loads aiohttp
+
+    timeout = ClientTimeout(total=(deadline or Deadline()).timeout(5, call='GET to subte'))
+    async with session.get(SUBTE_URL, params=_params(), timeout=timeout) as r:
+        if r.status != 200:
+            logger.info('Response failed. %s, %s', r.status, r.reason)
+            raise SlackerException(f'Subte api answered {r.status} {r.reason}')
+
+        return await r.json(content_type=None)
+
+
+def _params():
+    return {
         'client_id': CABA_CLI_ID,
         'client_secret': CABA_SECRET,
-        'json': 1,
+        'json': '1',
     }
-    r = requests.get(url, params=params, timeout=5)
-
-    if r.status_code != 200:
-        logger.info('Response failed. %s, %s' % (r.status_code, r.reason))
-        return None
 
-    data = r.json()
 
+def parse_alerts(data):
     alerts = data['entity']
     logger.info('Alerts: %s', alerts)
 
@@ -87,7 +137,7 @@ def _get_incident_text(alert):
                          for translation in translations
                          if translation['language'] == 'es'), None)
     if spanish_desc is None:
-        logger.info('raro, no tiene desc en español. %s' % alert)
+        logger.info('raro, no tiene desc en español. %s', alert)
         return None
 
     return spanish_desc['text']
@@ -1,17 +1,24 @@
-import hashlib
-import hmac
-import time
+import importlib
 import traceback
 
 from flask import Flask, request
 from loguru import logger
 
-from .app_config import CUERVOT_SIGNATURE, OVIBOT_SIGNATURE, HASH_SECRET, SQLALCHEMY_DATABASE_URI, DEBUG
-from .blueprints import commands as commands_bp, retroapp, interactivity, stickers, ovi_management, rooms
+from . import logs  # noqa: F401 Configures the log sink
+from . import deadline, sessions
+from .app_config import CUERVOT_SIGNATURE, OVIBOT_SIGNATURE, HASH_SECRET, SQLALCHEMY_DATABASE_URI, DEBUG, BLUEPRINTS
 from .database import db
+from .health import bp as health_bp, PATHS as HEALTH_PATHS
 from .manage import clean, init_db
+from .metrics import bp as metrics_bp, instrument, PATH as METRICS_PATH
+from .middleware import SlackSignatureMiddleware, ReplayCache
+from .profiler import profile_requests
+from .queries import track_requests, REPEAT_LIMIT
+from .tracing import trace_requests, exporter
 from .security import Crypto
-from .utils import reply
+from .slack_cli import Cuervot, OviBot
+from .utils import reply, ephemeral_reply
+from .worker import celery
 
 
 def create_app(config_object='slacker.app_config'):
@@ -23,25 +30,41 @@ def create_app(config_object='slacker.app_config'):
     register_blueprints(app)
     register_commands(app)
     register_error_handlers(app)
+    register_instrumentation(app)
+    register_middlewares(app)
 
     return app
 
 
+def reinit_after_fork(app):
+    """Recreate the connections a preloaded master would share with its forked workers.
+
+    Gunicorn calls it on each worker with --preload. See slacker/gunicorn_conf.py
+    """
+    db.session.remove()
+    db.get_engine(app).dispose()
+    # Same as celery does after its own forks. Drops the broker pool without closing the parent connections
+    celery._after_fork()
+    Cuervot.reset()
+    OviBot.reset()
+    sessions.reset()
+    logger.debug('Connections recreated after fork')
+
+
 def register_extensions(app):
     """Register db and bcrypt extensions."""
     db.init_app(app)
     Crypto.configure(HASH_SECRET)
-    logger.debug(f"Database: {SQLALCHEMY_DATABASE_URI}")
+    logger.debug('Database: {}', SQLALCHEMY_DATABASE_URI)
 
 
 def register_blueprints(app):
-    """Register Flask blueprints."""
-    app.register_blueprint(commands_bp.bp)
-    app.register_blueprint(retroapp.bp)
-    app.register_blueprint(interactivity.bp)
-    app.register_blueprint(ovi_management.bp)
-    app.register_blueprint(stickers.bp)
-    app.register_blueprint(rooms.bp)
+    """Register the enabled Flask blueprints. The modules of disabled ones, and their apis, are never imported."""
+    for name in app.config.get('BLUEPRINTS', BLUEPRINTS):
+        blueprint = importlib.import_module(f'slacker.blueprints.{name}')
+        app.register_blueprint(blueprint.bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
 
 
 def register_commands(app):
@@ -50,42 +73,40 @@ def register_commands(app):
     app.cli.add_command(init_db, 'init-db')
 
 
-def register_error_handlers(app):
-    """Register app handlers to respond nicely"""
-
-    @app.before_request
-    def verify_request_signature():
-        """
-        On each HTTP request that Slack sends, they add an X-Slack-Signature
-        HTTP header. The signature is created by combining the signing secret
-        with the body of the request they're sending using a standard
-        HMAC-SHA256 keyed hash.
+def register_instrumentation(app):
+    """Traces, metrics, query counts and deadlines of every request, and profiles of the slow ones if PROFILE_THRESHOLD
+    is set"""
+    exporter.configure(app.config.get('TRACE_FILE'), app.config.get('TRACE_COLLECTOR'))
+    trace_requests(app)
+    instrument(app)
+    track_requests(app, app.config.get('QUERY_REPEAT_LIMIT', REPEAT_LIMIT))
+    deadline.limit_requests(app)
+    threshold = app.config.get('PROFILE_THRESHOLD')
+    if threshold:
+        profile_requests(app, threshold, app.config.get('PROFILE_DIR', 'profiles'))
 
-        Docs: https://api.slack.com/docs/verifying-requests-from-slack#verification_token_deprecation
 
-        """
-        if DEBUG:
-            logger.debug('Dev mode. Bypassing signature checking..')
-            return
+def register_middlewares(app):
+    """Check slack signatures on the raw wsgi request, before flask builds it.
 
-        # Encode secrets as bytestrings
-        mainsecret = CUERVOT_SIGNATURE
-        ovisecret = OVIBOT_SIGNATURE
+    Slash commands and interactions of OviBot are signed with its own secret, all other routes belong to Cuervot.
+    Health checks and metrics scrapes don't come from slack and are not signed.
+    """
+    if DEBUG:
+        logger.debug('Dev mode. Bypassing signature checking..')
+        return
 
-        # Read request headers and reject it if it's too old
-        logger.debug('Headers:\n{}', request.headers)
+    app.wsgi_app = SlackSignatureMiddleware(
+        app.wsgi_app,
+        default_secret=CUERVOT_SIGNATURE,
+        secrets_by_prefix=[('/ovi', OVIBOT_SIGNATURE)],
+        exempt_paths=HEALTH_PATHS | {METRICS_PATH},
+        replay_cache=ReplayCache(app.config.get('REDIS_URL')),
+    )
 
-        try:
-            request_hash = request.headers['X-Slack-Signature']
-            timestamp = request.headers['X-Slack-Request-Timestamp']
-        except KeyError:
-            return bad_request('Missing required headers')
 
-        if abs(time.time() - int(timestamp)) > 60 * 2:
-            return bad_request('Request too old')
-
-        if not verify_signatures(timestamp, request_hash, (mainsecret, ovisecret)):
-            return bad_request('Failed request authenticity check. You are not slack..')
+def register_error_handlers(app):
+    """Register app handlers to respond nicely"""
 
     @app.errorhandler(400)
     def bad_request(error):
@@ -95,25 +116,13 @@ def register_error_handlers(app):
     def not_found(error):
         return reply({'text': 'Resource not found', 'error': repr(error)})
 
+    @app.errorhandler(deadline.DeadlineExceeded)
+    def out_of_time(error):
+        logger.warning('{} ran out of time. {}', request.path, error)
+        return ephemeral_reply(deadline.OUT_OF_TIME_MESSAGE)
+
     @app.errorhandler(500)
     def server_error(error):
         exception_text = traceback.format_exc()
         logger.error(f'Error: {repr(error)}\nTraceback:\n{exception_text}')
         return reply({'text': 'Oops ¯\\_(ツ)_/¯. Errors happen', 'error': repr(error)})
-
-
-def verify_signatures(timestamp, signature, signing_secrets):
-    return any(verify_signature(timestamp, signature, app_signing_secret) for app_signing_secret in signing_secrets)
-
-
-def verify_signature(timestamp, signature, signing_secret):
-    # Verify the request signature of the request sent from Slack
-    # Generate a new hash using the app's signing secret, the request timestamp and data
-    req = f'v0:{timestamp}:'.encode('utf-8') + request.get_data()
-    request_hash = 'v0=' + hmac.new(
-        signing_secret.encode('utf-8'),
-        req,
-        hashlib.sha256
-    ).hexdigest()
-
-    return hmac.compare_digest(request_hash, signature)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -9,9 +10,17 @@ ENV = os.getenv('FLASK_ENV', 'production')
 DEBUG = ENV == 'development'
 TESTING = False
 
+# Logs below this level are dropped. Keep 1 in LOG_DEBUG_SAMPLE debug lines of each call site, see slacker/logs.py
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+LOG_DEBUG_SAMPLE = int(os.getenv('LOG_DEBUG_SAMPLE', '1'))
+
 # Alchemy env vars
 SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Fail fast instead of hanging a worker when postgres is unreachable
+SQLALCHEMY_ENGINE_OPTIONS = {}
+if SQLALCHEMY_DATABASE_URI.startswith('postgres'):
+    SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {'connect_timeout': 3}
 
 # Bot
 CUERVOT=os.environ['BOT_TOKEN']
@@ -21,6 +30,10 @@ ERRORS_CHANNEL=os.environ['ERRORS_CHANNEL']
 CUERVOT_SIGNATURE=os.environ['CUERVOT_SIGNATURE']
 OVIBOT_SIGNATURE=os.environ['OVIBOT_SIGNATURE']
 
+# Slack Web API and Google api discovery urls. Load tests point them to local stand-ins, see benchmarks/loadtest.py
+SLACK_API_URL = os.getenv('SLACK_API_URL', 'https://www.slack.com/api/')
+GOOGLE_DISCOVERY_URL = os.getenv('GOOGLE_DISCOVERY_URL')
+
 # Crypto secret
 HASH_SECRET = os.environ['HASH_SECRET']
 
@@ -41,3 +54,45 @@ CALENDAR_SECRET=os.environ['CALENDAR_SECRET']
 CELERY_BROKER=os.environ['CELERY_BROKER']
 CELERY_BACKEND=os.environ['CELERY_BACKEND']
 
+# Rate limits are shared through redis. Override them with i.e RATE_LIMITS=/find_free_rooms=5/60,/ovi_list_vms:U123=5/60
+REDIS_URL = os.getenv('REDIS_URL', CELERY_BROKER)
+RATE_LIMITS = os.getenv('RATE_LIMITS', '')
+
+# External apis. Connections kept alive per host, retries of failed GETs and timeouts by host in seconds that override
+# the ones of the code, i.e HTTP_TIMEOUTS=apitransporte.buenosaires.gob.ar=3,nolaborables.com.ar=2
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+HTTP_TIMEOUTS = os.getenv('HTTP_TIMEOUTS', '')
+
+# Failed calls in a row that open the breaker of an external api, and seconds it stays open. Shared through redis
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '5'))
+BREAKER_COOLDOWN = int(os.getenv('BREAKER_COOLDOWN', '60'))
+
+# Seconds a request may spend on its calls to external apis, slack and the database, and a commands worker task
+COMMAND_DEADLINE = float(os.getenv('COMMAND_DEADLINE', '2.5'))
+DEFERRED_DEADLINE = float(os.getenv('DEFERRED_DEADLINE', '60'))
+
+# Run slow commands on the commands worker and answer through their response_url
+DEFERRED_COMMANDS = os.getenv('DEFERRED_COMMANDS', 'false').lower() == 'true'
+# Run them inline while they keep within their latency budget, see slacker/registry.py
+ADAPTIVE_COMMANDS = os.getenv('ADAPTIVE_COMMANDS', 'true').lower() == 'true'
+
+# The commands worker serves the metrics of its tasks on this port. Its pool processes write them on a dir of their own,
+# emptied on start, apart from the prometheus_multiproc_dir of the web processes
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '9102'))
+WORKER_METRICS_DIR = os.getenv('WORKER_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'slacker_commands_metrics'))
+
+# Export spans in zipkin json to a file, one per line, and/or to a collector, i.e http://localhost:9411/api/v2/spans
+TRACE_FILE = os.getenv('TRACE_FILE')
+TRACE_COLLECTOR = os.getenv('TRACE_COLLECTOR')
+
+# Warn about statements that run more than this many times in one request or task, usually N+1 queries
+QUERY_REPEAT_LIMIT = int(os.getenv('QUERY_REPEAT_LIMIT', '5'))
+
+# Write a sampled profile of requests and commands worker tasks slower than this many seconds. 0 disables profiling
+PROFILE_THRESHOLD = float(os.getenv('PROFILE_THRESHOLD', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+# Blueprints served by this process, i.e BLUEPRINTS=commands,stickers,interactivity. Disabled ones are never imported
+ALL_BLUEPRINTS = 'commands,retroapp,interactivity,ovi_management,stickers,rooms'
+BLUEPRINTS = [name.strip() for name in os.getenv('BLUEPRINTS', ALL_BLUEPRINTS).split(',') if name.strip()]
@@ -1,20 +1,84 @@
-import re
+from functools import lru_cache
 
 from flask import Blueprint, request
 from loguru import logger
 
 from slacker.api.feriados import get_feriadosarg
-from slacker.api.hoypido import get_hoypido_specials, get_hoypido_by_day, get_hoypido_all
+from slacker.api.hoypido import get_hoypido
 from slacker.api.subte import get_subte
 from slacker.models.poll import Poll
 from slacker.models.user import get_or_create_user
+from slacker.ratelimit import Limit
+from slacker.registry import section, help_text, CPU, DB, HTTP, QUEUE, SLACK
+from slacker.responses import Template, Fragment, dumps
 from slacker.slack_cli import slack_cli
-from slacker.tasks_proxy import send_message_async
+from slacker.tasks_proxy import send_message_async, send_task
 from slacker.utils import reply, command_response, USER_REGEX, ephemeral_reply, OK
 
-from slacker.worker import celery
 
 bp = Blueprint('commands', __name__)
+command = section('General')
+meta = section('Meta')
+
+# Block Kit messages, encoded once. Slack takes blocks encoded as a json string
+POLL = Template([
+    {
+        "type": "section",
+        "text": {"type": "mrkdwn", "text": '{{text}}'}
+    },
+    {'type': 'actions', 'block_id': '{{poll_id}}', 'elements': '{{buttons}}'}
+])
+PING = Template([
+    {
+        "type": "section",
+        "text": {
+            "type": "mrkdwn",
+            "text": '{{text}}'
+        }
+    },
+    {
+        "type": "actions",
+        'block_id': '{{block_id}}',
+        "elements": [
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Pong"
+                },
+                "style": "primary",
+                "value": "YES",
+                "action_id": '{{action_id}}'
+            },
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Not now"
+                },
+                "style": "danger",
+                "value": "NO",
+            }
+        ]
+    }
+])
+
+
+@lru_cache(maxsize=None)
+def poll_buttons(options):
+    """Vote buttons of a poll with that many options"""
+    return Fragment(dumps([
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": str(option_number),
+            },
+            "value": f'{option_number}',
+            "action_id": f'poll_vote:{option_number}'
+        }
+        for option_number in range(1, options + 1)
+    ]))
 
 
 @bp.route('/', methods=('GET', 'POST'))
@@ -25,72 +89,36 @@ def index():
 
 
 @bp.route('/help', methods=('GET', 'POST'))
+@meta('/skills', 'Shows this message', io=(CPU,))
 def help():
     """Lists all bot commands."""
-    commands = """
-    *General*
-    - `/poll`
-    - `/feriados`
-    - `/hoypido`
-    - `/subte`
-
-    *Retro Management*
-    - `/retro_help`
-    - `/add_team`
-    - `/start_sprint`
-    - `/add_retro_item`
-    - `/show_retro_items`
-    - `/end_sprint`
-    - `/team_members`
-
-    *Stickers*
-    - `/add_sticker`
-    - `/delete_sticker`
-    - `/send_sticker`
-    - `/show_stickers`
-
-    *OVI Management (Soon ™)*
-    - `/start`
-    - `/stop`
-    - `/list`
-    - `/info`
-    - `/redeploy`
-    - `/snapshots`
-
-    *Meta*
-    - `/skills` (Shows this message)
-
-    """
-    return command_response(commands)
+    return command_response(help_text())
 
 
 @bp.route('/subte', methods=('GET', 'POST'))
+@command('/subte', 'Status of the subway lines', io=(HTTP,), cache=60, idempotent=True)
 def subte():
     status = get_subte()
     return command_response(status)
 
 
 @bp.route('/feriados', methods=('GET', 'POST'))
+@command('/feriados', 'Next holidays', io=(HTTP,), cache=600, idempotent=True)
 def feriados():
     response = get_feriadosarg()
     return command_response(response)
 
 
 @bp.route('/hoypido', methods=('GET', 'POST'))
+@command('/hoypido', "Today's menu. `/hoypido -d <day>` for another day, `/hoypido --all` for the week",
+         io=(HTTP,), cache=600, limit=Limit(3, 60, args='--all'), idempotent=True)
 def hoypido():
-    args = request.form.get('text', '')
-    by_day = re.search(r'-d \w', args)
-    if by_day:
-        menus = get_hoypido_by_day(by_day.group(1))
-    elif '--all' in args:
-        menus = get_hoypido_all()
-    else:
-        menus = get_hoypido_specials()
-
+    menus = get_hoypido(request.form.get('text', ''))
     return command_response(menus)
 
 
 @bp.route('/poll', methods=('GET', 'POST'))
+@command('/poll', 'Ask a question. `/poll is this the real life? yes no`', io=(DB, QUEUE))
 def create_poll():
     """Creates a poll from a user question and options.
 
@@ -104,32 +132,13 @@ def create_poll():
     if error:
         return command_response(error)
 
-    msg_section = {
-        "type": "section",
-        "text": {"type": "mrkdwn", "text": str(poll)}
-    }
-
-    block_elems = [
-        {
-            "type": "button",
-            "text": {
-                "type": "plain_text",
-                "text": str(option_number),
-            },
-            "value": f'{option_number}',
-            "action_id": f'poll_vote:{option_number}'
-        }
-        for option_number in range(1, len(poll.options) + 1)
-    ]
-    poll_message_block = [
-        msg_section,
-        {'type': 'actions', 'block_id': f'{poll.id}', 'elements': block_elems}
-    ]
-    send_message_async(channel, blocks=poll_message_block)
+    send_message_async(channel, blocks=POLL.render(text=str(poll), poll_id=str(poll.id),
+                                                   buttons=poll_buttons(len(poll.options))).decode())
     return OK, 200
 
 
 @bp.route('/ping', methods=('GET', 'POST'))
+@command('/ping', 'Challenge someone to a ping pong match. `/ping @user`', io=(DB, SLACK, QUEUE))
 def ping():
     text = request.form.get('text')
     user_id = request.form.get('user_id')
@@ -143,39 +152,10 @@ def ping():
     mention = match.groupdict()['user_id']
     user = get_or_create_user(slack_cli, user_id)
     defied_user = get_or_create_user(slack_cli, mention)
-    block = [
-        {
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": f"Ping.. :table_tennis_paddle_and_ball: from `{user.first_name}`"
-            }
-        },
-        {
-            "type": "actions",
-            'block_id': f'ping_block:{user_id}:{defied_user.user_id}',
-            "elements": [
-                {
-                    "type": "button",
-                    "text": {
-                        "type": "plain_text",
-                        "text": "Pong"
-                    },
-                    "style": "primary",
-                    "value": "YES",
-                    "action_id": f"{defied_user.first_name}"
-                },
-                {
-                    "type": "button",
-                    "text": {
-                        "type": "plain_text",
-                        "text": "Not now"
-                    },
-                    "style": "danger",
-                    "value": "NO",
-                }
-            ]
-        }
-    ]
-    celery.send_task("tasks.send_message_with_blocks", args=(block, mention))
+    block = PING.render(
+        text=f"Ping.. :table_tennis_paddle_and_ball: from `{user.first_name}`",
+        block_id=f'ping_block:{user_id}:{defied_user.user_id}',
+        action_id=f"{defied_user.first_name}",
+    )
+    send_task("tasks.send_message_with_blocks", args=(block.decode(), mention))
     return ephemeral_reply(f'{defied_user.first_name} was challenged :table_tennis_paddle_and_ball:')
@@ -6,18 +6,18 @@ necessary.
 import json
 
 from loguru import logger
-from flask import request
+from flask import request, current_app
 
+from slacker.actions import ActionRouter
 from slacker.api.poll import user_has_voted
-from slacker.blueprints.ovi_management import handle_aws_submission
 from slacker.database import db
 from slacker.models import Poll, Vote
 from slacker.slack_cli import Slack
-from slacker.tasks_proxy import send_ephemeral_message_async
-from slacker.utils import BaseBlueprint, reply, ephemeral_reply, OK, reply_raw
-from slacker.worker import celery
+from slacker.tasks_proxy import send_ephemeral_reply_async, send_task
+from slacker.utils import BaseBlueprint, OK, reply_raw
 
 bp = BaseBlueprint('interactive', __name__, url_prefix='/interactive')
+router = ActionRouter()
 
 
 @bp.route("/message_actions", methods=["POST"])
@@ -25,85 +25,99 @@ def message_actions():
     logger.debug("Handling message action..")
     action = json.loads(request.form["payload"])
     try:
-        return handle_action(action)
+        return reply_raw(router.dispatch(action, defer=current_app.config.get('DEFERRED_COMMANDS')))
     except Exception as e:
-        send_ephemeral_message_async(f'Something bad happened.\n`{repr(e)}`',
-                                     channel=action['channel']['id'],
-                                     user=action['user']['id'])
+        send_ephemeral_reply_async(f'Something bad happened.\n`{repr(e)}`',
+                                   response_url=action.get('response_url'),
+                                   channel=action['channel']['id'],
+                                   user=action['user']['id'])
         return reply_raw(OK)
 
 
-def handle_action(action):
-    logger.debug(f"Action: {action}")
-
-    if action["type"] == "dialog_submission" and action.get('callback_id', '').startswith('aws_callback'):
-        resp = handle_aws_submission(action)
-
-    elif action["type"] == "block_actions":
-        the_action = action['actions'][0]
-        if the_action['action_id'].startswith('send_sticker_action_id'):
-            _, sticker_name = the_action['action_id'].split(':', 1)
-            img_url = the_action['value']
-            sticker = [
-                {
-                    "type": "image",
-                    "title": {
-                        "type": "plain_text",
-                        "text": sticker_name,
-                    },
-                    "image_url": img_url,
-                    "alt_text": sticker_name
-                }
-            ]
-            logger.debug(f'Sending sticker.. {img_url}')
-            r = Slack.chat_postMessage(channel=action['channel']['id'], blocks=sticker)
-            if not r['ok']:
-                logger.error("Sticker not sent. %s" % r)
-
-        elif the_action['action_id'].startswith('poll_vote'):
-            poll_id = the_action['block_id']
-            poll = Poll.find(id=poll_id)
-            if not poll:
-                return reply('Poll not found.')
-
-            vote_choice = the_action['value']
-            option = next((op for op in poll.options if op.number == int(vote_choice)), None)
-            if not option:
-                logger.debug('Vote choice %s not found on poll %s' % (vote_choice, poll.id))
-                return ephemeral_reply('Vote choice not found')
-
-            # Add vote for chosen option
-            user_id = action['user']['id']
-            if user_has_voted(user_id, poll.id):
-                logger.debug('User has already voted')
-                send_ephemeral_message_async('Cheater! You have already voted.',
-                                             channel=action['channel']['id'],
-                                             user=user_id)
-                return reply_raw(OK)
-
-            db.session.add(Vote(poll=poll, option=option, user_id=user_id))
-            db.session.commit()
-
-            blocks = action['message']['blocks']
-            # Update block's text with new votes
-            blocks[0]['text']['text'] = str(poll)
-            r = Slack.chat_update(channel=action['channel']['id'], ts=action['message']['ts'], blocks=blocks)
-            if not r['ok']:
-                logger.error(r)
-                return reply('Error updating vote')
-
-            logger.debug('Poll vote was updated.')
-
-        elif the_action['block_id'].startswith('ping'):
-            _, user, mentioned_id = the_action['block_id'].split(':')
-            accept = the_action['value']
-            challenged_user = the_action['action_id']
-            msg = f'Challenge accepted by {challenged_user} :muscle:' if accept == 'YES' else 'Not now..'
-            celery.send_task("tasks.send_message", args=(msg, mentioned_id))
-
-        resp = OK
-    else:
-        logger.error('No handler for this action')
-        resp = OK
-
-    return reply_raw(resp)
+@router.dialog('aws_callback')
+def aws_submission(action):
+    from slacker.blueprints.ovi_management import handle_aws_submission  # Ovi may be disabled on this worker
+    return handle_aws_submission(action)
+
+
+@router.action('send_sticker_action_id', deferred=True)
+def send_sticker(action):
+    the_action = action['actions'][0]
+    _, sticker_name = the_action['action_id'].split(':', 1)
+    img_url = the_action['value']
+    logger.debug('Sending sticker.. {}', img_url)
+    r = Slack.chat_postMessage(channel=action['channel']['id'], blocks=sticker_message(sticker_name, img_url))
+    if not r['ok']:
+        logger.error('Sticker not sent. {}', r)
+
+
+@router.action('poll_vote', deferred=True)
+def vote(action):
+    the_action = action['actions'][0]
+    user_id = action['user']['id']
+    poll_text, error = add_vote(the_action['block_id'], the_action['value'], user_id)
+    if error:
+        send_ephemeral_reply_async(error,
+                                   response_url=action.get('response_url'),
+                                   channel=action['channel']['id'],
+                                   user=user_id)
+        return
+
+    blocks = action['message']['blocks']
+    # Update block's text with new votes
+    blocks[0]['text']['text'] = poll_text
+    r = Slack.chat_update(channel=action['channel']['id'], ts=action['message']['ts'], blocks=blocks)
+    if not r['ok']:
+        logger.error('Poll vote not updated. {}', r)
+        return
+
+    logger.debug('Poll vote was updated.')
+
+
+@router.block('ping_block')
+def ping(action):
+    the_action = action['actions'][0]
+    _, user, mentioned_id = the_action['block_id'].split(':')
+    accept = the_action['value']
+    challenged_user = the_action['action_id']
+    msg = f'Challenge accepted by {challenged_user} :muscle:' if accept == 'YES' else 'Not now..'
+    send_task("tasks.send_message", args=(msg, mentioned_id))
+
+
+def sticker_message(sticker_name, img_url):
+    return [
+        {
+            "type": "image",
+            "title": {
+                "type": "plain_text",
+                "text": sticker_name,
+            },
+            "image_url": img_url,
+            "alt_text": sticker_name
+        }
+    ]
+
+
+def add_vote(poll_id, vote_choice, user_id):
+    """Save the user vote on the poll.
+
+    Returns:
+        tuple[str, str]: poll text with the updated votes, or an error message for the user
+    """
+    poll = Poll.find(id=poll_id)
+    if not poll:
+        return None, 'Poll not found.'
+
+    option = next((op for op in poll.options if op.number == int(vote_choice)), None)
+    if not option:
+        logger.debug('Vote choice {} not found on poll {}', vote_choice, poll.id)
+        return None, 'Vote choice not found'
+
+    if user_has_voted(user_id, poll.id):
+        logger.debug('User has already voted')
+        return None, 'Cheater! You have already voted.'
+
+    db.session.add(Vote(poll=poll, option=option, user_id=user_id))
+    db.session.commit()
+
+    return str(poll), None
@@ -8,6 +8,8 @@ from slacker.database import db
 from slacker.exceptions import SlackerException
 from slacker.models import VM, VMOwnership
 from slacker.models.user import get_or_create_user
+from slacker.ratelimit import Limit
+from slacker.registry import section, DB, QUEUE, SLACK
 from slacker.slack_cli import Slack
 from slacker.tasks_proxy import (
     start_vms_task,
@@ -15,7 +17,7 @@ from slacker.tasks_proxy import (
     list_vms_task,
     redeploy_vm_task,
     get_snapshots_task,
-    send_ephemeral_message_async,
+    send_ephemeral_reply_async,
 )
 from slacker.utils import BaseBlueprint, reply, command_response, OK
 
@@ -28,6 +30,7 @@ REDEPLOY_USAGE = "Usage: `/ovi_redeploy konsole <snapshot_id>`\nCheck `/snapshot
 WRONG_ALIAS_MESSAGE = "You don't have a VM under alias '{alias}'"
 
 bp = BaseBlueprint('ovi', __name__, url_prefix='/ovi')
+command = section('OVI Management')
 
 
 class OviException(SlackerException):
@@ -47,6 +50,8 @@ def index():
 
 
 @bp.route('/register', methods=('GET', 'POST'))
+# The dialog trigger expires in 3 seconds, it can't wait for the commands worker
+@command('/ovi_register', 'Register your VMs', io=(SLACK,), deferrable=False)
 def register():
     """Open Register VMs dialog. interactivity blueprint will handle form input"""
     user_id = request.form['user_id']
@@ -93,9 +98,9 @@ def handle_aws_submission(action):
     token = form['token']
     raw_vms = form['vms_info']
 
-    logger.debug(f"Parsing VMs input:\n{raw_vms}")
+    logger.debug('Parsing VMs input:\n{}', raw_vms)
     vms_info = load_vms_info(raw_vms)
-    logger.debug(f"User vms:\n{vms_info}")
+    logger.debug('User vms:\n{}', vms_info)
 
     if vms_info is None:
         resp = {
@@ -105,16 +110,16 @@ def handle_aws_submission(action):
             }]
         }
     else:
-        logger.debug(f"Get or create user. Id '{user_id}'")
+        logger.debug("Get or create user. Id '{}'", user_id)
         user = get_or_create_user(Slack, user_id)
-        logger.debug("User: %s" % user.real_name)
+        logger.debug('User: {}', user.real_name)
 
         try:
-            logger.debug(f"Saving VMs of '{user.real_name}'..")
+            logger.debug("Saving VMs of '{}'..", user.real_name)
             save_user_vms(user, name, token, vms_info)
             logger.debug("VMs saved")
         except Exception as e:
-            logger.info(f"Something went bad while saving vms, {repr(e)}")
+            logger.info('Something went bad while saving vms, {!r}', e)
             resp = {
                 'errors': [{
                     'name': 'vms_info',
@@ -125,8 +130,11 @@ def handle_aws_submission(action):
             vms = '\n'.join(f'`{vm}: {hash}`' for vm, hash in vms_info.items())
             msg = f':check: VMs saved successfully.\nAPI User: `{name}`\nVMs:\n{vms}'
 
-            promise = send_ephemeral_message_async(msg, channel=action['channel']['id'], user=user_id)
-            logger.debug("Task %s sent to notify user of aws submission success." % promise)
+            promise = send_ephemeral_reply_async(msg,
+                                                 response_url=action.get('response_url'),
+                                                 channel=action['channel']['id'],
+                                                 user=user_id)
+            logger.debug('Task {} sent to notify user of aws submission success.', promise)
 
             resp = OK
 
@@ -151,7 +159,7 @@ def load_vms_info(vms):
             vm_name, vmid = vm.split('=')
             vms_info.update({f'{vm_name.strip()}': f'{vmid.strip()}'})
         except Exception:
-            logger.info("Bad vsm info format. '%r'" % vms)
+            logger.info("Bad vsm info format. '{!r}'", vms)
             return None
 
     return vms_info
@@ -166,7 +174,7 @@ def save_user_vms(user, ovi_name, ovi_token, new_user_vms):
         )
 
     for alias, vm_id in new_user_vms.items():
-        logger.debug(f"Atttempting to add VM with alias={alias} and id={vm_id}")
+        logger.debug('Atttempting to add VM with alias={} and id={}', alias, vm_id)
         vm = VM.query.get(vm_id)
         if not vm:
             vm = VM(id=vm_id)
@@ -177,7 +185,7 @@ def save_user_vms(user, ovi_name, ovi_token, new_user_vms):
             owned_vm = VMOwnership(vm=vm, user=user, alias=alias)
             db.session.add(owned_vm)
         else:
-            logger.debug(f"Ignoring {str(owned_vm)} because it's already on database.")
+            logger.debug("Ignoring {} because it's already on database.", owned_vm)
 
     user.ovi_name = ovi_name
     user.ovi_token = ovi_token
@@ -187,6 +195,7 @@ def save_user_vms(user, ovi_name, ovi_token, new_user_vms):
 
 
 @bp.route('/start', methods=('GET', 'POST'))
+@command('/ovi_start', 'Start VMs. `/ovi_start <vm_name> [<vm_name> ...]`', io=(DB, SLACK, QUEUE))
 def start():
     """Start a vm owned by a user"""
     target_vms_raw = request.form.get('text')
@@ -201,8 +210,9 @@ def start():
     # Send async task
     task_id = start_vms_task(owned_vms, target_vms, user.ovi_name, user.ovi_token,
                              user=user_id,
-                             channel=channel)
-    logger.debug(f"Task '{task_id}' sent to start vms of user {user.real_name}. VMs: {target_vms}")
+                             channel=channel,
+                             response_url=request.form.get('response_url'))
+    logger.debug("Task '{}' sent to start vms of user {}. VMs: {}", task_id, user.real_name, target_vms)
 
     return command_response('Start VMs task sent :check:')
 
@@ -234,6 +244,7 @@ def _validate_ovi_request(target_vms: str,
 
 
 @bp.route('/stop', methods=('GET', 'POST'))
+@command('/ovi_stop', 'Stop VMs. `/ovi_stop <vm_name> [<vm_name> ...]`', io=(DB, SLACK, QUEUE))
 def stop():
     target_vms = request.form.get('text')
     user_id = request.form['user_id']
@@ -247,13 +258,15 @@ def stop():
     # Send async task
     task_id = stop_vms_task(user_vms, target_vms, user.ovi_name, user.ovi_token,
                             user=user_id,
-                            channel=channel)
-    logger.debug(f"Task '{task_id}' sent to stop '{target_vms}' of user {user.real_name}.")
+                            channel=channel,
+                            response_url=request.form.get('response_url'))
+    logger.debug("Task '{}' sent to stop '{}' of user {}.", task_id, target_vms, user.real_name)
 
     return command_response('Stop VMs task sent :check:')
 
 
 @bp.route('/list_vms', methods=('GET', 'POST'))
+@command('/ovi_list_vms', 'List your VMs on OVI', io=(DB, SLACK, QUEUE), limit=Limit(2, 60))
 def list_vms():
     """List VMs owned by the user on oviup"""
     timeout = request.form.get('text', 30)
@@ -264,13 +277,15 @@ def list_vms():
     # No need to get user owned vms nor to receive alias from user
     task_id = list_vms_task({}, timeout, user.ovi_name, user.ovi_token,
                             user=user_id,
-                            channel=channel_id)
-    logger.debug(f"Task '{task_id}' sent to show remote vms of user {user.real_name}.")
+                            channel=channel_id,
+                            response_url=request.form.get('response_url'))
+    logger.debug("Task '{}' sent to show remote vms of user {}.", task_id, user.real_name)
 
     return command_response('List VMs task sent :check: (This may take a while..)')
 
 
 @bp.route('/redeploy', methods=('GET', 'POST'))
+@command('/ovi_redeploy', 'Redeploy a VM. `/ovi_redeploy konsole <snapshot_id>`', io=(DB, SLACK, QUEUE))
 def redeploy():
     target_vms = request.form.get('text')
     if not target_vms:
@@ -292,9 +307,10 @@ def redeploy():
     # Send async task
     task_id = redeploy_vm_task(user_vms, alias, snapshot_id,  user.ovi_name, user.ovi_token,
                                user=user_id,
-                               channel=channel_id)
+                               channel=channel_id,
+                               response_url=request.form.get('response_url'))
 
-    logger.debug(f"Task '{task_id}' sent to redeploy '{alias}'' of user {user.real_name} to image {snapshot_id}")
+    logger.debug("Task '{}' sent to redeploy '{}' of user {} to image {}", task_id, alias, user.real_name, snapshot_id)
 
     return command_response('Redeploy task sent :check:')
 
@@ -318,18 +334,23 @@ def _validate_command_syntax(text: str):
 
 
 @bp.route('/snapshots', methods=('GET', 'POST'))
+@command('/ovi_snapshots', 'Snapshots available to redeploy', io=(DB, SLACK, QUEUE))
 def snapshots():
     user_id = request.form['user_id']
     user = get_or_create_user(Slack, user_id)
 
     # Send async task
-    task_id = get_snapshots_task(user.ovi_name, user.ovi_token, user=user_id, channel=request.form['channel_id'])
-    logger.debug(f"Task '{task_id}' sent to show available redeploy snapshots to {user.real_name}")
+    task_id = get_snapshots_task(user.ovi_name, user.ovi_token,
+                                 user=user_id,
+                                 channel=request.form['channel_id'],
+                                 response_url=request.form.get('response_url'))
+    logger.debug("Task '{}' sent to show available redeploy snapshots to {}", task_id, user.real_name)
 
     return command_response('Snapshots task sent :check:')
 
 
 @bp.route('/my_vms', methods=('GET', 'POST'))
+@command('/ovi_my_vms', 'VMs you registered', io=(DB, SLACK), idempotent=True)
 def user_owned_vms():
     """List VMs that were added by the user into slack and can be controlled through the bot"""
     user_id = request.form['user_id']
@@ -347,6 +368,7 @@ def user_owned_vms():
 
 
 @bp.route('/delete_my_vms', methods=('GET', 'POST'))
+@command('/ovi_delete_my_vms', 'Forget the VMs you registered', io=(DB, SLACK))
 def delete_my_vms():
     """Delete VMs that were added by the user into slack and can be controlled through the bot"""
     user_id = request.form['user_id']
@@ -12,9 +12,11 @@ from slacker.models import Team, Sprint, RetroItem
 from slacker.models.model_utils import get_or_create
 from slacker.models.retro.crud import add_team_members, get_team_members
 from slacker.models.user import get_or_create_user
+from slacker.registry import section, CPU, DB, SLACK
 from slacker.utils import reply, BaseBlueprint, format_datetime
 
 bp = BaseBlueprint('retro', __name__, url_prefix='/retro')
+command = section('Retro Management')
 
 # Match user_id and user_name unescaped from slack
 # i.e: foo <@U1234|john> -> user_id=U1234, name=john
@@ -32,6 +34,7 @@ def index():
 
 
 @bp.route('/add_team', methods=('POST', ))
+@command('/add_team', 'Create a team. `/add_team my_team @member1 @member2`', io=(DB, SLACK))
 def add_team() -> str:
     text = request.form.get('text')
     if not text:
@@ -75,6 +78,7 @@ def add_team() -> str:
 
 
 @bp.route('/start_sprint', methods=('POST',))
+@command('/start_sprint', 'Start a sprint for your team. `/start_sprint <sprint_name>`', io=(DB, SLACK))
 def start_sprint_callback() -> str:
     """Usage: /start_sprint <sprint_name>"""
     sprint_name = request.form.get('text')
@@ -95,6 +99,7 @@ def start_sprint_callback() -> str:
 
 
 @bp.route('/add_item', methods=('GET', 'POST'))
+@command('/add_retro_item', 'Save an item for the retro. `/add_retro_item <text>`', io=(DB, SLACK))
 def add_item_callback() -> str:
     item = request.form.get('text')
     if not item:
@@ -117,6 +122,7 @@ def add_item_callback() -> str:
 
 
 @bp.route('/show_items', methods=('GET', 'POST'))
+@command('/show_retro_items', 'Show the items of the running sprint', io=(DB, SLACK), idempotent=True)
 def show_items() -> str:
     user_id = request.form.get('user_id')
     user = get_or_create_user(slack_cli, user_id)
@@ -143,6 +149,7 @@ def show_items() -> str:
 
 
 @bp.route('/end_sprint', methods=('GET', 'POST'))
+@command('/end_sprint', 'End the running sprint', io=(DB, SLACK))
 def end_sprint_callback() -> str:
     user_id = request.form.get('user_id')
     user = get_or_create_user(slack_cli, user_id)
@@ -158,6 +165,7 @@ def end_sprint_callback() -> str:
 
 
 @bp.route('/team_members', methods=('POST', ))
+@command('/team_members', 'Members of a team. `/team_members [team]`', io=(DB, SLACK), idempotent=True)
 def team_members() -> str:
     team_name = request.form.get('text')
     if not team_name:
@@ -178,6 +186,7 @@ def team_members() -> str:
 
 
 @bp.route('/help', methods=('POST', ))
+@command('/retro_help', 'How retros work', io=(CPU,))
 def help():
     msg = """
 Teams have members. Add them with `/add_team my_team_name @member1 @member2 ...`
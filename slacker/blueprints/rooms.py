@@ -6,64 +6,67 @@ Blueprint to manage rooms functionality
 """
 from os import path
 
-from flask import request, make_response
+from flask import request
 from loguru import logger
 from google.auth.transport.requests import Request
 
 from slacker.api.rooms.locations import (
     get_room_location, create_image_from_map, draw_office_map, get_image_dir, OFFICE_MAP
 )
-from slacker.api.rooms.login import calendar
+from slacker.api.rooms.login import get_calendar
 from slacker.api.rooms.api import get_free_rooms, RoomFinder
-from slacker.slack_cli import OviBot
+from slacker.ratelimit import Limit
+from slacker.registry import section, CPU, DB, HTTP, QUEUE
 from slacker.tasks_proxy import upload_file_async
 from slacker.utils import BaseBlueprint, reply, monospace, reply_text
 
 bp = BaseBlueprint('rooms', __name__, url_prefix='/rooms')
+command = section('Rooms')
 
 
 @bp.route('/request_user_consent', methods=('GET', 'POST'))
+@command('/authorize', 'Let the bot read the rooms calendars', io=(CPU,))
 def get_authorization_url():
     """First step of oauth2 flow"""
-    channel = request.form.get('channel_id')
-    user = request.form.get('user_id')
-    url = calendar.get_authorization_url()
+    url = get_calendar().get_authorization_url()
     msg = (
         f'Visit the following url to get the authorization code:\n{url}\n'
         'Then enter the auth code via `/set_token <auth_code>`'
     )
-    r = OviBot.chat_postEphemeral(channel=channel, user=user, text=msg)
-    if not r['ok']:
-        logger.error(f"Auth url not sent to user. Error {r['error']}")
-    logger.info(f'Shared authorization url ({url}) with user. Waiting for auth code..')
+    logger.info('Shared authorization url ({}) with user. Waiting for auth code..', url)
 
-    return make_response('', 200)
+    return reply_text(msg)
 
 
 @bp.route('/fetch_token', methods=('GET', 'POST'))
+@command('/set_token', 'Finish the authorization. `/set_token <auth_code>`', io=(HTTP, DB))
 def set_token():
     """Final step of oauth2 flow. Set token for further api requests"""
-    form = request.form
-    auth_code = form.get('text')
+    auth_code = request.form.get('text')
     if not auth_code:
         return reply('Usage: /authorize <my_auth_code>')
 
+    calendar = get_calendar()
     calendar.get_token(code=auth_code)
     logger.debug('fetched token: {}', calendar.credentials.token)
 
-    OviBot.chat_postEphemeral(
-        channel=form['channel_id'], user=form['user_id'], text=':check: Success!'
-    )
-    return make_response('', 200)
+    return reply_text(':check: Success!')
 
 
 @bp.route('/find_free_rooms', methods=('GET', 'POST'))
+@command('/find_free_rooms', 'Rooms free right now. `/find_free_rooms [--floor 1] [--all]`',
+         io=(HTTP, DB), budget=2.0, limit=Limit(3, 60), message='Looking for free rooms.. :mag:', idempotent=True)
 def find():
+    return reply_text(find_free_rooms(request.form.get('text', '')))
+
+
+def find_free_rooms(text):
+    """Message with the rooms that are free now, as requested on the command text"""
     try:
-        credentials = calendar.get_credentials()
+        credentials = get_calendar().get_credentials()
     except ValueError:
         logger.exception('No token found on session. Have you already authorized the app?')
-        return reply('You must first authorize the app')
+        return 'You must first authorize the app'
 
     if not credentials.valid:
         if credentials.expired and credentials.refresh_token:
@@ -71,10 +74,10 @@ def find():
             credentials.refresh(Request())
         else:
             attrs = [getattr(credentials, attr, None) for attr in dir(credentials)]
-            logger.debug(f"Valid credentials but refresh token failed. creds={attrs}")
-            return reply('No Credentials for requests. Have you `/authorize`d and `/set_token`?')
+            logger.debug('Valid credentials but refresh token failed. creds={}', attrs)
+            return 'No Credentials for requests. Have you `/authorize`d and `/set_token`?'
 
-    args = request.form.get('text', '').split()
+    args = text.split()
     logger.debug('Find free rooms args: {!r}', args)
     try:
         free_rooms = get_free_rooms(credentials, args)
@@ -92,10 +95,11 @@ def find():
                 '_To know the location of a room run_ `/whereis <room_name>`'
             )
 
-    return reply_text(message)
+    return message
 
 
 @bp.route('/office_map', methods=('GET', 'POST'))
+@command('/office_map', 'Show the office map', io=(CPU, QUEUE))
 def room_map():
     """Show room map"""
     channel = request.form.get('channel_id')
@@ -113,6 +117,7 @@ def room_map():
 
 
 @bp.route('/room_location', methods=('GET', 'POST'))
+@command('/whereis', 'Where a room is. `/whereis <room_name>`', io=(CPU, QUEUE))
 def locate_room():
     """Show where a room is on the map"""
     channel = request.form.get('channel_id')
@@ -6,15 +6,18 @@ from sqlalchemy.exc import IntegrityError
 
 from slacker.database import db
 from slacker.models.stickers import Sticker
+from slacker.registry import section
 from slacker.utils import command_response, sticker_response, reply
 from flask import request
 
 from slacker.utils import BaseBlueprint
 
 bp = BaseBlueprint('sticker', __name__, url_prefix='/sticker')
+command = section('Stickers')
 
 
 @bp.route('/add', methods=('GET', 'POST'))
+@command('/add_sticker', 'Save a sticker. `/add_sticker mymeme https://i.imgur.com/12345678.png`')
 def add_sticker():
     text = request.form.get('text', '')
     user_id = request.form.get('user_id')
@@ -40,6 +43,7 @@ def _add_sticker(author, name, image_url):
 
 
 @bp.route('/send', methods=('GET', 'POST'))
+@command('/send_sticker', 'Send a sticker. `/send_sticker mymeme`')
 def send_sticker():
     sticker_name = request.form.get('text')
     if not sticker_name:
@@ -62,6 +66,7 @@ def lookup_sticker(sticker_name):
 
 
 @bp.route('/list', methods=('GET', 'POST'))
+@command('/show_stickers', 'List the saved stickers')
 def list_stickers():
     stickers = Sticker.query.all()
     if not stickers:
@@ -94,6 +99,7 @@ def list_stickers():
 
 
 @bp.route('/delete', methods=('GET', 'POST'))
+@command('/delete_sticker', 'Delete a sticker you saved. `/delete_sticker mymeme`')
 def delete_sticker():
     sticker_name = request.form.get('text')
     if not sticker_name:
@@ -0,0 +1,220 @@
+"""
+Circuit breakers of the external apis, shared by every worker through redis.
+
+After BREAKER_FAILURES failed calls in a row (5 by default) the breaker of an api opens, and calls to it fail right
+away for BREAKER_COOLDOWN seconds (60) instead of each waiting for its timeout. Then a single call is let through to
+probe it: if it works the breaker closes, if it fails it opens again.
+
+The last good answer of each api is kept on redis too. When the breaker is open or a call fails, commands answer with
+it and tell how old it is:
+
+    payload, saved_at = breaker.call(fetch_alerts)
+    message = subte_message(parse_alerts(payload)) + age_note(saved_at)
+
+The asyncio serving mode awaits its fetches through the same breakers, with breaker.call_async. Its redis calls run on
+the default executor of the loop, as the client blocks.
+
+Calls that can't even start because the request ran out of time (see slacker.deadline) are answered the same way,
+without counting as failures, or raise if there's no answer kept. If redis is down calls are made as if there were no
+breaker, and nothing is kept.
+
+Commands whose breakers fell back, on a stale answer or on none at all, are not cached. See slacker.registry.
+"""
+import asyncio
+import threading
+import time
+from functools import partial
+
+import orjson
+import redis
+from flask import g, has_app_context
+from loguru import logger
+
+from slacker.app_config import BREAKER_COOLDOWN, BREAKER_FAILURES, REDIS_URL
+from slacker.deadline import DeadlineExceeded
+from slacker.exceptions import SlackerException
+from slacker.metrics import BREAKER_OPENED, STALE_ANSWERS
+
+TIMEOUT = 0.05  # Seconds. Like the rate limits, a breaker is not worth slowing down commands
+PROBE = 10  # Seconds a probe call may take before another worker probes again
+KEEP = 7 * 24 * 3600  # Seconds the last good answer of an api is kept
+
+# Returns 1 if the call may be made. Once the breaker cooled down it lets one call through to probe the api
+ALLOW = """
+local open, failures, probe = KEYS[1], KEYS[2], KEYS[3]
+if redis.call('EXISTS', open) == 1 then
+    return 0
+end
+if tonumber(redis.call('GET', failures) or '0') < tonumber(ARGV[1]) then
+    return 1
+end
+if redis.call('SET', probe, 1, 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Counts a failure and opens the breaker if there were too many in a row. Returns the failures
+FAILURE = """
+local failures, open, probe = KEYS[1], KEYS[2], KEYS[3]
+local count = redis.call('INCR', failures)
+redis.call('PEXPIRE', failures, 2 * tonumber(ARGV[2]))
+if count >= tonumber(ARGV[1]) then
+    redis.call('SET', open, 1, 'PX', ARGV[2])
+    redis.call('DEL', probe)
+end
+return count
+"""
+
+_clients = {}
+_lock = threading.Lock()
+
+
+class Unavailable(SlackerException):
+    """The api failed or its breaker is open, and there's no good answer of it to fall back on"""
+
+
+def client(url):
+    """Redis of url. redis-py drops the connections of its pool on forked workers by itself"""
+    with _lock:
+        if url not in _clients:
+            _clients[url] = redis.Redis.from_url(url, socket_timeout=TIMEOUT, socket_connect_timeout=TIMEOUT)
+        return _clients[url]
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN, url=REDIS_URL):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self.url = url
+        self.keys = {key: f'breaker:{name}:{key}' for key in ('open', 'failures', 'probe', 'last')}
+
+    def __repr__(self):
+        return f'<CircuitBreaker {self.name}>'
+
+    def script(self, source):
+        return client(self.url).register_script(source)
+
+    def allows(self):
+        try:
+            return bool(self.script(ALLOW)(keys=[self.keys['open'], self.keys['failures'], self.keys['probe']],
+                                           args=[self.failures, PROBE * 1000]))
+        except redis.RedisError as e:
+            logger.warning(f'Breaker of {self.name} not checked. {e!r}')
+            return True
+
+    def failed(self, error):
+        try:
+            count = self.script(FAILURE)(keys=[self.keys['failures'], self.keys['open'], self.keys['probe']],
+                                         args=[self.failures, self.cooldown * 1000])
+        except redis.RedisError as e:
+            logger.warning(f'Failure of {self.name} not recorded. {e!r}')
+            return
+
+        if count >= self.failures:
+            BREAKER_OPENED.labels(self.name).inc()
+            logger.warning('{} failed {} times in a row. Breaker open for {} seconds. {!r}',
+                           self.name, count, self.cooldown, error)
+
+    def succeeded(self, key, payload):
+        """Close the breaker and keep the answer"""
+        try:
+            with client(self.url).pipeline(transaction=False) as pipe:
+                pipe.delete(self.keys['failures'], self.keys['probe'])
+                saved = orjson.dumps({'at': time.time(), 'payload': payload})
+                pipe.set(f"{self.keys['last']}:{key}", saved, ex=KEEP)
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f'Answer of {self.name} not kept. {e!r}')
+
+    def last_good(self, key):
+        """Last good payload and the time it was saved at, or None"""
+        try:
+            saved = client(self.url).get(f"{self.keys['last']}:{key}")
+        except redis.RedisError as e:
+            logger.warning(f'Last answer of {self.name} not read. {e!r}')
+            return None
+
+        if saved is None:
+            return None
+        saved = orjson.loads(saved)
+        return saved['payload'], saved['at']
+
+    def fallback(self, key, reason, error=None):
+        if has_app_context():
+            g.breaker_fell_back = True
+        last = self.last_good(key)
+        if last is not None:
+            STALE_ANSWERS.labels(self.name, reason).inc()
+            return last
+        if isinstance(error, DeadlineExceeded):
+            raise error
+        raise Unavailable(f'{self.name} is unavailable') from error
+
+    def call(self, fetch, key=''):
+        """Call fetch() if the breaker allows it.
+
+        Args:
+            fetch: function that returns the json payload of the api, and raises if the api fails
+            key (str): tells apart the answers of the calls to the api, i.e the year of the feriados
+
+        Returns:
+            tuple[object, float]: payload and the time it was saved at, None if it is fresh
+
+        Raises:
+            Unavailable: if the api fails or the breaker is open and there's no good payload to fall back on
+            DeadlineExceeded: if there's no time left to call the api nor a good payload to fall back on
+        """
+        if not self.allows():
+            return self.fallback(key, 'open')
+
+        try:
+            payload = fetch()
+        except DeadlineExceeded as e:
+            return self.fallback(key, 'deadline', e)
+        except Exception as e:
+            self.failed(e)
+            return self.fallback(key, 'failed', e)
+
+        self.succeeded(key, payload)
+        return payload, None
+
+    async def call_async(self, fetch, key=''):
+        """Same as call, awaiting fetch(). Redis is called on the default executor, so that it doesn't block the loop"""
+        blocking = partial(asyncio.get_event_loop().run_in_executor, None)
+        if not await blocking(self.allows):
+            return await blocking(self.fallback, key, 'open')
+
+        try:
+            payload = await fetch()
+        except DeadlineExceeded as e:
+            return await blocking(self.fallback, key, 'deadline', e)
+        except Exception as e:
+            await blocking(self.failed, e)
+            return await blocking(self.fallback, key, 'failed', e)
+
+        await blocking(self.succeeded, key, payload)
+        return payload, None
+
+
+def fell_back():
+    """Whether a breaker fell back while serving the current request"""
+    return has_app_context() and g.get('breaker_fell_back', False)
+
+
+def age(seconds):
+    for unit, size in (('día', 86400), ('hora', 3600), ('minuto', 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f'{count} {unit}s' if count > 1 else f'1 {unit}'
+    return 'unos segundos'
+
+
+def age_note(saved_at, now=None):
+    """Tell the user that an answer is stale, and how much. Nothing if it's fresh"""
+    if saved_at is None:
+        return ''
+    now = time.time() if now is None else now
+    return f'\n:warning: _La api no responde. Esto es de hace {age(now - saved_at)}_'
@@ -0,0 +1,32 @@
+"""
+Entry point of the commands worker, which runs the tasks of slacker.deferred.
+
+Web processes import slacker.deferred to send its tasks. The hooks of the tasks, their metrics server, profiles and
+traces are only wired here, on the worker.
+
+Start it with:
+    $ celery worker -A slacker.commands_worker -Q commands --loglevel=info
+"""
+import os
+
+from slacker.app_config import (PROFILE_THRESHOLD, PROFILE_DIR, QUERY_REPEAT_LIMIT, TRACE_FILE, TRACE_COLLECTOR,
+                                WORKER_METRICS_DIR, WORKER_METRICS_PORT)
+
+# Read by prometheus_client on import. The worker never writes on the dir of the web processes
+os.environ['prometheus_multiproc_dir'] = WORKER_METRICS_DIR
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+from slacker import tracing  # noqa: E402
+from slacker.deferred import celery  # noqa: E402,F401 Registers the tasks of the worker
+from slacker.metrics import instrument_tasks, serve_tasks  # noqa: E402
+from slacker.profiler import profile_tasks  # noqa: E402
+from slacker.queries import track_tasks  # noqa: E402
+
+track_tasks(QUERY_REPEAT_LIMIT)
+instrument_tasks()
+serve_tasks(WORKER_METRICS_PORT, WORKER_METRICS_DIR)
+if PROFILE_THRESHOLD:
+    profile_tasks(PROFILE_THRESHOLD, PROFILE_DIR)
+# Last, so that the other hooks log with the request id of the task
+tracing.exporter.configure(TRACE_FILE, TRACE_COLLECTOR)
+tracing.trace_tasks()
@@ -0,0 +1,152 @@
+"""
+Deadline of the work a request or a commands worker task does, shared by every outbound call it makes.
+
+Slack waits 3 seconds for a response. Each request gets COMMAND_DEADLINE seconds (2.5 by default) from the moment it
+comes in. Calls to external apis, google calendar, the slack api and the database take their timeout from what is
+left:
+
+    r = requests.get(url, timeout=deadline.timeout(5))
+
+Once it is spent calls fail right away with DeadlineExceeded, instead of each one waiting its own timeout. Slash commands
+that run out of time answer that they are still working and finish on the commands worker, whose tasks get
+DEFERRED_DEADLINE seconds. See slacker.registry.
+
+On postgres each transaction gets a statement_timeout of what was left when it began. Other databases only fail fast
+once the deadline is spent.
+
+Deadlines are kept per thread, like the request ids of slacker.tracing. The coroutines of the asyncio serving mode
+share the thread of the loop, so theirs is a Deadline object they pass along to the calls they make:
+
+    async with session.get(url, timeout=ClientTimeout(total=deadline.timeout(5))) as r:
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from slacker.exceptions import SlackerException
+
+OUT_OF_TIME_MESSAGE = 'That took longer than it should :snail: Try again in a moment'
+
+_local = threading.local()
+
+
+class DeadlineExceeded(SlackerException):
+    """The time of the request or task was spent before a call it makes"""
+
+
+def expires():
+    """Monotonic time the work of this thread must be done by, if any"""
+    return getattr(_local, 'expires', None)
+
+
+def start(seconds):
+    """Give the work of this thread `seconds` from now. An earlier deadline it already has is kept"""
+    deadline = time.monotonic() + seconds
+    _local.expires = deadline if expires() is None else min(expires(), deadline)
+
+
+def clear():
+    _local.__dict__.pop('expires', None)
+
+
+def remaining():
+    """Seconds left, None if there is no deadline"""
+    deadline = expires()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(call='call'):
+    """Raise DeadlineExceeded if there's no time left for the call"""
+    if expired():
+        raise DeadlineExceeded(f'No time left for the {call}')
+
+
+def timeout(seconds=None, call='call'):
+    """Timeout of a call: `seconds`, or what is left of the deadline if it comes sooner"""
+    return _timeout(remaining(), seconds, call)
+
+
+def _timeout(left, seconds, call):
+    if left is None:
+        return seconds
+    if left <= 0:
+        raise DeadlineExceeded(f'No time left for the {call}')
+    return left if seconds is None else min(seconds, left)
+
+
+class Deadline:
+    """Deadline passed along explicitly, by coroutines that share a thread. None seconds is no deadline"""
+
+    def __init__(self, seconds=None):
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def __repr__(self):
+        return f'<Deadline {self.remaining()}>'
+
+    def remaining(self):
+        return None if self.expires is None else self.expires - time.monotonic()
+
+    def expired(self):
+        left = self.remaining()
+        return left is not None and left <= 0
+
+    def timeout(self, seconds=None, call='call'):
+        return _timeout(self.remaining(), seconds, call)
+
+    @contextmanager
+    def within(self):
+        """Give this deadline to the work of the current thread, i.e blocking calls run on an executor"""
+        left = self.remaining()
+        if left is None:
+            yield
+            return
+        with within(left):
+            yield
+
+
+@contextmanager
+def within(seconds):
+    """Deadline of the work done in the block"""
+    previous = expires()
+    start(seconds)
+    try:
+        yield
+    finally:
+        _local.expires = previous
+
+
+def limit_requests(app):
+    """Start the deadline of each request of the flask app. COMMAND_DEADLINE=0 disables it"""
+
+    def start_deadline():
+        clear()
+        seconds = app.config.get('COMMAND_DEADLINE')
+        if seconds:
+            start(seconds)
+
+    def clear_deadline(exc):
+        clear()
+
+    app.before_request(start_deadline)
+    app.teardown_request(clear_deadline)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _check_query(conn, cursor, statement, parameters, context, executemany):
+    check('query')
+
+
+@event.listens_for(Session, 'after_begin')
+def _limit_transaction(session, transaction, connection):
+    left = remaining()
+    if left is not None and connection.dialect.name == 'postgresql':
+        connection.execute(f'SET LOCAL statement_timeout = {max(int(left * 1000), 1)}')
@@ -0,0 +1,104 @@
+"""
+Slack waits 3 seconds for a slash command response. Commands that talk to external apis can't guarantee that,
+so deferred views are acked right away and run on the commands worker, which posts the view response to the
+command's response_url. slacker.registry decides which commands are deferred.
+
+Interaction handlers that call the slack api may run there too, see slacker.actions.
+
+Each task gets DEFERRED_DEADLINE seconds for its calls, see slacker.deadline. Answering on the response_url is not
+bound by it.
+
+The commands worker is started from slacker.commands_worker, which wires the hooks of its tasks. Importing this module
+doesn't, web processes import it to send them.
+"""
+import threading
+
+import requests
+from flask import request
+from loguru import logger
+
+from slacker import deadline, logs, tracing  # noqa: F401 Configures the log sink
+from slacker.app_config import DEFERRED_DEADLINE
+from slacker.tasks_proxy import run_command_async
+from slacker.utils import ephemeral_reply
+from slacker.worker import celery
+
+WORKING_MESSAGE = 'Working on it.. :hourglass_flowing_sand:'
+
+# Views that may run on the commands worker, by name. Filled by slacker.registry
+commands = {}
+# Interaction handlers, by name. Filled by slacker.actions
+actions = {}
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def defer(name, form=None, message=WORKING_MESSAGE):
+    """Run the view `name` on the commands worker and ack the request right away"""
+    task = run_command_async(name, form if form is not None else request.form.to_dict())
+    logger.debug('Command {} deferred. Task {}', name, task.id)
+    return ephemeral_reply(message)
+
+
+def _get_app():
+    """Build the flask app once per worker process, even with a threads pool"""
+    global _app
+    with _app_lock:
+        if _app is None:
+            from slacker.app import create_app
+            _app = create_app()
+    return _app
+
+
+@celery.task(name='commands.run_command')
+def run_command(name, form):
+    """Run a deferred view with the original request form and post its response to slack"""
+    app = _get_app()
+    view = commands[name]
+    with app.test_request_context(method='POST', data=form), deadline.within(DEFERRED_DEADLINE):
+        try:
+            response = app.make_response(view())
+        except Exception as e:
+            logger.exception(f'Deferred command {name} failed')
+            respond(form['response_url'], {'text': f'Oops ¯\\_(ツ)_/¯. Errors happen\n`{repr(e)}`'})
+            raise
+
+    payload = response_payload(response)
+    if payload:
+        respond(form['response_url'], payload)
+
+
+@celery.task(name='commands.run_action')
+def run_action(name, action):
+    """Run a deferred interaction handler. Errors are told to the user on the action response_url"""
+    app = _get_app()
+    handler = actions[name]
+    with app.app_context(), deadline.within(DEFERRED_DEADLINE):
+        try:
+            handler(action)
+        except Exception as e:
+            logger.exception(f'Deferred action {name} failed')
+            if action.get('response_url'):
+                respond(action['response_url'], {
+                    'text': f'Something bad happened.\n`{repr(e)}`',
+                    'response_type': 'ephemeral',
+                    'replace_original': False,
+                })
+            raise
+
+
+def response_payload(response):
+    """Read a flask response as the json payload slack expects on a response_url"""
+    if response.is_json:
+        return response.get_json()
+
+    text = response.get_data(as_text=True)
+    return {'text': text} if text else None
+
+
+def respond(response_url, payload):
+    with tracing.span('slack respond'):
+        r = requests.post(response_url, json=payload, timeout=5)
+    if r.status_code != 200:
+        logger.error(f'Response not delivered to slack. {r.status_code} {r.text}')
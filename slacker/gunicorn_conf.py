@@ -0,0 +1,45 @@
+"""
+Gunicorn settings of the bot server.
+
+    $ gunicorn -c python:slacker.gunicorn_conf "slacker.app:create_app()"
+
+With PRELOAD=true the app is imported once on the master and workers share its memory copy-on-write. Connections and
+clients are recreated on each worker after fork.
+
+Workers write their metrics to prometheus_multiproc_dir, emptied on start, so that /metrics adds up all of them.
+"""
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+threads = int(os.getenv('THREADS', '16'))
+preload_app = os.getenv('PRELOAD', 'true').lower() == 'true'
+# Read by prometheus_client on import, before the app is loaded
+metrics_dir = os.environ.setdefault('prometheus_multiproc_dir', os.path.join(tempfile.gettempdir(), 'slacker_metrics'))
+
+
+def on_starting(server):
+    # Samples of a previous run would be added up with the new ones
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def post_fork(server, worker):
+    app = server.app.callable
+    if app is None:
+        return  # Not preloaded. The worker builds its own app after fork
+
+    from flask import Flask
+    from slacker.app import reinit_after_fork
+
+    # The asyncio serving mode wraps the flask app
+    reinit_after_fork(app if isinstance(app, Flask) else app['flask'])
+
+
+def child_exit(server, worker):
+    from slacker.metrics import worker_exit
+
+    worker_exit(worker.pid)
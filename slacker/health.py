@@ -0,0 +1,145 @@
+"""
+Health endpoints for the load balancer. They don't come from slack, so they skip the signature check.
+
+/healthz answers while the worker is up. /readyz probes the db, the redis broker and the slack api with tight
+timeouts and tells the latency of each. Probes are cached for a few seconds, so that checks don't load them.
+A worker is ready when its critical dependencies are. Slack is only reported, it can't be fixed by routing elsewhere.
+"""
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from urllib.parse import urljoin
+
+import redis
+import requests
+from flask import Blueprint, current_app
+from loguru import logger
+from sqlalchemy.pool import QueuePool
+
+from slacker.app_config import SLACK_API_URL
+from slacker.database import db
+from slacker.responses import json_response
+
+PATHS = {'/healthz', '/readyz'}
+CACHE_TTL = 5  # Seconds
+TIMEOUT = 0.5  # Seconds per probe
+SLACK_AUTH_TEST = urljoin(SLACK_API_URL, 'auth.test')
+
+bp = Blueprint('health', __name__)
+
+
+class DependencyDown(Exception):
+    """A probe failed"""
+
+
+def probe_db():
+    """select_one, given up after TIMEOUT. A hung connect or query is left to finish on its own thread"""
+    app = current_app._get_current_object()
+    answer = Future()
+
+    def probe():
+        try:
+            with app.app_context():
+                select_one()
+        except Exception as e:
+            answer.set_exception(e)
+        else:
+            answer.set_result(None)
+
+    threading.Thread(target=probe, name='probe_db', daemon=True).start()
+    try:
+        answer.result(timeout=TIMEOUT)
+    except TimeoutError:
+        raise DependencyDown(f'No answer in {TIMEOUT} seconds')
+
+
+def select_one():
+    pool = db.engine.pool
+    # Checking out a connection of an exhausted pool would wait for one to be released. Negative overflow is unbounded
+    limited = isinstance(pool, QueuePool) and pool._max_overflow >= 0
+    if limited and pool.checkedout() >= pool.size() + pool._max_overflow:
+        raise DependencyDown(f'Pool exhausted. {pool.status()}')
+
+    with db.engine.connect() as connection:
+        connection.execute('SELECT 1')
+
+
+_redis_clients = {}
+
+
+def probe_redis():
+    url = current_app.config.get('CELERY_BROKER')
+    if not url:
+        raise DependencyDown('No broker configured')
+
+    if url not in _redis_clients:
+        _redis_clients[url] = redis.Redis.from_url(url, socket_timeout=TIMEOUT, socket_connect_timeout=TIMEOUT)
+    _redis_clients[url].ping()
+
+
+def probe_slack():
+    r = requests.post(SLACK_AUTH_TEST, timeout=TIMEOUT,
+                      headers={'Authorization': f'Bearer {current_app.config.get("CUERVOT")}'})
+    body = r.json()
+    if not body.get('ok'):
+        raise DependencyDown(body.get('error', f'Status {r.status_code}'))
+
+
+# Name, probe and whether the worker can serve without it
+PROBES = [
+    ('db', probe_db, True),
+    ('redis', probe_redis, True),
+    ('slack', probe_slack, False),
+]
+
+
+class Readiness:
+    """Results of the last probes of this process"""
+
+    def __init__(self, probes=PROBES, ttl=CACHE_TTL):
+        self.probes = probes
+        self.ttl = ttl
+        self._checked_at = None
+        self._checks = None
+        self._lock = threading.Lock()
+
+    def checks(self):
+        """Probe results by dependency and their age in seconds. Concurrent requests wait for a single probe"""
+        with self._lock:
+            if self._checked_at is None or time.monotonic() - self._checked_at > self.ttl:
+                self._checks = {name: run_probe(probe, critical) for name, probe, critical in self.probes}
+                self._checked_at = time.monotonic()
+            return self._checks, time.monotonic() - self._checked_at
+
+
+def run_probe(probe, critical):
+    start = time.perf_counter()
+    try:
+        probe()
+        check = {'ok': True}
+    except Exception as e:
+        logger.warning(f'Readiness probe {probe.__name__} failed. {e!r}')
+        check = {'ok': False, 'error': repr(e)}
+
+    check['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    check['critical'] = critical
+    return check
+
+
+readiness = Readiness()
+
+
+@bp.route('/healthz', methods=('GET', 'HEAD'))
+def healthz():
+    return json_response({'status': 'ok'})
+
+
+@bp.route('/readyz', methods=('GET', 'HEAD'))
+def readyz():
+    checks, age = readiness.checks()
+    ready = all(check['ok'] for check in checks.values() if check['critical'])
+    return json_response({
+        'status': 'ok' if ready else 'unavailable',
+        'checks': checks,
+        'age_seconds': round(age, 2),
+    }, status=200 if ready else 503)
@@ -0,0 +1,53 @@
+"""
+Log sink of the app and the commands worker. Importing this module configures it.
+
+Lines are formatted on the thread that logs them and written to stderr by a background thread, so that requests never
+wait on a slow or blocked stderr (enqueue=True). It also keeps the lines of forked gunicorn workers from interleaving.
+
+Records below LOG_LEVEL are dropped before their message is formatted, as long as it is formatted by loguru:
+
+    logger.debug('Task {} sent to {}', task_id, user.real_name)  # Not f'Task {task_id} sent..'
+    logger.opt(lazy=True).debug('User vms:\n{}', lambda: pformat(vms))  # Expensive args are only built if logged
+
+LOG_DEBUG_SAMPLE=N writes 1 in N debug lines of each call site, to keep chatty loops from flooding the logs.
+"""
+import itertools
+import sys
+from collections import defaultdict
+
+from loguru import logger
+
+from slacker.app_config import LOG_LEVEL, LOG_DEBUG_SAMPLE
+from slacker.tracing import add_request_id
+
+LOG_FORMAT = ('<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | {extra[request_id]} | '
+              '<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>')
+
+
+class DebugSampler:
+    """Loguru filter that lets through every record above debug and 1 in every `rate` debug records of a call site"""
+
+    def __init__(self, rate=1):
+        self.rate = max(int(rate), 1)
+        self._seen = defaultdict(itertools.count)
+
+    def __call__(self, record):
+        if self.rate == 1 or record['level'].name != 'DEBUG':
+            return True
+        return next(self._seen[record['name'], record['line']]) % self.rate == 0
+
+
+def configure(level=LOG_LEVEL, debug_sample=LOG_DEBUG_SAMPLE, sink=sys.stderr, enqueue=True):
+    logger.configure(
+        handlers=[{
+            'sink': sink,
+            'format': LOG_FORMAT,
+            'level': level,
+            'filter': DebugSampler(debug_sample),
+            'enqueue': enqueue,
+        }],
+        patcher=add_request_id,
+    )
+
+
+configure()
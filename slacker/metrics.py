@@ -0,0 +1,219 @@
+"""
+Prometheus metrics of the bot server, served on /metrics.
+
+Every request is timed and counted by blueprint and route, so that it shows which commands take the worker time.
+Requests the signature check rejects never reach a route, they are counted by reason.
+Interaction handlers are timed by action, the buttons and dialogs of one route.
+
+Gunicorn workers don't share memory. When `prometheus_multiproc_dir` is set, before the app is imported, each worker
+writes its samples to a file on that dir and /metrics adds up the files of every worker, whichever serves the scrape.
+slacker/gunicorn_conf.py sets it and empties the dir on start.
+
+The commands worker serves the metrics of its tasks on WORKER_METRICS_PORT (9102 by default): how long they waited on
+the queue since they were published, how long they ran, their retries and failures and the messages waiting on the
+queues it consumes. slacker/commands_worker.py points prometheus_multiproc_dir to WORKER_METRICS_DIR, for its pool
+processes to be added up, and empties it on start.
+"""
+import os
+import shutil
+import time
+
+from flask import Blueprint, Response, g, request
+from loguru import logger
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST,
+                               generate_latest, multiprocess, start_http_server)
+from prometheus_client.core import GaugeMetricFamily
+
+from slacker.tracing import PUBLISHED_AT, task_header
+
+PATH = '/metrics'
+MULTIPROC_DIR = 'prometheus_multiproc_dir'
+# Slack gives up on commands after 3 seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10)
+# Deferred commands call external apis that may take a while
+TASK_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30, 60, 120)
+UNMATCHED = '<unmatched>'
+TIMED = 'slacker.timed'  # Environ key of requests that were already timed by the asyncio serving mode
+# Samples are kept in memory or on files since prometheus_client is imported
+MULTIPROCESS = bool(os.environ.get(MULTIPROC_DIR))
+
+REQUEST_LATENCY = Histogram('slacker_request_duration_seconds', 'Time to answer a request',
+                            ['blueprint', 'route'], buckets=BUCKETS)
+RESPONSES = Counter('slacker_responses_total', 'Responses by status code', ['blueprint', 'route', 'status'])
+IN_FLIGHT = Gauge('slacker_requests_in_flight', 'Requests being served', ['blueprint', 'route'],
+                  multiprocess_mode='livesum')
+SIGNATURE_REJECTIONS = Counter('slacker_signature_rejections_total', 'Requests rejected by the signature check',
+                               ['reason'])
+ACTION_LATENCY = Histogram('slacker_action_duration_seconds', 'Time an interaction handler runs', ['action'],
+                           buckets=BUCKETS)
+
+SLACK_LATENCY = Histogram('slacker_slack_api_duration_seconds', 'Time slack takes to answer an api call', ['method'],
+                          buckets=BUCKETS)
+SLACK_ERRORS = Counter('slacker_slack_api_errors_total', 'Slack api calls that failed or were answered with ok=false',
+                       ['method', 'error'])
+SLACK_RATE_LIMITED = Counter('slacker_slack_api_rate_limited_total', 'Slack api calls answered with a 429', ['method'])
+SLACK_RETRY_AFTER = Histogram('slacker_slack_api_retry_after_seconds', 'Retry-After of the rate limited calls',
+                              ['method'], buckets=(1, 2, 5, 10, 30, 60, 120, 300))
+
+HTTP_LATENCY = Histogram('slacker_http_request_duration_seconds', 'Time an external api takes to answer, with retries',
+                         ['host'], buckets=BUCKETS)
+HTTP_REQUESTS = Counter('slacker_http_requests_total', 'Requests to external apis by status code or exception',
+                        ['host', 'status'])
+HTTP_CONNECTIONS = Counter('slacker_http_connections_total', 'Connections opened to external apis, each a handshake',
+                           ['host'])
+BREAKER_OPENED = Counter('slacker_breaker_opened_total', 'Times the breaker of an external api opened', ['api'])
+STALE_ANSWERS = Counter('slacker_breaker_stale_answers_total', 'Answers given with the last good payload of an api',
+                        ['api', 'reason'])
+
+TASK_WAIT = Histogram('slacker_task_queue_wait_seconds', 'Time from a task being published to it starting',
+                      ['task', 'queue'], buckets=TASK_BUCKETS)
+TASK_RUNTIME = Histogram('slacker_task_runtime_seconds', 'Time a task runs, by the state it ends in',
+                         ['task', 'state'], buckets=TASK_BUCKETS)
+TASK_RETRIES = Counter('slacker_task_retries_total', 'Task runs that asked to be retried', ['task'])
+TASK_FAILURES = Counter('slacker_task_failures_total', 'Task runs that raised', ['task', 'exception'])
+
+bp = Blueprint('metrics', __name__)
+
+
+def collector():
+    """Registry with the samples of every worker when running on many processes, or the ones of this process"""
+    if not MULTIPROCESS:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@bp.route(PATH, methods=('GET',))
+def metrics():
+    return Response(generate_latest(collector()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def route_labels():
+    """Blueprint and rule of the request. Rules with and without a trailing slash are the same route"""
+    if request.url_rule is None:
+        return request.blueprint or '', UNMATCHED
+    return request.blueprint or '', request.url_rule.rule.rstrip('/') or '/'
+
+
+def start_timer():
+    if request.environ.get(TIMED):
+        return
+
+    g.metrics_labels = route_labels()
+    g.metrics_start = time.perf_counter()
+    IN_FLIGHT.labels(*g.metrics_labels).inc()
+
+
+def observe(response):
+    labels = g.get('metrics_labels')
+    if labels is not None:
+        REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - g.metrics_start)
+        RESPONSES.labels(*labels, response.status_code).inc()
+    return response
+
+
+def stop_timer(exc):
+    labels = g.pop('metrics_labels', None)
+    if labels is not None:
+        IN_FLIGHT.labels(*labels).dec()
+
+
+def instrument(app):
+    """Time and count every request of the flask app"""
+    app.before_request(start_timer)
+    app.after_request(observe)
+    app.teardown_request(stop_timer)
+
+
+def worker_exit(pid):
+    """Drop the in-flight gauges of a dead worker. Its counters and histograms are still added up"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+
+def task_label(task, args=()):
+    """Deferred commands and actions run on the same task, they are told apart by their first arg"""
+    return f'{task.name} {args[0]}' if args and isinstance(args[0], str) else task.name
+
+
+def instrument_tasks():
+    """Time and count the celery tasks of this worker, and how long they waited on the queue"""
+    from celery.signals import task_prerun, task_postrun, task_retry, task_failure
+
+    starts = {}
+
+    @task_prerun.connect(weak=False, dispatch_uid='slacker.metrics')
+    def start_timer(task_id, task, args=(), **kwargs):
+        published_at = task_header(task, PUBLISHED_AT)
+        if published_at:
+            queue = (task.request.delivery_info or {}).get('routing_key') or ''
+            TASK_WAIT.labels(task_label(task, args), queue).observe(max(time.time() - float(published_at), 0))
+        starts[task_id] = time.perf_counter()
+
+    @task_postrun.connect(weak=False, dispatch_uid='slacker.metrics')
+    def observe_task(task_id, task, args=(), state=None, **kwargs):
+        start = starts.pop(task_id, None)
+        if start is not None:
+            TASK_RUNTIME.labels(task_label(task, args), state or '').observe(time.perf_counter() - start)
+
+    @task_retry.connect(weak=False, dispatch_uid='slacker.metrics')
+    def count_retry(sender=None, request=None, **kwargs):
+        TASK_RETRIES.labels(task_label(sender, getattr(request, 'args', ()))).inc()
+
+    @task_failure.connect(weak=False, dispatch_uid='slacker.metrics')
+    def count_failure(sender=None, exception=None, args=(), **kwargs):
+        TASK_FAILURES.labels(task_label(sender, args), type(exception).__name__).inc()
+
+
+class QueueLength:
+    """Messages waiting on each queue, read from the broker on every scrape"""
+
+    def __init__(self, app, queues):
+        self.app = app
+        self.queues = queues
+
+    @staticmethod
+    def messages(conn, queue):
+        # A passive declare on a queue that doesn't exist closes the channel on amqp brokers
+        try:
+            with conn.channel() as channel:
+                return channel.queue_declare(queue, passive=True).message_count
+        except conn.channel_errors:
+            return 0  # Not declared yet, nothing was sent to it
+
+    def collect(self):
+        gauge = GaugeMetricFamily('slacker_queue_length', 'Messages waiting on the broker', labels=['queue'])
+        try:
+            with self.app.connection_for_read() as conn:
+                conn.ensure_connection(max_retries=1)
+                for queue in self.queues:
+                    gauge.add_metric([queue], self.messages(conn, queue))
+        except Exception as e:
+            logger.warning('Queue length not read from the broker. {!r}', e)
+        yield gauge
+
+
+def serve_tasks(port, directory=None):
+    """Serve the metrics of the celery worker on port, once it starts.
+
+    Args:
+        port (int): port of the metrics server
+        directory (str): multiproc dir of the worker alone, emptied on start. Never the one of the web processes
+    """
+    from celery.signals import worker_init, worker_process_shutdown
+
+    @worker_init.connect(weak=False, dispatch_uid='slacker.metrics')
+    def serve(sender=None, **kwargs):
+        if directory:
+            # Samples of a previous run would be added up with the new ones
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+        registry = collector()
+        registry.register(QueueLength(sender.app, list(sender.app.amqp.queues.consume_from)))
+        start_http_server(port, registry=registry)
+
+    @worker_process_shutdown.connect(weak=False, dispatch_uid='slacker.metrics')
+    def process_exit(pid=None, **kwargs):
+        worker_exit(pid or os.getpid())
@@ -0,0 +1,188 @@
+"""
+Verify that requests come from Slack before Flask builds and dispatches them.
+
+On each HTTP request that Slack sends, they add an X-Slack-Signature HTTP header. The signature is created by
+combining the signing secret with the body of the request they're sending using a standard HMAC-SHA256 keyed hash.
+
+Docs: https://api.slack.com/docs/verifying-requests-from-slack#verification_token_deprecation
+"""
+import hashlib
+import hmac
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from loguru import logger
+
+from slacker.metrics import SIGNATURE_REJECTIONS
+
+MAX_BODY_SIZE = 64 * 1024  # Slack payloads are a few KBs at most
+MAX_REQUEST_AGE = 60 * 2
+TIMEOUT = 0.05  # Seconds. As rate limits, replays are not worth slowing down requests
+
+
+def sign(timestamp, body: bytes, signing_secret: str) -> str:
+    """Generate the signature Slack sends for a request body and timestamp"""
+    req = f'v0:{timestamp}:'.encode('utf-8') + body
+    return 'v0=' + hmac.new(signing_secret.encode('utf-8'), req, hashlib.sha256).hexdigest()
+
+
+def verify_signature(timestamp, body: bytes, signature: str, signing_secret: str) -> bool:
+    return hmac.compare_digest(sign(timestamp, body, signing_secret), signature)
+
+
+class ReplayCache:
+    """Remember signatures of accepted requests for as long as a request is considered fresh.
+
+    With a redis url signatures are shared by every worker, each one is a key set only if it doesn't exist. This process
+    also remembers the ones it saw, to drop their replays before reading the body, and on its own while redis is down.
+    Every entry lives the same ttl, so insertion order is also expiration order.
+    """
+
+    def __init__(self, url=None, ttl=MAX_REQUEST_AGE, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._seen = OrderedDict()  # signature -> expiration
+        self._lock = threading.Lock()
+        # redis-py drops the connections of its pool on forked workers by itself
+        self._redis = url and redis.Redis.from_url(url, socket_timeout=TIMEOUT, socket_connect_timeout=TIMEOUT)
+
+    def __contains__(self, signature):
+        return signature in self._seen
+
+    def add(self, signature, now=None) -> bool:
+        """Remember signature. Returns False if it had already been seen"""
+        now = now or time.time()
+        if self._redis:
+            try:
+                if not self._redis.set(f'replay:{signature}', 1, nx=True, px=int(self.ttl * 1000)):
+                    return False
+            except redis.RedisError as e:
+                logger.warning(f'Replays only checked on this process. {e!r}')
+
+        with self._lock:
+            self._evict(now)
+            if signature in self._seen:
+                return False
+
+            self._seen[signature] = now + self.ttl
+            if len(self._seen) > self.maxsize:
+                self._seen.popitem(last=False)
+
+        return True
+
+    def _evict(self, now):
+        while self._seen:
+            oldest = next(iter(self._seen))
+            if self._seen[oldest] > now:
+                break
+            del self._seen[oldest]
+
+
+class Rejected(Exception):
+    """Request did not pass slack checks"""
+
+    def __init__(self, reason, replayed=False):
+        super().__init__(reason)
+        self.reason = reason
+        self.replayed = replayed
+
+
+class SlackSignatureMiddleware:
+    """Reject unsigned, stale, oversized or replayed requests before they reach the flask app.
+
+    Args:
+        app: wsgi app to protect
+        default_secret (str): signing secret of routes that don't match any prefix
+        secrets_by_prefix (list[tuple[str, str]]): signing secrets of the bots that own a route prefix. i.e /ovi
+        exempt_paths (set[str]): paths that don't come from slack and skip the check
+    """
+
+    def __init__(self, app, default_secret, secrets_by_prefix=(), exempt_paths=(),
+                 max_body_size=MAX_BODY_SIZE, replay_cache=None):
+        self.app = app
+        self.default_secret = default_secret
+        self.secrets_by_prefix = list(secrets_by_prefix)
+        self.exempt_paths = set(exempt_paths)
+        self.max_body_size = max_body_size
+        self.replay_cache = replay_cache if replay_cache is not None else ReplayCache()
+
+    def secret_for(self, path):
+        for prefix, secret in self.secrets_by_prefix:
+            if path == prefix or path.startswith(f'{prefix}/'):
+                return secret
+
+        return self.default_secret
+
+    def check_headers(self, signature, timestamp, content_length):
+        """Cheap checks that don't need the body. Raises Rejected"""
+        if not signature or not timestamp:
+            raise Rejected('Missing required headers')
+
+        try:
+            content_length = int(content_length or 0)
+            too_old = abs(time.time() - int(timestamp)) > MAX_REQUEST_AGE
+        except ValueError:
+            raise Rejected('Malformed headers')
+
+        if content_length > self.max_body_size:
+            raise Rejected('Request too large')
+
+        if too_old:
+            raise Rejected('Request too old')
+
+        if signature in self.replay_cache:
+            raise Rejected('Replayed request', replayed=True)
+
+        return content_length
+
+    def check_signature(self, path, signature, timestamp, body):
+        """Verify the body against the secret of the bot that owns the route. Raises Rejected"""
+        if not verify_signature(timestamp, body, signature, self.secret_for(path)):
+            raise Rejected('Failed request authenticity check. You are not slack..')
+
+        if not self.replay_cache.add(signature):
+            raise Rejected('Replayed request', replayed=True)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path in self.exempt_paths:
+            return self.app(environ, start_response)
+
+        signature = environ.get('HTTP_X_SLACK_SIGNATURE')
+        timestamp = environ.get('HTTP_X_SLACK_REQUEST_TIMESTAMP')
+        try:
+            content_length = self.check_headers(signature, timestamp, environ.get('CONTENT_LENGTH'))
+            body = environ['wsgi.input'].read(content_length)
+            self.check_signature(path, signature, timestamp, body)
+        except Rejected as e:
+            SIGNATURE_REJECTIONS.labels(e.reason).inc()
+            if e.replayed:
+                return self.drop(signature, start_response)
+            return self.reject(e.reason, start_response)
+
+        # Flask reads the body again from the stream
+        environ['wsgi.input'] = io.BytesIO(body)
+        return self.app(environ, start_response)
+
+    @staticmethod
+    def rejection_body(reason):
+        """Answer like the app 400 handler does, so that slack shows the reason"""
+        logger.info('Request rejected. {}', reason)
+        return json.dumps({'text': 'Bad request', 'error': repr(reason)}).encode('utf-8')
+
+    @classmethod
+    def reject(cls, reason, start_response):
+        body = cls.rejection_body(reason)
+        start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    @staticmethod
+    def drop(signature, start_response):
+        """Acknowledge a replayed request without doing any work"""
+        logger.info('Replayed request dropped. Signature {}', signature)
+        start_response('200 OK', [('Content-Length', '0')])
+        return [b'']
@@ -3,3 +3,4 @@ from .retro import RetroItem, Team, Sprint
 from .aws import VM, VMOwnership
 from .poll import Poll, Option, Vote
 from .stickers import Sticker
+from .credentials import CalendarCredentials
@@ -0,0 +1,34 @@
+import json
+
+from slacker.database import db
+from slacker.security import Crypto
+
+
+class CalendarCredentials(db.Model):
+    """Google calendar credentials of the rooms commands, read by the web and the commands workers alike"""
+    __tablename__ = 'calendar_credentials'
+    id = db.Column(db.Integer, primary_key=True)
+    _info = db.Column(db.LargeBinary, nullable=False)
+
+    @property
+    def info(self):
+        """Credentials fields, decrypted"""
+        return json.loads(Crypto.decrypt(self._info))
+
+    @info.setter
+    def info(self, info: dict):
+        self._info = Crypto.encrypt(json.dumps(info))
+
+    @classmethod
+    def load(cls):
+        """Fields of the saved credentials, None if the app was never authorized"""
+        saved = cls.query.get(1)
+        return saved.info if saved else None
+
+    @classmethod
+    def save(cls, info: dict):
+        db.session.merge(cls(id=1, info=info))
+        db.session.commit()
+
+    def __repr__(self):
+        return f'CalendarCredentials(id={self.id!r})'
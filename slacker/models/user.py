@@ -81,7 +81,7 @@ def get_or_create_user(cli, user_id):
     logger.debug("Get or create user")
     user = db.session.query(User).filter_by(user_id=user_id).one_or_none()
     if user is not None:
-        logger.debug(f"User {user.real_name} already exists")
+        logger.debug('User {} already exists', user.real_name)
         return user
 
     logger.debug("User didn't exist. Requesting user info")
@@ -91,7 +91,7 @@ def get_or_create_user(cli, user_id):
         new_user = User.from_json(resp['user'])
         db.session.add(new_user)
     else:
-        logger.debug(f"Error requestion user info.\n{resp}")
+        logger.debug('Error requestion user info.\n{}', resp)
         raise ResponseNotOkException("Slack api did not respond OK when requesting user info")
 
     return new_user
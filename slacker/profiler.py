@@ -0,0 +1,174 @@
+"""
+Sampling profiler of slow requests and commands worker tasks. Opt-in, with PROFILE_THRESHOLD=<seconds>.
+
+While a request runs, a background thread samples the stack of the thread serving it every few milliseconds.
+Requests that take longer than the threshold write their samples to PROFILE_DIR in collapsed stack format, one
+`frame;frame;frame count` line per stack, tagged with the route (or task) and user on the file name:
+
+    20191104-153012_rooms_find_free_rooms_U123_2711ms.collapsed
+
+Render them with flamegraph.pl or speedscope. Faster requests drop their samples.
+
+When disabled no hook is installed and the sampling thread never starts. Stacks are sampled with
+sys._current_frames, so greenlets of the gevent worker are not seen.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+from loguru import logger
+
+INTERVAL = 0.005  # Seconds between samples
+MAX_DEPTH = 128
+
+_labels = {}
+
+
+def label(code):
+    """Name of a frame on the collapsed stacks. Computed once per code object"""
+    try:
+        return _labels[code]
+    except KeyError:
+        return _labels.setdefault(code, f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+
+
+class Profile:
+    """Stack samples of a thread"""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def add(self, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.stacks[tuple(stack)] += 1
+
+    def collapsed(self):
+        """Samples in collapsed stack format, root frame first"""
+        return '\n'.join(f'{";".join(label(code) for code in reversed(stack))} {count}'
+                         for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    """Samples the threads being profiled, from a thread that sleeps while there are none"""
+
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._pid = None
+
+    def start(self):
+        """Profile the current thread"""
+        profile = Profile(threading.get_ident())
+        with self._lock:
+            self._profiles[profile.thread_id] = profile
+            self._active.set()
+            if self._pid != os.getpid():
+                # Threads don't survive forks, each worker samples from its own
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='profiler', daemon=True).start()
+        return profile
+
+    def stop(self, profile):
+        with self._lock:
+            self._profiles.pop(profile.thread_id, None)
+            if not self._profiles:
+                self._active.clear()
+        profile.elapsed = time.perf_counter() - profile.started
+        return profile
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self._profiles.values())
+            frames = sys._current_frames()
+            for profile in profiles:
+                frame = frames.get(profile.thread_id)
+                if frame is not None and profile.thread_id != me:
+                    profile.add(frame)
+
+
+sampler = Sampler()
+
+
+def tag(text):
+    return re.sub(r'\W+', '_', str(text)).strip('_') or '-'
+
+
+def dump(profile, directory, route, user):
+    """Write the profile samples to directory. Returns the file path"""
+    os.makedirs(directory, exist_ok=True)
+    name = (f'{time.strftime("%Y%m%d-%H%M%S")}_{tag(route)}_{tag(user)}_'
+            f'{round(profile.elapsed * 1000)}ms.collapsed')
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(profile.collapsed())
+
+    logger.info('Slow run of {} took {:.0f} ms. {} samples written to {}',
+                route, profile.elapsed * 1000, profile.samples, path)
+    return path
+
+
+def profile_requests(app, threshold, directory):
+    """Profile the requests of the flask app that take longer than threshold seconds"""
+
+    def start():
+        g.profile = sampler.start()
+
+    def stop(exc):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+
+        sampler.stop(profile)
+        if profile.elapsed >= threshold:
+            dump(profile, directory, request.path, request.form.get('user_id'))
+
+    app.before_request(start)
+    app.teardown_request(stop)
+
+
+def task_user(args):
+    """User of a commands worker task. They get a slash command form or an interaction payload"""
+    payload = args[1] if len(args) > 1 and isinstance(args[1], dict) else {}
+    return payload.get('user_id') or payload.get('user', {}).get('id')
+
+
+def profile_tasks(threshold, directory):
+    """Profile the celery tasks of this worker that take longer than threshold seconds"""
+    from celery.signals import task_prerun, task_postrun
+
+    profiles = {}
+
+    @task_prerun.connect(weak=False, dispatch_uid='slacker.profiler')
+    def start(task_id, **kwargs):
+        profiles[task_id] = sampler.start()
+
+    @task_postrun.connect(weak=False, dispatch_uid='slacker.profiler')
+    def stop(task_id, task, args=(), **kwargs):
+        profile = profiles.pop(task_id, None)
+        if profile is None:
+            return
+
+        sampler.stop(profile)
+        if profile.elapsed >= threshold:
+            route = f'{task.name}.{args[0]}' if args else task.name
+            dump(profile, directory, route, task_user(args))
@@ -0,0 +1,145 @@
+"""
+Count the SQL queries and db time of each request and commands worker task.
+
+A statement that runs more than QUERY_REPEAT_LIMIT times in one request is logged as a warning. It is usually a lazy
+load in a loop, i.e the votes of each option of a poll (N+1 queries). In dev mode responses tell the numbers on the
+X-Query-Count and X-Query-Time headers.
+
+Queries are counted on the thread that runs them, for every tracking that is active there:
+
+    with track() as stats:
+        poll = Poll.query.get(1)
+        str(poll)
+    stats.count, stats.seconds
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REPEAT_LIMIT = 5
+
+_local = threading.local()
+
+
+class QueryStats:
+    """Queries run while tracking, their total time in seconds and how many times each statement ran"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __repr__(self):
+        return f'<QueryStats {self.count} queries in {self.seconds * 1000:.1f} ms>'
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, limit):
+        """Statements that ran more than limit times, with their count"""
+        return [(statement, n) for statement, n in self.statements.most_common() if n > limit]
+
+
+def _tracking():
+    return getattr(_local, 'stats', None)
+
+
+# The start of a query is kept on its execution context, which is dropped along with it if the query fails before
+# after_cursor_execute, i.e on a db error or when slacker.deadline stops it
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _tracking() and context is not None:
+        context.query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'query_start', None)
+    if start is None:
+        return
+
+    elapsed = time.perf_counter() - start
+    for stats in _tracking() or ():
+        stats.add(statement, elapsed)
+
+
+def start():
+    """Count the queries of this thread from now on"""
+    stats = QueryStats()
+    if _tracking() is None:
+        _local.stats = []
+    _local.stats.append(stats)
+    return stats
+
+
+def stop(stats):
+    tracking = _tracking()
+    if tracking and stats in tracking:
+        tracking.remove(stats)
+    return stats
+
+
+@contextmanager
+def track():
+    stats = start()
+    try:
+        yield stats
+    finally:
+        stop(stats)
+
+
+def report(stats, name, limit=REPEAT_LIMIT):
+    """Log the queries run by name and warn about the statements that were repeated too many times"""
+    for statement, times in stats.repeated(limit):
+        logger.warning('Possible N+1 queries. {} ran {} times the statement: {}',
+                       name, times, ' '.join(statement.split()))
+    if stats.count:
+        logger.debug('{} ran {} queries in {:.1f} ms', name, stats.count, stats.seconds * 1000)
+
+
+def track_requests(app, limit=REPEAT_LIMIT):
+    """Count the queries of each request of the flask app. Dev mode responses tell them on their headers"""
+
+    def start_tracking():
+        g.queries = start()
+
+    def add_headers(response):
+        stats = g.get('queries')
+        if stats is not None and app.config.get('DEBUG'):
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time'] = f'{stats.seconds * 1000:.1f}ms'
+        return response
+
+    def stop_tracking(exc):
+        stats = g.pop('queries', None)
+        if stats is not None:
+            report(stop(stats), request.path, limit)
+
+    app.before_request(start_tracking)
+    app.after_request(add_headers)
+    app.teardown_request(stop_tracking)
+
+
+def track_tasks(limit=REPEAT_LIMIT):
+    """Count the queries of each celery task of this worker"""
+    from celery.signals import task_prerun, task_postrun
+
+    tasks = {}
+
+    @task_prerun.connect(weak=False, dispatch_uid='slacker.queries')
+    def start_tracking(task_id, **kwargs):
+        tasks[task_id] = start()
+
+    @task_postrun.connect(weak=False, dispatch_uid='slacker.queries')
+    def stop_tracking(task_id, task, args=(), **kwargs):
+        stats = tasks.pop(task_id, None)
+        if stats is not None:
+            report(stop(stats), f'{task.name}.{args[0]}' if args else task.name, limit)
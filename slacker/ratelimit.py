@@ -0,0 +1,116 @@
+"""
+Sliding window rate limits of expensive commands, shared by every worker through redis.
+
+Commands declare their limit on the registry, per user: `limit=Limit(3, 60)` lets each user run it 3 times every
+60 seconds. RATE_LIMITS overrides them, per command or per command and user:
+
+    RATE_LIMITS=/find_free_rooms=5/60,/find_free_rooms:U123=20/60
+
+A check is one round trip to redis. If redis is down commands are not limited.
+"""
+import random
+import threading
+import time
+from functools import lru_cache
+
+import redis
+from loguru import logger
+
+TIMEOUT = 0.05  # Seconds. Limits are not worth slowing down commands
+
+# Drops the calls that left the window and records this one if it fits.
+# Returns 0 if the call is allowed, or the milliseconds until it would be
+SLIDING_WINDOW = """
+local key, now, window, calls = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) < calls then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return 0
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return math.max(tonumber(oldest[2]) + window - now, 1)
+"""
+
+
+class Limit:
+    """`calls` every `seconds`. With `args`, only the command runs whose text contains it are limited"""
+
+    def __init__(self, calls, seconds, args=None):
+        self.calls = calls
+        self.seconds = seconds
+        self.args = args
+
+    def __repr__(self):
+        return f'<Limit {self.calls}/{self.seconds}>'
+
+    def applies(self, text):
+        return self.args is None or self.args in text.split()
+
+
+@lru_cache(maxsize=8)
+def parse_limits(text):
+    """Limits by command or `command:user`, from RATE_LIMITS"""
+    limits = {}
+    for rule in filter(None, (rule.strip() for rule in text.split(','))):
+        target, _, limit = rule.partition('=')
+        calls, _, seconds = limit.partition('/')
+        limits[target.strip()] = Limit(int(calls), int(seconds))
+    return limits
+
+
+class RateLimiter:
+
+    def __init__(self):
+        self._scripts = {}
+        self._lock = threading.Lock()
+
+    def script(self, url):
+        """Sliding window script on the redis of url. Runs by its sha once redis has it.
+
+        redis-py drops the connections of its pool on forked workers by itself.
+        """
+        with self._lock:
+            if url not in self._scripts:
+                client = redis.Redis.from_url(url, socket_timeout=TIMEOUT, socket_connect_timeout=TIMEOUT)
+                self._scripts[url] = client.register_script(SLIDING_WINDOW)
+            return self._scripts[url]
+
+    def hit(self, url, key, limit):
+        """Record a call. Returns the seconds to wait for the call to be allowed, 0 if it is"""
+        now = int(time.time() * 1000)
+        try:
+            wait = self.script(url)(keys=[key], args=[now, limit.seconds * 1000, limit.calls,
+                                                      f'{now}:{random.random()}'])
+        except redis.RedisError as e:
+            logger.warning(f'Rate limit not checked. {e!r}')
+            return 0
+
+        return int(wait) / 1000
+
+    def check(self, config, command, user_id, text):
+        """Check if user_id may run the command with text now.
+
+        Returns:
+            tuple[Limit, float]: limit of the user on the command and seconds to wait, 0 if the command may run
+        """
+        url = config.get('REDIS_URL')
+        limits = parse_limits(config.get('RATE_LIMITS', ''))
+        limit = limits.get(f'{command.name}:{user_id}') or limits.get(command.name)
+        if limit is None:
+            limit = command.limit
+        elif command.limit is not None:
+            # Overrides change the rate, the runs limited are still the ones the command declares
+            limit = Limit(limit.calls, limit.seconds, args=command.limit.args)
+        if not url or limit is None or not limit.applies(text):
+            return limit, 0
+
+        return limit, self.hit(url, f'ratelimit:{command.name}:{user_id}', limit)
+
+
+limiter = RateLimiter()
+
+
+def throttled_message(command, limit, wait):
+    return (f'Easy there :snail: `{command}` is expensive, you can run it {limit.calls} times every '
+            f'{limit.seconds} seconds. Try again in {max(round(wait), 1)} seconds')
@@ -0,0 +1,248 @@
+"""
+Registry of slash commands.
+
+Each command declares its latency budget, how long its response can be cached and the kind of I/O it does:
+
+    command = section('Stickers')
+
+    @bp.route('/send', methods=('GET', 'POST'))
+    @command('/send_sticker', 'Send a sticker. `/send_sticker mymeme`', io=(DB,))
+    def send_sticker():
+        ...
+
+Commands that call remote apis run inline while they keep within budget. The registry measures the p95 of their
+inline runs on each process and, with ADAPTIVE_COMMANDS on, defers to the commands worker the ones that go over it.
+After a cooldown they run inline again, to measure them anew. DEFERRED_COMMANDS defers them always.
+
+Inline runs that fail once the deadline of the request is spent (see slacker.deadline) are answered right away. The
+deferrable ones marked idempotent are finished on the commands worker. The rest tell the user to try again, as running
+them once more could repeat what the inline run already did, like sending a message.
+
+/help is built from the registry.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import wraps, partial
+
+from flask import request, current_app
+from loguru import logger
+
+from slacker import deadline
+from slacker.breakers import fell_back
+from slacker.deferred import WORKING_MESSAGE, commands as deferred_views, defer
+from slacker.ratelimit import limiter, throttled_message
+from slacker.utils import ephemeral_reply
+
+# I/O profiles
+CPU = 'cpu'
+DB = 'db'
+QUEUE = 'queue'  # Sends celery tasks
+SLACK = 'slack'  # Slack web api
+HTTP = 'http'  # External apis
+REMOTE = {SLACK, HTTP}  # Commands that wait on these may be deferred
+
+SECTIONS = ('General', 'Retro Management', 'Stickers', 'OVI Management', 'Rooms', 'Meta')
+
+BUDGET = 1.0  # Seconds. Slack waits 3 seconds for a response
+WINDOW = 100  # Inline runs measured per command
+MIN_SAMPLES = 20  # Runs measured before the p95 is trusted
+COOLDOWN = 300  # Seconds a command stays deferred before being measured again
+CACHE_SIZE = 128  # Responses cached per command, by command text
+LATE_MESSAGE = 'This is taking longer than usual :hourglass_flowing_sand: I will answer here in a moment'
+
+# Commands by slash command
+registry = OrderedDict()
+
+
+class Latencies:
+    """Latest run times of a handler, in seconds"""
+
+    def __init__(self, size=WINDOW):
+        self._window = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._window)
+
+    def add(self, seconds):
+        with self._lock:
+            self._window.append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._window.clear()
+
+    def p95(self):
+        """None until there are enough runs to trust it"""
+        with self._lock:
+            latencies = sorted(self._window)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+
+class Command:
+    """A slash command and the latencies of its inline runs on this process"""
+
+    def __init__(self, name, view, help, section, budget=BUDGET, cache=0, io=(DB,), deferrable=None, limit=None,
+                 message=WORKING_MESSAGE, idempotent=False):
+        """
+        Args:
+            name (str): slash command, i.e '/subte'
+            view: flask view that serves it
+            help (str): description shown on /help
+            section (str): one of SECTIONS
+            budget (float): seconds the command may take inline, at p95
+            cache (int): seconds a fresh response is reused for the same command text. 0 if it can't be cached
+            io (tuple[str]): I/O profiles of the command
+            deferrable (bool): whether it may run on the commands worker. By default, if it waits on remote apis
+            limit (Limit): runs allowed per user. See slacker.ratelimit
+            message (str): ack of deferred runs
+            idempotent (bool): whether running it twice does what running it once does. Only these are run again on
+                the commands worker when an inline run runs out of time
+        """
+        self.name = name
+        self.view = view
+        self.view_name = f'{view.__module__}.{view.__name__}'
+        self.help = help
+        self.section = section
+        self.budget = budget
+        self.cache = cache
+        self.io = frozenset(io)
+        self.deferrable = bool(self.io & REMOTE) if deferrable is None else deferrable
+        self.limit = limit
+        self.message = message
+        self.idempotent = idempotent
+        self.latencies = Latencies()
+        self.deferred_since = None
+        self.responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<Command {self.name}>'
+
+    def record(self, seconds):
+        """Measure an inline run. Defer the command if its p95 goes over budget"""
+        self.latencies.add(seconds)
+        if not self.deferrable or self.deferred_since is not None:
+            return
+
+        p95 = self.latencies.p95()
+        if p95 is not None and p95 > self.budget:
+            logger.warning(f'{self.name} p95 is {p95:.2f}s, over its {self.budget}s budget. Deferring it')
+            self.deferred_since = time.monotonic()
+
+    def should_defer(self, config):
+        if not self.deferrable:
+            return False
+        if config.get('DEFERRED_COMMANDS'):
+            return True
+        if not config.get('ADAPTIVE_COMMANDS') or self.deferred_since is None:
+            return False
+
+        if time.monotonic() - self.deferred_since > COOLDOWN:
+            logger.info('{} cooled down. Measuring it inline again', self.name)
+            self.latencies.clear()
+            self.deferred_since = None
+            return False
+
+        return True
+
+    def out_of_time(self, error, response_url):
+        """Answer an inline run that failed after spending the deadline of the request"""
+        logger.warning(f'{self.name} ran out of time. {error!r}')
+        if response_url and self.deferrable and self.idempotent:
+            return defer(self.view_name, message=LATE_MESSAGE)
+        return ephemeral_reply(deadline.OUT_OF_TIME_MESSAGE)
+
+    def reset(self):
+        """Forget measured latencies and cached responses"""
+        self.latencies.clear()
+        with self._lock:
+            self.responses.clear()
+        self.deferred_since = None
+
+    def cached(self, text):
+        with self._lock:
+            entry = self.responses.get(text)
+        if entry is None:
+            return None
+
+        (body, status, headers), expires = entry
+        if time.monotonic() > expires:
+            return None
+        return current_app.response_class(body, status, headers)
+
+    def save(self, text, response):
+        entry = (response.get_data(), response.status_code, list(response.headers))
+        with self._lock:
+            self.responses[text] = (entry, time.monotonic() + self.cache)
+            self.responses.move_to_end(text)
+            if len(self.responses) > CACHE_SIZE:
+                self.responses.popitem(last=False)
+
+
+def command(name, help, section, **spec):
+    """Register a view as the slash command `name`. See Command for the spec arguments"""
+
+    def decorator(view):
+        cmd = Command(name, view, help, section, **spec)
+        if section not in SECTIONS:
+            raise ValueError(f'Unknown section {section!r}. Add it to registry.SECTIONS')
+
+        registry[name] = cmd
+        deferred_views[cmd.view_name] = view
+
+        @wraps(view)
+        def wrapped_view(*args, **kwargs):
+            text = request.form.get('text', '')
+            if cmd.cache:
+                response = cmd.cached(text)
+                if response is not None:
+                    return response
+
+            limit, wait = limiter.check(current_app.config, cmd, request.form.get('user_id'), text)
+            if wait:
+                return ephemeral_reply(throttled_message(cmd.name, limit, wait))
+
+            response_url = request.form.get('response_url')
+            if response_url and cmd.should_defer(current_app.config):
+                return defer(cmd.view_name, message=cmd.message)
+
+            start = time.perf_counter()
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception as e:
+                if not deadline.expired():
+                    raise
+                cmd.record(time.perf_counter() - start)
+                return cmd.out_of_time(e, response_url)
+            cmd.record(time.perf_counter() - start)
+
+            # Only fresh answers are reused. Stale ones and errors would be served long after the api is back
+            if cmd.cache and response.status_code == 200 and not fell_back():
+                cmd.save(text, response)
+            return response
+
+        wrapped_view.command = cmd
+        return wrapped_view
+
+    return decorator
+
+
+def section(name):
+    """Decorator of the commands of a section"""
+    return partial(command, section=name)
+
+
+def help_text():
+    """List the registered commands, by section"""
+    lines = []
+    for name in SECTIONS:
+        cmds = [cmd for cmd in registry.values() if cmd.section == name]
+        if cmds:
+            lines.append(f'*{name}*')
+            lines.extend(f'- `{cmd.name}` {cmd.help}' for cmd in cmds)
+            lines.append('')
+    return '\n'.join(lines)
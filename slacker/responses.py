@@ -0,0 +1,51 @@
+"""
+Fast json responses.
+
+Payloads are encoded with orjson instead of flask's jsonify. Block Kit payloads that only change a few fields are
+encoded once as a Template, with `{{field}}` placeholders, and each response encodes just the fields:
+
+    STICKER = Template({'blocks': [{'type': 'image', 'image_url': '{{url}}', ...}]})
+    json_response(STICKER.render(url='https://i.imgur.com/1.png'))
+"""
+import re
+
+import orjson
+from flask import current_app
+
+FIELD = re.compile(rb'"\{\{(\w+)\}\}"')
+
+
+class Fragment(bytes):
+    """Json already encoded. Templates insert it as is"""
+
+
+def dumps(payload):
+    if isinstance(payload, Fragment):
+        return payload
+    return orjson.dumps(payload)
+
+
+def json_response(payload, status=200):
+    """Flask response of a payload or of an encoded one"""
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+class Template:
+    """Payload encoded once. Fields are json values written as '{{name}}', filled on render"""
+
+    def __init__(self, payload):
+        parts = FIELD.split(orjson.dumps(payload))
+        self.chunks = parts[::2]
+        self.fields = [field.decode() for field in parts[1::2]]
+
+    def __repr__(self):
+        return f'<Template {self.fields}>'
+
+    def render(self, **values):
+        """Encoded payload with the given field values. Values may be Fragments"""
+        encoded = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            encoded.append(dumps(values[field]))
+            encoded.append(chunk)
+        return Fragment(b''.join(encoded))
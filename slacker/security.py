@@ -3,6 +3,11 @@ from cryptography.fernet import Fernet, InvalidToken
 
 
 class Encrypter:
+    """Fernet keeps no state between calls, so one instance can be shared by all threads.
+
+    Methods read the cypher once, so that a concurrent configure never leaves a call half configured.
+    """
+
     def __init__(self, key=None):
         self.cypher = Fernet(key) if key else None
 
@@ -11,20 +16,22 @@ class Encrypter:
 
     def encrypt(self, text: str) -> bytes:
         """Encrypt string into a bytes"""
-        if not self.cypher:
+        cypher = self.cypher
+        if not cypher:
             raise ValueError('Encrypter not configured')
 
         try:
-            return self.cypher.encrypt(text.encode('UTF-8'))
+            return cypher.encrypt(text.encode('UTF-8'))
         except UnicodeEncodeError:
             raise ValueError('Invalid string. Could not encode with utf-8 codec.')
 
     def decrypt(self, bytes_str: bytes) -> str:
-        if not self.cypher:
+        cypher = self.cypher
+        if not cypher:
             raise ValueError('Encrypter not configured')
 
         try:
-            return self.cypher.decrypt(bytes_str).decode('UTF-8')
+            return cypher.decrypt(bytes_str).decode('UTF-8')
         except InvalidToken:
             raise ValueError('Kaker, you are not allowed to see this message')
 
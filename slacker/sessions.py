@@ -0,0 +1,177 @@
+"""
+Pooled HTTP sessions for the external apis: subte, feriados, hoypido and the scraped pages.
+
+Each process keeps one requests session per host. Consecutive calls reuse a kept-alive connection instead of paying a
+new TCP and TLS handshake each:
+
+    r = sessions.get(SUBTE_URL, params=params, timeout=5)
+
+Each host keeps up to HTTP_POOL_SIZE idle connections. When more threads call it at once, the extra connections are
+closed after use instead of making the threads wait for a free one. GETs that fail to connect or are answered 502, 503
+or 504 are retried up to HTTP_RETRIES times with exponential backoff. Read timeouts are not retried, as they already
+took the whole timeout. HTTP_TIMEOUTS overrides the timeout the code asks for, per host:
+
+    HTTP_TIMEOUTS=apitransporte.buenosaires.gob.ar=3,nolaborables.com.ar=2
+
+Calls made while serving a request never wait past its deadline, see slacker.deadline. Each attempt gets its timeout
+from what is left of it, and a retry whose backoff would outlast it is not made: the call answers with the last
+response or error instead. That's why retries are made here and not by urllib3, which would give each attempt the
+whole timeout again.
+
+slacker_http_requests_total and slacker_http_connections_total count the requests and the new connections of each host.
+Their ratio is the share of requests that paid for a handshake, and stats() reports them for this process.
+"""
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from slacker import deadline
+from slacker.app_config import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_TIMEOUTS
+from slacker.metrics import HTTP_CONNECTIONS, HTTP_LATENCY, HTTP_REQUESTS
+
+DEFAULT_TIMEOUT = 5  # Seconds, for calls that don't ask for one
+BACKOFF = 0.3  # Seconds before the second retry, doubled on each next one. The first one is immediate
+RETRY_STATUSES = (502, 503, 504)
+
+# Of this process, since it started
+requests_made = Counter()
+connections_made = Counter()
+
+
+@lru_cache(maxsize=8)
+def parse_timeouts(text):
+    """Timeouts by host, from HTTP_TIMEOUTS"""
+    timeouts = {}
+    for rule in filter(None, (rule.strip() for rule in text.split(','))):
+        host, _, seconds = rule.partition('=')
+        timeouts[host.strip()] = float(seconds)
+    return timeouts
+
+
+class CountedHTTPConnectionPool(HTTPConnectionPool):
+
+    def _new_conn(self):
+        HTTP_CONNECTIONS.labels(self.host).inc()
+        connections_made[self.host] += 1
+        return super()._new_conn()
+
+
+class CountedHTTPSConnectionPool(HTTPSConnectionPool):
+
+    def _new_conn(self):
+        HTTP_CONNECTIONS.labels(self.host).inc()
+        connections_made[self.host] += 1
+        return super()._new_conn()
+
+
+class CountedAdapter(HTTPAdapter):
+    """Adapter whose pools count the connections they open"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': CountedHTTPConnectionPool,
+                                                   'https': CountedHTTPSConnectionPool}
+
+
+class Sessions:
+    """One session per scheme and host, each with its pool of connections"""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, timeouts=HTTP_TIMEOUTS):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.timeouts = timeouts
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def new_session(self):
+        adapter = CountedAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session(self, scheme, netloc):
+        """Session of a host, created on its first call"""
+        key = (scheme, netloc)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                if key not in self._sessions:
+                    self._sessions[key] = self.new_session()
+                session = self._sessions[key]
+        return session
+
+    def timeout(self, host, timeout):
+        seconds = parse_timeouts(self.timeouts).get(host) or timeout or DEFAULT_TIMEOUT
+        return deadline.timeout(seconds, call=f'GET to {host}')
+
+    def get(self, url, timeout=None, **kwargs):
+        """requests.get on the session of the url host, retried if it fails to connect or is answered RETRY_STATUSES"""
+        parts = urlsplit(url)
+        host = parts.hostname
+        session = self.session(parts.scheme, parts.netloc)
+        for retry in range(self.retries + 1):
+            if retry and not self.backoff(retry):
+                break
+            start, error = time.perf_counter(), None
+            try:
+                r = session.get(url, timeout=self.timeout(host, timeout), **kwargs)
+            except requests.ConnectionError as e:
+                self.count(host, type(e).__name__, start)
+                error = e
+                continue
+            except requests.RequestException as e:
+                self.count(host, type(e).__name__, start)
+                raise
+            self.count(host, str(r.status_code), start)
+            if r.status_code not in RETRY_STATUSES:
+                return r
+
+        if error is not None:
+            raise error
+        return r
+
+    @staticmethod
+    def backoff(retry):
+        """Wait before a retry. False if the deadline comes first, so that the retry is not made"""
+        seconds = 0 if retry == 1 else BACKOFF * 2 ** (retry - 2)
+        left = deadline.remaining()
+        if left is not None and left <= seconds:
+            return False
+        time.sleep(seconds)
+        return True
+
+    def count(self, host, status, start):
+        HTTP_LATENCY.labels(host).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(host, status).inc()
+        requests_made[host] += 1
+
+    def close(self):
+        """Close the connections of every session. Sessions are created again on their next call"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def reset(self):
+        """Forget the sessions without closing them, as their connections belong to the process that forked this one"""
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+
+pool = Sessions()
+get = pool.get
+close = pool.close
+reset = pool.reset
+
+
+def stats():
+    """Requests and new connections to each host since this process started"""
+    return {host: {'requests': requests_made[host], 'connections': connections_made[host]}
+            for host in sorted(set(requests_made) | set(connections_made))}
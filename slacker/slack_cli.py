@@ -1,6 +1,40 @@
-from slack import WebClient
-from slacker.app_config import CUERVOT, OVIBOT
+import asyncio
+import threading
 
-Cuervot = WebClient(CUERVOT)
-OviBot = WebClient(OVIBOT)
-Slack = slack_cli = Cuervot
\ No newline at end of file
+from slacker.app_config import CUERVOT, OVIBOT, SLACK_API_URL
+
+
+class ThreadLocalClient:
+    """Slack WebClient safe to share between threads and greenlets.
+
+    The sync WebClient runs every call to completion on an event loop it binds on its first call, so two threads
+    using the same client step on each other's loop. Each thread gets its own client and loop instead.
+    Under gevent workers threading.local is greenlet local, so each greenlet gets its own.
+    Calls are measured, see slacker/slack_telemetry.py
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self._local = threading.local()
+
+    @property
+    def client(self):
+        try:
+            return self._local.client
+        except AttributeError:
+            # Loads aiohttp. Only workers that talk to slack pay for it
+            from slacker.slack_telemetry import ObservedWebClient
+            self._local.client = ObservedWebClient(self.token, base_url=SLACK_API_URL, loop=asyncio.new_event_loop())
+            return self._local.client
+
+    def reset(self):
+        """Forget the clients of this process. Forked workers must not share the event loops of their parent"""
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+Cuervot = ThreadLocalClient(CUERVOT)
+OviBot = ThreadLocalClient(OVIBOT)
+Slack = slack_cli = Cuervot
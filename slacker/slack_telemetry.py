@@ -0,0 +1,62 @@
+"""
+Slack Web API client that measures its calls: latency by api method, ok=false answers by error and rate limited
+calls with the Retry-After slack asks for. They are served with the rest of the metrics on /metrics.
+
+Rate limits are per method tier, so a 429 is also logged with the call site that got it.
+
+It hooks on WebClient._request, the one coroutine every call of slackclient 2.x goes through, sync or async. Calls
+made while serving a request time out at its deadline, see slacker.deadline.
+"""
+import sys
+import time
+
+import aiohttp
+from loguru import logger
+from slack import WebClient
+
+from slacker import deadline
+from slacker.metrics import SLACK_LATENCY, SLACK_ERRORS, SLACK_RATE_LIMITED, SLACK_RETRY_AFTER
+
+CLIENT_MODULES = ('slack.', 'asyncio.', 'slacker.slack_')
+
+
+def call_site():
+    """Module and line of the code that called the slack api, outside of the clients and the event loop"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(CLIENT_MODULES):
+            return f'{module}:{frame.f_lineno}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+def observe(method, seconds, status, data, headers):
+    """Record an answer of the slack api"""
+    SLACK_LATENCY.labels(method).observe(seconds)
+    if status == 429:
+        retry_after = int(headers.get('Retry-After', 0))
+        SLACK_RATE_LIMITED.labels(method).inc()
+        SLACK_RETRY_AFTER.labels(method).observe(retry_after)
+        logger.warning('Slack rate limited {} from {}. Retry after {} seconds', method, call_site(), retry_after)
+    elif not data.get('ok', False):
+        SLACK_ERRORS.labels(method, data.get('error', f'http_{status}')).inc()
+
+
+class ObservedWebClient(WebClient):
+
+    async def _request(self, *, http_verb, api_url, req_args):
+        method = api_url.rsplit('/', 1)[-1]
+        if deadline.expires() is not None:
+            timeout = deadline.timeout(self.timeout, call=f'slack call {method}')
+            req_args = dict(req_args, timeout=aiohttp.ClientTimeout(total=timeout))
+        start = time.perf_counter()
+        try:
+            response = await super()._request(http_verb=http_verb, api_url=api_url, req_args=req_args)
+        except Exception as e:
+            SLACK_ERRORS.labels(method, type(e).__name__).inc()
+            raise
+
+        observe(method, time.perf_counter() - start, response['status_code'], response['data'] or {},
+                response['headers'])
+        return response
@@ -1,37 +1,64 @@
 """
 This module has functions that call the celery tasks on the remote worker
 """
+from slacker import tracing
 from slacker.worker import celery
 
 
+def send_task(name, args=(), kwargs=None, **options):
+    """Send a task with the id of the request that sends it, and trace how long the broker takes to get it"""
+    with tracing.span(f'enqueue {name}'):
+        return celery.send_task(name, args=args, kwargs=kwargs, headers=tracing.publish_headers(), **options)
+
+
 def send_ephemeral_message_async(message, channel, user):
-    return celery.send_task('tasks.send_ephemeral_message', args=(message, channel, user))
+    return send_task('tasks.send_ephemeral_message', args=(message, channel, user))
+
+
+def respond_async(response_url, **payload):
+    """Reply to a slash command or interaction through its response_url instead of the web api"""
+    return send_task('tasks.respond', args=(response_url, ), kwargs=payload)
+
+
+def send_ephemeral_reply_async(message, response_url, channel, user):
+    """Prefer the response_url, so that the reply doesn't count against our web api rate limit"""
+    if response_url:
+        return respond_async(response_url, text=message, response_type='ephemeral', replace_original=False)
+    return send_ephemeral_message_async(message, channel, user)
+
+
+def run_command_async(command, form):
+    return send_task('commands.run_command', args=(command, form), queue='commands')
+
+
+def run_action_async(handler, action):
+    return send_task('commands.run_action', args=(handler, action), queue='commands')
 
 
 def send_message_async(channel, **kwargs):
     """Message or blocks is mandatory"""
-    return celery.send_task('tasks.send_message', args=(channel, ), kwargs=kwargs)
+    return send_task('tasks.send_message', args=(channel, ), kwargs=kwargs)
 
 
 def upload_file_async(file, channel, filename='file', header=''):
-    return celery.send_task('tasks.upload_file', args=(file, channel, filename, header))
+    return send_task('tasks.upload_file', args=(file, channel, filename, header))
 
 
 def start_vms_task(user_vms, target_vms, name, tk, **kwargs):
-    return celery.send_task('tasks.start_vms', args=(user_vms, target_vms, name, tk), kwargs=kwargs)
+    return send_task('tasks.start_vms', args=(user_vms, target_vms, name, tk), kwargs=kwargs)
 
 
 def stop_vms_task(user_vms, target_vms, name, tk, **kwargs):
-    return celery.send_task('tasks.stop_vms', args=(user_vms, target_vms, name, tk), kwargs=kwargs)
+    return send_task('tasks.stop_vms', args=(user_vms, target_vms, name, tk), kwargs=kwargs)
 
 
 def list_vms_task(user_vms, timeout, name, tk, **kwargs):
-    return celery.send_task('tasks.list_vms', args=(user_vms, timeout, name, tk), kwargs=kwargs)
+    return send_task('tasks.list_vms', args=(user_vms, timeout, name, tk), kwargs=kwargs)
 
 
 def redeploy_vm_task(user_vms, target_vm, snapshot_id, name, tk, **kwargs):
-    return celery.send_task('tasks.redeploy_vm', args=(user_vms, target_vm, snapshot_id, name, tk), kwargs=kwargs)
+    return send_task('tasks.redeploy_vm', args=(user_vms, target_vm, snapshot_id, name, tk), kwargs=kwargs)
 
 
 def get_snapshots_task(name, tk, **kwargs):
-    return celery.send_task('tasks.get_redeploy_snapshots', args=(name, tk), kwargs=kwargs)
+    return send_task('tasks.get_redeploy_snapshots', args=(name, tk), kwargs=kwargs)
@@ -0,0 +1,255 @@
+"""
+Correlation ids and spans of the work a slash command causes, from the request to the slack api call that answers it.
+
+Each request gets an id when it comes in, or keeps the one on its X-Request-Id header. It is on every log line and on
+the X-Request-Id response header. Tasks sent through slacker.tasks_proxy carry it on their headers, with the span that
+sent them and the time they were published, so that workers log with the same id and tell how long tasks waited on
+the queue.
+
+Spans are exported in zipkin v2 json. TRACE_FILE appends one span per line to a file and TRACE_COLLECTOR posts them to
+a collector, i.e http://localhost:9411/api/v2/spans. They are exported from a background thread, and not at all when
+neither is set.
+
+Ids are kept per thread. Coroutines of the asyncio serving mode share one and log without it.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import requests
+from flask import g, request
+from loguru import logger
+
+SERVICE = 'slacker'
+REQUEST_ID = 'request_id'
+PARENT_SPAN = 'parent_span'
+PUBLISHED_AT = 'published_at'
+REQUEST_ID_HEADER = 'X-Request-Id'
+BATCH = 100  # Spans per write or post
+TIMEOUT = 2  # Seconds to post spans to the collector
+
+_local = threading.local()
+
+
+def new_id():
+    """Zipkin ids are 64 bit hex"""
+    return uuid.uuid4().hex[:16]
+
+
+def request_id():
+    """Correlation id of the work this thread is doing, if any"""
+    return getattr(_local, 'request_id', None)
+
+
+def current_span():
+    spans = getattr(_local, 'spans', None)
+    return spans[-1] if spans else None
+
+
+def bind(request_id, parent=None):
+    """Attribute the following logs and spans of this thread to request_id, as children of the parent span id"""
+    _local.request_id = request_id
+    _local.parent = parent
+    _local.spans = []
+
+
+def unbind():
+    _local.__dict__.clear()
+
+
+def add_request_id(record):
+    """Loguru patcher that tells the request id of every record, as {extra[request_id]}. See slacker/logs.py"""
+    record['extra'][REQUEST_ID] = request_id() or '-'
+
+
+class Span:
+    """Timed step of a request. Starts now unless told when, in seconds since the epoch"""
+
+    def __init__(self, name, trace_id, parent_id=None, start=None, **tags):
+        self.name = name
+        self.trace_id = trace_id
+        self.id = new_id()
+        self.parent_id = parent_id
+        self.start = start or time.time()
+        self.duration = None
+        self.tags = tags
+
+    def __repr__(self):
+        return f'<Span {self.name} {self.trace_id}:{self.id}>'
+
+    def finish(self, end=None):
+        self.duration = (end or time.time()) - self.start
+        return self
+
+    def to_zipkin(self):
+        span = {
+            'traceId': self.trace_id,
+            'id': self.id,
+            'name': self.name,
+            'timestamp': int(self.start * 1e6),
+            'duration': max(int(self.duration * 1e6), 1),
+            'localEndpoint': {'serviceName': SERVICE},
+            'tags': {key: str(value) for key, value in self.tags.items()},
+        }
+        if self.parent_id:
+            span['parentId'] = self.parent_id
+        return span
+
+
+def start_span(name, start=None, **tags):
+    """Open a span of the current request, child of the span that is open. Finish it with finish_span"""
+    parent = current_span()
+    span = Span(name, request_id() or new_id(), parent.id if parent else getattr(_local, 'parent', None),
+                start, **tags)
+    if request_id() is not None:
+        _local.spans.append(span)
+    return span
+
+
+def finish_span(span, end=None):
+    spans = getattr(_local, 'spans', None)
+    if spans and span in spans:
+        spans.remove(span)
+    exporter.export(span.finish(end))
+    return span
+
+
+@contextmanager
+def span(name, **tags):
+    """Time the block as a span"""
+    the_span = start_span(name, **tags)
+    try:
+        yield the_span
+    except Exception as e:
+        the_span.tags['error'] = repr(e)
+        raise
+    finally:
+        finish_span(the_span)
+
+
+class Exporter:
+    """Write or post spans from a background thread, so that requests don't wait on them"""
+
+    def __init__(self, file=None, collector=None):
+        self.file = file
+        self.collector = collector
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return bool(self.file or self.collector)
+
+    def configure(self, file=None, collector=None):
+        self.file = file
+        self.collector = collector
+
+    def export(self, span):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads don't survive forks
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='span-exporter', daemon=True).start()
+        self._queue.put(span)
+
+    def flush(self):
+        """Wait until the exported spans are written"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            spans = [self._queue.get()]
+            while len(spans) < BATCH and not self._queue.empty():
+                spans.append(self._queue.get())
+            try:
+                self.write([span.to_zipkin() for span in spans])
+            except Exception as e:
+                logger.warning(f'{len(spans)} spans not exported. {e!r}')
+            finally:
+                for _ in spans:
+                    self._queue.task_done()
+
+    def write(self, spans):
+        if self.file:
+            with open(self.file, 'a') as f:
+                f.write(''.join(f'{json.dumps(span)}\n' for span in spans))
+        if self.collector:
+            requests.post(self.collector, json=spans, timeout=TIMEOUT).raise_for_status()
+
+
+exporter = Exporter()
+
+
+def trace_requests(app):
+    """Give each request of the flask app a correlation id and time it as the root span of its trace"""
+
+    def start_trace():
+        bind(request.headers.get(REQUEST_ID_HEADER) or new_id())
+        g.trace = start_span(f'{request.method} {request.path}', user=request.form.get('user_id', ''))
+
+    def add_header(response):
+        if request_id() is not None:
+            response.headers[REQUEST_ID_HEADER] = request_id()
+        return response
+
+    def finish_trace(exc):
+        # Request contexts pushed without dispatching a request, like the commands worker ones, were not traced here
+        root = g.pop('trace', None)
+        if root is not None:
+            finish_span(root)
+            unbind()
+
+    app.before_request(start_trace)
+    app.after_request(add_header)
+    app.teardown_request(finish_trace)
+
+
+def publish_headers():
+    """Headers that tie a task to the request that sends it"""
+    parent = current_span()
+    return {
+        REQUEST_ID: request_id() or new_id(),
+        PARENT_SPAN: parent.id if parent else None,
+        PUBLISHED_AT: time.time(),
+    }
+
+
+def task_header(task, key):
+    """Header of the message of the task. Depending on the protocol they are request attributes or kept apart"""
+    value = getattr(task.request, key, None)
+    if value is None:
+        value = (getattr(task.request, 'headers', None) or {}).get(key)
+    return value
+
+
+def trace_tasks():
+    """Log the celery tasks of this worker with the id of the request that sent them. Trace their wait and run"""
+    from celery.signals import task_prerun, task_postrun
+
+    runs = {}
+
+    @task_prerun.connect(weak=False, dispatch_uid='slacker.tracing')
+    def start_trace(task_id, task, args=(), **kwargs):
+        bind(task_header(task, REQUEST_ID) or new_id(), task_header(task, PARENT_SPAN))
+        published_at = task_header(task, PUBLISHED_AT)
+        if published_at:
+            queue_name = (task.request.delivery_info or {}).get('routing_key') or ''
+            finish_span(start_span(f'queue wait {task.name}', start=float(published_at), queue=queue_name))
+        name = f'{task.name} {args[0]}' if args and isinstance(args[0], str) else task.name
+        runs[task_id] = start_span(name)
+
+    @task_postrun.connect(weak=False, dispatch_uid='slacker.tracing')
+    def finish_trace(task_id, state=None, **kwargs):
+        run = runs.pop(task_id, None)
+        if run is not None:
+            run.tags['state'] = state
+            finish_span(run)
+        unbind()
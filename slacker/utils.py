@@ -1,15 +1,20 @@
+import os
 import re
+import tempfile
 import unicodedata
+from contextlib import contextmanager
 from functools import wraps
 
+import orjson
 import requests
 import time
-from bs4 import BeautifulSoup
-from flask import jsonify, Blueprint, make_response
+from flask import Blueprint, make_response
 from loguru import logger
 
+from slacker import sessions
 from slacker.models import User
 from slacker.database import db
+from slacker.responses import Template, json_response
 
 OK = ''
 JSON_TYPE = {'ContentType': 'application/json'}
@@ -56,13 +61,15 @@ def safe(on_error: str = 'Algo salió mal..'):
 
 def _soupify_url(url, timeout=2, encoding='utf-8', **kwargs):
     """Given a url returns a BeautifulSoup object"""
+    from bs4 import BeautifulSoup
+
     try:
-        r = requests.get(url, timeout=timeout, **kwargs)
+        r = sessions.get(url, timeout=timeout, **kwargs)
     except requests.ReadTimeout:
-        logger.info("[soupify_url] Request for %s timed out.", url)
+        logger.info("[soupify_url] Request for {} timed out.", url)
         raise
     except Exception as e:
-        logger.error(f"Request for {url} could not be resolved", exc_info=True)
+        logger.opt(exception=True).error("Request for {} could not be resolved", url)
         raise ConnectionError(repr(e))
 
 
@@ -83,6 +90,23 @@ def soupify_url(url, timeout=2, encoding='utf-8', **kwargs):
         raise Exception(f"Can't soupify url '{url}'") from e
 
 
+@contextmanager
+def atomic_path(path):
+    """Yield a temporary path that replaces path once written.
+
+    Readers on other threads or workers see either the previous file or the new one, never a partial write.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or None, suffix=f'-{name}')  # Keep the extension
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def string_to_ascii(banco_name):
     """Normalize a single tag: remove non valid chars, lower case all. - Credits to @eduzen"""
     value = unicodedata.normalize("NFKD", banco_name)
@@ -108,35 +132,51 @@ def italic(text):
 
 
 def send_message(text, msg_type='in_channel'):
-    return jsonify({
+    return json_response({
         "response_type": msg_type,
         "text": text,
     })
 
 
 def reply(response, status=200, response_type=JSON_TYPE):
-    return jsonify(response), status, response_type
+    return json_response(response), status, response_type
 
 
 def reply_raw(response, status=200, response_type=JSON_TYPE):
     if isinstance(response, dict):
-        response = jsonify(response)
+        response = json_response(response)
     return response, status, response_type
 
 
 reply_text = reply_raw
 
+EPHEMERAL = Template({'text': '{{text}}', 'response_type': 'ephemeral'})
+
 
 def ephemeral_reply(text):
-    resp = {
-        'text': text,
-        "response_type": 'ephemeral',
-    }
-    return reply(resp)
+    return reply(EPHEMERAL.render(text=text))
 
 
 BOT_ICON = "https://i.imgur.com/rOpT9uS.png"
+COMMAND = Template({
+    'text': '{{text}}',
+    "attachments": [
+        {
+            "footer": "Cuervot",
+            "footer_icon": BOT_ICON,
+            "ts": '{{ts}}'
+        }
+    ]
+})
+
+
 def command_response(text, **kwargs):
+    if kwargs:
+        return reply(command_payload(text, **kwargs))
+    return reply(COMMAND.render(text=text, ts=time.time()))
+
+
+def command_payload(text, **kwargs):
     response = {
         'text': text,
         "attachments": [
@@ -149,41 +189,47 @@ def command_response(text, **kwargs):
     }
     response.update(**kwargs)
 
-    return reply(response)
+    return response
+
+
+STICKER = Template({
+    "response_type": 'ephemeral',
+    "blocks": [
+        {
+            "type": "image",
+            "title": {
+                "type": "plain_text",
+                "text": '{{name}}'
+            },
+            "image_url": '{{image_url}}',
+            "alt_text": '{{name}}'
+        },
+        {
+            "type": "actions",
+            "block_id": "send_sticker_block_id",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "Send!",
+                    },
+                    "value": '{{image_url}}',
+                    "style": "primary",
+                    "action_id": '{{action_id}}'
+                }
+            ]
+        }],
+})
 
 
 def sticker_response(sticker_name, sticker_image, **kwargs):
     """Sends an ephemeral message with the selected sticker with a button to send it to the channel"""
-    sticker = {
-        "response_type": 'ephemeral',
-        "blocks": [
-            {
-                "type": "image",
-                "title": {
-                    "type": "plain_text",
-                    "text": sticker_name
-                },
-                "image_url": sticker_image,
-                "alt_text": sticker_name
-            },
-            {
-                "type": "actions",
-                "block_id": "send_sticker_block_id",
-                "elements": [
-                    {
-                        "type": "button",
-                        "text": {
-                            "type": "plain_text",
-                            "text": "Send!",
-                        },
-                        "value": sticker_image,
-                        "style": "primary",
-                        "action_id": f"send_sticker_action_id:{sticker_name}"
-                    }
-                ]
-            }],
-    }
-    sticker.update(**kwargs)
+    sticker = STICKER.render(name=sticker_name, image_url=sticker_image,
+                             action_id=f"send_sticker_action_id:{sticker_name}")
+    if kwargs:
+        sticker = orjson.loads(sticker)
+        sticker.update(**kwargs)
     return reply(sticker)
 
 
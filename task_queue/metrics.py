@@ -0,0 +1,107 @@
+"""
+Prometheus metrics of the task queue worker, served on WORKER_METRICS_PORT (9101 by default).
+
+Tasks are timed by name, from the time slacker published them to the time they start (queue wait) and while they run.
+Retries and failures are counted, and the messages waiting on each queue the worker consumes are read from the broker
+on every scrape.
+
+Tasks run on the pool processes of the worker. Each of them writes its samples to files on prometheus_multiproc_dir,
+and the main process serves all of them added up. The dir is emptied when the worker starts.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+# Read by prometheus_client on import
+MULTIPROC_DIR = os.environ.setdefault('prometheus_multiproc_dir',
+                                      os.path.join(tempfile.gettempdir(), 'tasks_metrics'))
+
+from celery.signals import worker_init, worker_process_shutdown  # noqa: E402
+from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess, start_http_server  # noqa: E402
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+
+PORT = int(os.getenv('WORKER_METRICS_PORT', '9101'))
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+# Ovi tasks take minutes
+TASK_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+logger = logging.getLogger(__name__)
+
+TASK_WAIT = Histogram('tasks_queue_wait_seconds', 'Time from a task being published to it starting', ['task', 'queue'],
+                      buckets=TASK_BUCKETS)
+TASK_RUNTIME = Histogram('tasks_runtime_seconds', 'Time a task runs, by the state it ends in', ['task', 'state'],
+                         buckets=TASK_BUCKETS)
+TASK_RETRIES = Counter('tasks_retries_total', 'Task runs that asked to be retried', ['task'])
+TASK_FAILURES = Counter('tasks_failures_total', 'Task runs that raised', ['task', 'exception'])
+
+SLACK_LATENCY = Histogram('tasks_slack_api_duration_seconds', 'Time slack takes to answer an api call', ['method'],
+                          buckets=BUCKETS)
+SLACK_ERRORS = Counter('tasks_slack_api_errors_total', 'Slack api calls that failed or were answered with ok=false',
+                       ['method', 'error'])
+SLACK_RATE_LIMITED = Counter('tasks_slack_api_rate_limited_total', 'Slack api calls answered with a 429', ['method'])
+SLACK_RETRY_AFTER = Histogram('tasks_slack_api_retry_after_seconds', 'Retry-After of the rate limited calls',
+                              ['method'], buckets=(1, 2, 5, 10, 30, 60, 120, 300))
+
+
+def observe_slack(method, seconds, status, data, headers):
+    """Record an answer of the slack api. Returns the seconds slack asks to wait if the call was rate limited"""
+    SLACK_LATENCY.labels(method).observe(seconds)
+    if status == 429:
+        retry_after = int(headers.get('Retry-After', 0))
+        SLACK_RATE_LIMITED.labels(method).inc()
+        SLACK_RETRY_AFTER.labels(method).observe(retry_after)
+        return retry_after
+    if not data.get('ok', False):
+        SLACK_ERRORS.labels(method, data.get('error', f'http_{status}')).inc()
+    return None
+
+
+def observe_wait(task, queue, published_at):
+    """Record how long a task waited since it was published, in seconds since the epoch"""
+    TASK_WAIT.labels(task, queue).observe(max(time.time() - float(published_at), 0))
+
+
+class QueueLength:
+    """Messages waiting on each queue, read from the broker on every scrape"""
+
+    def __init__(self, app, queues):
+        self.app = app
+        self.queues = queues
+
+    @staticmethod
+    def messages(conn, queue):
+        # A passive declare on a queue that doesn't exist closes the channel on amqp brokers
+        try:
+            with conn.channel() as channel:
+                return channel.queue_declare(queue, passive=True).message_count
+        except conn.channel_errors:
+            return 0  # Not declared yet, nothing was sent to it
+
+    def collect(self):
+        gauge = GaugeMetricFamily('tasks_queue_length', 'Messages waiting on the broker', labels=['queue'])
+        try:
+            with self.app.connection_for_read() as conn:
+                conn.ensure_connection(max_retries=1)
+                for queue in self.queues:
+                    gauge.add_metric([queue], self.messages(conn, queue))
+        except Exception as e:
+            logger.warning(f'Queue length not read from the broker. {e!r}')
+        yield gauge
+
+
+@worker_init.connect
+def serve(sender=None, **kwargs):
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if sender is not None:
+        registry.register(QueueLength(sender.app, list(sender.app.amqp.queues.consume_from)))
+    start_http_server(PORT, registry=registry)
+
+
+@worker_process_shutdown.connect
+def process_exit(pid=None, **kwargs):
+    multiprocess.mark_process_dead(pid or os.getpid())
@@ -1,12 +1,19 @@
 import logging
 import os
-from typing import List
+import time
+from typing import List, Union
 
+import requests
 from dotenv import load_dotenv
 import celery as _celery
+from celery.exceptions import Retry
 from awsadm.ovicli import OviCli
 
 from slack import WebClient
+from slack.errors import SlackApiError
+
+import metrics
+import tracing
 
 load_dotenv()
 
@@ -18,17 +25,62 @@ ERRORS_CHANNEL = os.environ['ERRORS_CHANNEL']
 BOT_FATHER = os.environ['BOT_FATHER']
 CELERY_BROKER_URL = os.environ['CELERY_BACKEND']
 CELERY_RESULT_BACKEND = os.environ['CELERY_BROKER']
+# Benchmarks point it to a local stand-in, see benchmarks/standins.py
+SLACK_API_URL = os.getenv('SLACK_API_URL', 'https://www.slack.com/api/')
 
 
 celery = _celery.Celery('tasks', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
-Slack = WebClient(BOT_TOKEN)
-OviBot = WebClient(OVIBOT)
+celery.conf.worker_log_format = '[%(asctime)s: %(levelname)s/%(processName)s] %(request_id)s %(message)s'
+celery.conf.worker_task_log_format = ('[%(asctime)s: %(levelname)s/%(processName)s] %(request_id)s '
+                                      '%(task_name)s[%(task_id)s]: %(message)s')
+
+
+class TracedWebClient(WebClient):
+    """Slack client that traces and measures its api calls. See metrics.py"""
+    def api_call(self, api_method, **kwargs):
+        with tracing.span(f'slack {api_method}'):
+            try:
+                return super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                # SlackApiError can't be unpickled, and the pool process of the task would take the worker down with it
+                raise ResponseNotOK(f"Slack api request error:\n{e.response.get('error')}") from None
+
+    async def _request(self, *, http_verb, api_url, req_args):
+        # Every call of slackclient 2.x goes through here, with the http status and headers slack answered
+        method = api_url.rsplit('/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            response = await super()._request(http_verb=http_verb, api_url=api_url, req_args=req_args)
+        except Exception as e:
+            metrics.SLACK_ERRORS.labels(method, type(e).__name__).inc()
+            raise
+
+        retry_after = metrics.observe_slack(method, time.perf_counter() - start, response['status_code'],
+                                            response['data'] or {}, response['headers'])
+        if retry_after is not None:
+            logger.warning(f'Slack rate limited {method}. Retry after {retry_after} seconds')
+        return response
+
+
+Slack = TracedWebClient(BOT_TOKEN, base_url=SLACK_API_URL)
+OviBot = TracedWebClient(OVIBOT, base_url=SLACK_API_URL)
 
 
 class ResponseNotOK(Exception):
     """Slack api request was not successfull"""
 
 
+def reply_to_user(text, channel, user, response_url=None):
+    """Reply through the command response_url when we have one. It doesn't count against the web api rate limit"""
+    if response_url:
+        with tracing.span('slack respond'):
+            r = requests.post(response_url, json={'text': text, 'response_type': 'ephemeral'}, timeout=10)
+        if r.status_code != 200:
+            raise ResponseNotOK(f"Slack response_url error:\n{r.status_code} {r.text}")
+    else:
+        Slack.chat_postEphemeral(channel=channel, user=user, text=text)
+
+
 def notify_error_to_admin(error_msg):
     mono_error = f'```{error_msg}```'
     r = OviBot.chat_postEphemeral(channel=ERRORS_CHANNEL,
@@ -37,15 +89,51 @@ def notify_error_to_admin(error_msg):
     assert r['ok'], f"Admin not notified: {r['error']}"
 
 
+class TracedTask(_celery.Task):
+    """Task that logs with the id of the request that sent it, on its run and its hooks, and traces and measures its
+    queue wait and execution. See metrics.py"""
+    def __call__(self, *args, **kwargs):
+        tracing.bind(tracing.task_header(self.request, tracing.REQUEST_ID) or tracing.new_id(),
+                     tracing.task_header(self.request, tracing.PARENT_SPAN))
+        published_at = tracing.task_header(self.request, tracing.PUBLISHED_AT)
+        if published_at:
+            queue = (self.request.delivery_info or {}).get('routing_key') or ''
+            metrics.observe_wait(self.name, queue, published_at)
+            with tracing.span(f'queue wait {self.name}', start=float(published_at)):
+                pass
+
+        start = time.perf_counter()
+        state = 'SUCCESS'
+        try:
+            with tracing.span(self.name):
+                return super().__call__(*args, **kwargs)
+        except Retry:
+            state = 'RETRY'
+            raise
+        except Exception as e:
+            state = 'FAILURE'
+            metrics.TASK_FAILURES.labels(self.name, type(e).__name__).inc()
+            raise
+        finally:
+            metrics.TASK_RUNTIME.labels(self.name, state).observe(time.perf_counter() - start)
+
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        metrics.TASK_RETRIES.labels(self.name).inc()
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        tracing.unbind()
+
+
 # Slack tasks
-class SlackTask(_celery.Task):
+class SlackTask(TracedTask):
     """Slack task wrapper to notify admin if a task failed"""
     def on_success(self, return_value, task_id, args, kwargs):
         # Notify admin if task did not respect the task contract or if request failed
         try:
             success, error_msg = return_value
         except ValueError:
-            error_details = f"Slack Task returned {repr(return_value)} instead of tuple. {task_id} {args} {kwargs}."
+            error_details = (f"Slack Task returned {repr(return_value)} instead of tuple. {task_id} {args} {kwargs}. "
+                             f"Request {tracing.request_id()}")
             notify_error_to_admin(error_details)
             return
 
@@ -59,6 +147,7 @@ class SlackTask(_celery.Task):
         error_details = (
             f'Exception handling slack task.\n'
             f'Task id: {task_id}\n'
+            f'Request id: {tracing.request_id()}\n'
             f'Details: {exc}\n'
             f'Args: {args}\n'
             f'Kwargs: {kwargs}\n'
@@ -86,7 +175,17 @@ def send_ephemeral_message(message: str, channel: str, user: str, **kwargs) -> (
 
 
 @celery.task(base=SlackTask)
-def send_message_with_blocks(blocks: List[dict], channel: str, **kwargs) -> (bool, str):
+def respond(response_url: str, **payload) -> (bool, str):
+    r = requests.post(response_url, json=payload, timeout=10)
+    if r.status_code != 200:
+        raise ResponseNotOK(f"Slack response_url error:\n{r.status_code} {r.text}")
+
+    return True, ''
+
+
+@celery.task(base=SlackTask)
+def send_message_with_blocks(blocks: Union[str, List[dict]], channel: str, **kwargs) -> (bool, str):
+    """Blocks may come encoded as a json string, as slack takes them"""
     r = Slack.chat_postMessage(blocks=blocks, channel=channel, **kwargs)
     if not r['ok']:
         raise ResponseNotOK(f"Slack api request error:\n{r.get('error')}")
@@ -104,25 +203,18 @@ def upload_file(file, channel, name, header, **kwargs) -> (bool, str):
 
 
 # Ovi Tasks
-class OviTask(_celery.Task):
+class OviTask(TracedTask):
     """Task to wrap ovicli calls. Return output unmodified. Notifying failure"""
     def on_success(self, ovi_return_value, task_id, args, kwargs):
         # Send task output to user
-        Slack.chat_postEphemeral(
-            channel=kwargs['channel'],
-            user=kwargs['user'],
-            text=ovi_return_value,
-        )
+        reply_to_user(ovi_return_value, kwargs['channel'], kwargs['user'], kwargs.get('response_url'))
 
     def on_failure(self, task_exception, task_id, args, kwargs, einfo):
         # Notify admin and user of failure (with different level of detail)
-        error_details = f'Exception: {task_exception}.\nDetails: {task_id}\n{args}\n{kwargs}\n{einfo}'
+        error_details = (f'Exception: {task_exception}.\nDetails: {task_id} (request {tracing.request_id()})\n'
+                         f'{args}\n{kwargs}\n{einfo}')
         notify_error_to_admin(error_details)
-        Slack.chat_postEphemeral(
-            channel=kwargs['channel'],
-            user=kwargs['user'],
-            text='Task failed 😢',
-        )
+        reply_to_user('Task failed 😢', kwargs['channel'], kwargs['user'], kwargs.get('response_url'))
 
 
 @celery.task(base=OviTask)
@@ -0,0 +1,150 @@
+"""
+Correlation ids and spans of the tasks of this worker, in the same zipkin v2 json format as slacker/tracing.py.
+
+Tasks sent by slacker carry the id of the request that sent them, the span that sent them and the time they were
+published on their headers. Every log line of the task has that id, and its queue wait, execution and slack api calls
+are exported as spans of the request trace. TRACE_FILE appends them to a file, one per line, and TRACE_COLLECTOR posts
+them to a collector, i.e http://localhost:9411/api/v2/spans. Nothing is exported when neither is set.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import requests
+
+SERVICE = 'tasks'
+REQUEST_ID = 'request_id'
+PARENT_SPAN = 'parent_span'
+PUBLISHED_AT = 'published_at'
+BATCH = 100  # Spans per write or post
+TIMEOUT = 2  # Seconds to post spans to the collector
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def new_id():
+    """Zipkin ids are 64 bit hex"""
+    return uuid.uuid4().hex[:16]
+
+
+def request_id():
+    """Correlation id of the task this thread is running, if any"""
+    return getattr(_local, 'request_id', None)
+
+
+def bind(request_id, parent=None):
+    _local.request_id = request_id
+    _local.spans = [parent] if parent else []
+
+
+def unbind():
+    _local.__dict__.clear()
+
+
+def add_request_id(factory):
+    """Log record factory that tells the request id of every record, as %(request_id)s"""
+    def make_record(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.request_id = request_id() or '-'
+        return record
+    return make_record
+
+
+logging.setLogRecordFactory(add_request_id(logging.getLogRecordFactory()))
+
+
+def zipkin_span(name, trace_id, span_id, parent_id, start, end, **tags):
+    span = {
+        'traceId': trace_id,
+        'id': span_id,
+        'name': name,
+        'timestamp': int(start * 1e6),
+        'duration': max(int((end - start) * 1e6), 1),
+        'localEndpoint': {'serviceName': SERVICE},
+        'tags': {key: str(value) for key, value in tags.items()},
+    }
+    if parent_id:
+        span['parentId'] = parent_id
+    return span
+
+
+@contextmanager
+def span(name, start=None, **tags):
+    """Time the block as a span of the task request, child of the span that is open. Starts now unless told when"""
+    spans = getattr(_local, 'spans', None)
+    if spans is None:
+        yield
+        return
+
+    span_id = new_id()
+    parent = spans[-1] if spans else None
+    start = start or time.time()
+    spans.append(span_id)
+    try:
+        yield
+    except Exception as e:
+        tags['error'] = repr(e)
+        raise
+    finally:
+        spans.remove(span_id)
+        exporter.export(zipkin_span(name, request_id(), span_id, parent, start, time.time(), **tags))
+
+
+class Exporter:
+    """Write or post spans from a background thread, so that tasks don't wait on them"""
+
+    def __init__(self, file=None, collector=None):
+        self.file = file
+        self.collector = collector
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def export(self, span):
+        if not (self.file or self.collector):
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads don't survive forks, each pool process exports on its own
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='span-exporter', daemon=True).start()
+        self._queue.put(span)
+
+    def _run(self):
+        while True:
+            spans = [self._queue.get()]
+            while len(spans) < BATCH and not self._queue.empty():
+                spans.append(self._queue.get())
+            try:
+                self.write(spans)
+            except Exception as e:
+                logger.warning(f'{len(spans)} spans not exported. {e!r}')
+            finally:
+                for _ in spans:
+                    self._queue.task_done()
+
+    def write(self, spans):
+        if self.file:
+            with open(self.file, 'a') as f:
+                f.write(''.join(f'{json.dumps(span)}\n' for span in spans))
+        if self.collector:
+            requests.post(self.collector, json=spans, timeout=TIMEOUT).raise_for_status()
+
+
+exporter = Exporter(os.getenv('TRACE_FILE'), os.getenv('TRACE_COLLECTOR'))
+
+
+def task_header(request, key):
+    """Header of the task message. Depending on the protocol they are request attributes or kept apart"""
+    value = getattr(request, key, None)
+    if value is None:
+        value = (getattr(request, 'headers', None) or {}).get(key)
+    return value
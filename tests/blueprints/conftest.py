@@ -0,0 +1,21 @@
+import pytest
+
+from slacker.middleware import SlackSignatureMiddleware
+
+
+@pytest.fixture(params=['wsgi', 'aio'])
+def test_app(request, app):
+    """Blueprints must behave the same on both serving modes"""
+    if isinstance(app.wsgi_app, SlackSignatureMiddleware):
+        app.wsgi_app = app.wsgi_app.app  # Avoid validating slack signature
+
+    if request.param == 'aio':
+        return request.getfixturevalue('aio_client')
+    return app.test_client()
+
+
+@pytest.fixture(params=['wsgi', 'aio'])
+def client(request, app):
+    if request.param == 'aio':
+        return request.getfixturevalue('aio_client')
+    return app.test_client()
@@ -1,3 +1,6 @@
+import json
+
+
 def test_index(test_app):
     response = test_app.get('/')
     assert response.status_code == 200
@@ -15,3 +18,15 @@ def test_unsigned_request_fails(client):
         'error': "'Missing required headers'",
         'text': 'Bad request'
     }
+
+
+def test_poll_message_has_a_button_per_option(db, test_app, mocker):
+    send_message = mocker.patch('slacker.blueprints.commands.send_message_async')
+
+    response = test_app.post('/poll', data={'text': 'lunch? pizza sushi tacos', 'channel_id': 'C1'})
+
+    assert response.status_code == 200
+    section, actions = json.loads(send_message.call_args[1]['blocks'])
+    assert section['text']['text'] == '*lunch?*\n1. pizza\n2. sushi\n3. tacos'
+    assert actions['block_id'].isdigit()
+    assert [button['action_id'] for button in actions['elements']] == ['poll_vote:1', 'poll_vote:2', 'poll_vote:3']
@@ -1,7 +1,13 @@
+import datetime as dt
+import subprocess
+import sys
+
 import pytest
+from google.oauth2.credentials import Credentials
 
-from slacker.api.rooms.api import RoomFinder
+from slacker.api.rooms.api import RoomFinder, bsas
 from slacker.api.rooms.locations import get_room_location
+from slacker.api.rooms.login import ApiLogin
 
 
 def test_room_location_second_floor():
@@ -255,3 +261,61 @@ def test_room_location_first_floor(room, expected_map):
     theroom = RoomFinder.get_room_by_name(room)
     map = get_room_location(theroom)
     assert map == expected_map
+
+
+def test_rooms_free_now_are_found_on_freebusy_times():
+    start = bsas.localize(dt.datetime(2019, 8, 19, 9))
+    end = start.replace(hour=20)
+    freebusy = {
+        RoomFinder.TURING: {'busy': [{'start': '2019-08-19T09:00:00-03:00', 'end': '2019-08-19T10:00:00-03:00'}]},
+        RoomFinder.KNUTH: {'busy': [{'start': '2019-08-19T12:00:00Z', 'end': '2019-08-19T13:00:00Z'}]},
+        RoomFinder.BOOLE: {'busy': []},
+    }
+
+    free_rooms = RoomFinder.get_rooms_free_slots(freebusy, start, end)
+
+    assert list(free_rooms) == ['boole']
+    assert [(slot.start, slot.end) for slot in free_rooms['boole']['slots']] == [(start, end)]
+
+
+FREE_SLOTS_WITHOUT_DATEPARSER = """
+import datetime as dt
+import sys
+from slacker.api.rooms.api import RoomFinder, bsas
+
+start = bsas.localize(dt.datetime(2019, 8, 19, 9))
+end = start.replace(hour=12)
+busy = [{'start': '2019-08-19T10:00:00-03:00', 'end': '2019-08-19T11:00:00-03:00'}]
+slots = RoomFinder._get_free_slots(busy, start, end)
+free = RoomFinder.get_rooms_free_slots({RoomFinder.TURING: {'busy': busy}}, start, end, skip_occupied_rooms=False)
+print(len(slots), ' '.join(free), 'dateparser' in sys.modules)
+"""
+
+
+def test_free_slots_are_found_without_importing_dateparser():
+    """dateparser is imported lazily, by --start and --end only. Freebusy times must not need it"""
+    output = subprocess.run([sys.executable, '-c', FREE_SLOTS_WITHOUT_DATEPARSER], stdout=subprocess.PIPE, check=True)
+
+    assert output.stdout.decode().split() == ['2', 'turing', 'False']
+
+
+def test_credentials_are_read_from_the_db_by_any_worker(db, crypto):
+    expiry = dt.datetime.utcnow().replace(microsecond=0) + dt.timedelta(hours=1)
+    credentials = Credentials('token', refresh_token='refresh', token_uri='https://oauth2.googleapis.com/token',
+                              client_id='client', client_secret='secret',
+                              scopes=['https://www.googleapis.com/auth/calendar'])
+    credentials.expiry = expiry
+    ApiLogin.save_credentials(credentials)
+    db.session.remove()  # As another worker would
+
+    saved = ApiLogin.get_credentials()
+
+    assert saved.valid
+    assert (saved.token, saved.refresh_token, saved.expiry) == ('token', 'refresh', expiry)
+    assert (saved.client_id, saved.client_secret) == ('client', 'secret')
+    assert saved.scopes == ['https://www.googleapis.com/auth/calendar']
+
+
+def test_credentials_are_missing_until_authorized(db, crypto):
+    with pytest.raises(ValueError):
+        ApiLogin.get_credentials()
@@ -1,13 +1,23 @@
+import asyncio
+import json
 import logging
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from urllib.parse import urlencode
 
 import pytest
+from aiohttp.test_utils import TestClient, TestServer
 
 
 from _pytest.logging import caplog as _caplog
 from cryptography.fernet import Fernet
 from loguru import logger
+from slacker.aio import create_aio_app
 from slacker.app import create_app
 from slacker.database import db as _db
+from slacker.middleware import SlackSignatureMiddleware
+from slacker.queries import track
+from slacker.registry import registry
 from slacker.security import Crypto
 
 
@@ -21,6 +31,8 @@ def app():
     yield _app
 
     ctx.pop()
+    for command in registry.values():
+        command.reset()
 
 
 @pytest.fixture
@@ -39,7 +51,8 @@ def db(app):
 
 @pytest.fixture
 def test_app(app):
-    app.before_request_funcs = {}  # Avoid validating slack signature
+    if isinstance(app.wsgi_app, SlackSignatureMiddleware):
+        app.wsgi_app = app.wsgi_app.app  # Avoid validating slack signature
     return app.test_client()
 
 
@@ -49,6 +62,95 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture
+def query_budget():
+    """Fail if a block runs more queries than its budget:
+
+        with query_budget(2):
+            test_app.post('/sticker/list')
+    """
+    @contextmanager
+    def budget(queries):
+        with track() as stats:
+            yield stats
+        assert stats.count <= queries, (f'{stats.count} queries over a budget of {queries}:\n' +
+                                        '\n'.join(f'{n} x {statement}' for statement, n in stats.statements.items()))
+
+    return budget
+
+
+@pytest.fixture
+def aio_app(app):
+    """The app on asyncio serving mode.
+
+    Flask runs on the test thread, where the rows added by factories are visible before they are committed.
+    """
+    return create_aio_app(app, executor=InlineExecutor())
+
+
+@pytest.fixture
+def aio_client(aio_app):
+    """A test client for the asyncio serving mode with the interface of the flask test client"""
+    client = AioTestClient(aio_app)
+    yield client
+    client.close()
+
+
+class InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class AioResponse:
+    def __init__(self, status_code, content_type, data):
+        self.status_code = status_code
+        self.content_type = content_type
+        self.data = data
+
+    @property
+    def json(self):
+        return json.loads(self.data) if self.content_type == 'application/json' else None
+
+
+class AioTestClient:
+    def __init__(self, aio_app):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = self.loop.run_until_complete(self._start(aio_app))
+
+    @staticmethod
+    async def _start(aio_app):
+        client = TestClient(TestServer(aio_app))
+        await client.start_server()
+        return client
+
+    def open(self, method, url, data=None, content_type='application/x-www-form-urlencoded', headers=None):
+        headers = dict(headers or {}, **{'Content-Type': content_type})
+        if isinstance(data, dict):
+            data = urlencode(data)
+        return self.loop.run_until_complete(self._request(method, url, data, headers))
+
+    async def _request(self, method, url, data, headers):
+        async with self.client.request(method, url, data=data, headers=headers) as r:
+            return AioResponse(r.status, r.content_type, await r.read())
+
+    def get(self, url, **kwargs):
+        return self.open('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.open('POST', url, **kwargs)
+
+    def close(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+
 @pytest.fixture
 def slack_cli(mocker):
     """A test client for the app."""
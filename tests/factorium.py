@@ -124,3 +124,7 @@ class VoteFactory(BaseFactory):
 class StickerFactory(BaseFactory):
     class Meta:
         model = Sticker
+
+    author = factory.sequence(lambda n: f'U{n}')
+    name = factory.sequence(lambda n: f'sticker{n}')
+    image_url = factory.LazyAttribute(lambda sticker: f'https://i.imgur.com/{sticker.name}.png')
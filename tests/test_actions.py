@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+
+from slacker.blueprints.interactivity import router
+from slacker.deferred import run_action
+
+STICKER = {
+    'type': 'block_actions',
+    'user': {'id': 'U1'},
+    'channel': {'id': 'C1'},
+    'response_url': 'https://hooks.slack.com/actions/1',
+    'actions': [{'action_id': 'send_sticker_action_id:ricardo for', 'value': 'an_url'}],
+}
+PING = {
+    'type': 'block_actions',
+    'user': {'id': 'U1'},
+    'channel': {'id': 'C1'},
+    'actions': [{'block_id': 'ping_block:U1:U2', 'action_id': 'john', 'value': 'YES'}],
+}
+
+
+@pytest.mark.parametrize('action, handler', [
+    (STICKER, 'send_sticker'),
+    (PING, 'ping'),
+    ({'type': 'block_actions', 'actions': [{'action_id': 'poll_vote:2', 'block_id': '1'}]}, 'vote'),
+    ({'type': 'dialog_submission', 'callback_id': 'aws_callback'}, 'aws_submission'),
+])
+def test_actions_are_routed_by_id_prefix(action, handler):
+    assert router.find(action).func.__name__ == handler
+
+
+def test_unknown_actions_are_acked(test_app):
+    action = {'type': 'block_actions', 'actions': [{'action_id': 'unknown', 'block_id': 'unknown'}]}
+
+    assert router.find(action) is None
+    assert test_app.post('/interactive/message_actions', data={'payload': json.dumps(action)}).status_code == 200
+
+
+def test_handler_runs_inline_and_is_timed(test_app, mocker):
+    slack = mocker.patch('slacker.blueprints.interactivity.Slack')
+    handler = router.find(STICKER)
+    labels = {'action': handler.name}
+    runs = REGISTRY.get_sample_value('slacker_action_duration_seconds_count', labels) or 0
+
+    response = test_app.post('/interactive/message_actions', data={'payload': json.dumps(STICKER)})
+
+    assert response.status_code == 200
+    assert slack.chat_postMessage.call_args[1]['channel'] == 'C1'
+    assert REGISTRY.get_sample_value('slacker_action_duration_seconds_count', labels) == runs + 1
+
+
+def test_deferred_handler_runs_on_the_worker(app, test_app, mocker):
+    app.config['DEFERRED_COMMANDS'] = True
+    slack = mocker.patch('slacker.blueprints.interactivity.Slack')
+    run_async = mocker.patch('slacker.actions.run_action_async')
+
+    response = test_app.post('/interactive/message_actions', data={'payload': json.dumps(STICKER)})
+
+    assert response.status_code == 200
+    run_async.assert_called_once_with('slacker.blueprints.interactivity.send_sticker', STICKER)
+    slack.chat_postMessage.assert_not_called()
+
+
+def test_worker_reports_failed_actions(app, mocker):
+    mocker.patch('slacker.deferred._get_app', return_value=app)
+    slack = mocker.patch('slacker.blueprints.interactivity.Slack')
+    slack.chat_postMessage.side_effect = ValueError('slack down')
+    post = mocker.patch('slacker.deferred.requests.post')
+    post.return_value.status_code = 200
+
+    with pytest.raises(ValueError):
+        run_action('slacker.blueprints.interactivity.send_sticker', STICKER)
+
+    assert post.call_args[0][0] == 'https://hooks.slack.com/actions/1'
+    assert post.call_args[1]['json']['text'] == "Something bad happened.\n`ValueError('slack down')`"
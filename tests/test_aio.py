@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlencode
+
+from slacker.aio import wsgi_environ
+from slacker.app_config import CUERVOT_SIGNATURE
+from slacker.deadline import DeadlineExceeded, OUT_OF_TIME_MESSAGE
+from slacker.deferred import WORKING_MESSAGE
+from slacker.middleware import sign
+from slacker.registry import LATE_MESSAGE
+
+
+def signed_post(client, url, body, secret=CUERVOT_SIGNATURE):
+    timestamp = int(time.time())
+    return client.post(url, data=body, headers={
+        'X-Slack-Signature': sign(timestamp, body.encode('utf-8'), secret),
+        'X-Slack-Request-Timestamp': str(timestamp),
+    })
+
+
+async def subte_status(session, deadline=None):
+    return ':check: Los subtes funcionan normalmente'
+
+
+async def broken_api(session, deadline=None):
+    raise ValueError('api down')
+
+
+def test_command_runs_on_the_loop(mocker, aio_client):
+    mocker.patch('slacker.aio.get_subte_async', subte_status)
+
+    response = signed_post(aio_client, '/subte', 'text=')
+
+    assert response.json['text'] == ':check: Los subtes funcionan normalmente'
+
+
+def test_unsigned_command_is_rejected(aio_client):
+    response = aio_client.post('/subte/', data={'text': ''})
+    assert response.json == {'text': 'Bad request', 'error': "'Missing required headers'"}
+
+
+def test_command_errors_are_answered(mocker, aio_client):
+    mocker.patch('slacker.aio.get_subte_async', broken_api)
+
+    response = signed_post(aio_client, '/subte', 'text=')
+
+    assert response.json == {'text': 'Oops ¯\\_(ツ)_/¯. Errors happen', 'error': "ValueError('api down')"}
+
+
+def test_commands_get_the_deadline_of_the_request(app, mocker, aio_client):
+    app.config['COMMAND_DEADLINE'] = 2.5
+    deadlines = []
+
+    async def get_subte(session, deadline=None):
+        deadlines.append(deadline)
+        return ':check: Los subtes funcionan normalmente'
+
+    mocker.patch('slacker.aio.get_subte_async', get_subte)
+
+    signed_post(aio_client, '/subte', 'text=')
+
+    [deadline] = deadlines
+    assert deadline.timeout(5) <= 2.5
+
+
+def test_commands_out_of_time_finish_on_the_loop(app, mocker, aio_app, aio_client):
+    app.config['COMMAND_DEADLINE'] = 0.01
+    responses = []
+
+    async def get_subte(session, deadline=None):
+        await asyncio.sleep(0.02)
+        deadline.timeout(5)
+        return ':check: Los subtes funcionan normalmente'
+
+    async def respond(session, response_url, payload):
+        responses.append(payload)
+
+    mocker.patch('slacker.aio.get_subte_async', get_subte)
+    mocker.patch('slacker.aio.respond', respond)
+
+    response = signed_post(aio_client, '/subte', 'response_url=https%3A%2F%2Fhooks.slack.com%2Fcommands%2F1')
+    aio_client.loop.run_until_complete(asyncio.gather(*aio_app['background']))
+
+    assert response.json == {'text': LATE_MESSAGE, 'response_type': 'ephemeral'}
+    [payload] = responses
+    assert payload['text'] == ':check: Los subtes funcionan normalmente'
+
+
+def test_commands_out_of_time_are_answered(app, mocker, aio_client):
+    app.config['COMMAND_DEADLINE'] = 0.01
+
+    async def get_subte(session, deadline=None):
+        await asyncio.sleep(0.02)
+        raise DeadlineExceeded('No time left for the GET to subte')
+
+    mocker.patch('slacker.aio.get_subte_async', get_subte)
+
+    response = signed_post(aio_client, '/subte', 'text=')
+
+    assert response.json == {'text': OUT_OF_TIME_MESSAGE, 'response_type': 'ephemeral'}
+
+
+def test_deferred_command_is_answered_on_response_url(app, mocker, aio_app, aio_client):
+    app.config['DEFERRED_COMMANDS'] = True
+    mocker.patch('slacker.aio.get_subte_async', subte_status)
+    responses = []
+
+    async def respond(session, response_url, payload):
+        responses.append((response_url, payload))
+
+    mocker.patch('slacker.aio.respond', respond)
+
+    response = signed_post(aio_client, '/subte', 'response_url=https%3A%2F%2Fhooks.slack.com%2Fcommands%2F1')
+    aio_client.loop.run_until_complete(asyncio.gather(*aio_app['background']))
+
+    assert response.json == {'text': WORKING_MESSAGE, 'response_type': 'ephemeral'}
+    [(url, payload)] = responses
+    assert url == 'https://hooks.slack.com/commands/1'
+    assert payload['text'] == ':check: Los subtes funcionan normalmente'
+
+
+def test_signed_requests_reach_flask_once(db, aio_client):
+    response = signed_post(aio_client, '/sticker/add', 'user_id=U1&text=mymeme+https://mymemeurl.com')
+    assert response.json['text'] == 'Sticker `mymeme` saved'
+
+
+def test_sticker_is_sent_with_the_async_client(mocker, aio_app, aio_client):
+    messages = []
+
+    async def chat_post_message(**kwargs):
+        messages.append(kwargs)
+
+    mocker.patch.object(aio_app['slack'], 'chat_postMessage', chat_post_message)
+    action = {
+        'type': 'block_actions',
+        'channel': {'id': 'C1'},
+        'actions': [{'action_id': 'send_sticker_action_id:ricardo for', 'value': 'an_url'}],
+    }
+
+    response = signed_post(aio_client, '/interactive/message_actions', urlencode({'payload': json.dumps(action)}))
+
+    assert response.status_code == 200
+    [message] = messages
+    assert message['channel'] == 'C1'
+    assert message['blocks'][0]['image_url'] == 'an_url'
+
+
+def test_wsgi_environ_keeps_path_query_and_headers(mocker):
+    request = mocker.MagicMock(
+        raw_path='/sticker/send%20it?a=1', method='POST', scheme='http', remote='127.0.0.1',
+        headers={'Content-Type': 'application/x-www-form-urlencoded', 'X-Slack-Signature': 'v0=abc'},
+    )
+    request.url.host, request.url.port = 'localhost', 3000
+    request.version.major, request.version.minor = 1, 1
+
+    environ = wsgi_environ(request, b'text=hi')
+
+    assert environ['PATH_INFO'] == '/sticker/send it'
+    assert environ['QUERY_STRING'] == 'a=1'
+    assert environ['CONTENT_LENGTH'] == '7'
+    assert environ['HTTP_X_SLACK_SIGNATURE'] == 'v0=abc'
+    assert 'HTTP_CONTENT_TYPE' not in environ
+    assert environ['wsgi.input'].read() == b'text=hi'
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+from slacker import gunicorn_conf
+from slacker.app import create_app, reinit_after_fork
+from slacker.database import db
+from slacker.slack_cli import Cuervot, OviBot
+from slacker.worker import celery
+
+LEAN_WORKER = '''
+import sys
+from slacker.app import create_app
+create_app()
+print(' '.join(sorted(sys.modules)))
+'''
+
+
+def test_disabled_blueprints_are_not_served(mocker):
+    mocker.patch('tests.settings.BLUEPRINTS', ['commands', 'stickers'], create=True)
+    app = create_app('tests.settings')
+    app.wsgi_app = getattr(app.wsgi_app, 'app', app.wsgi_app)  # Avoid validating slack signature
+
+    assert set(app.blueprints) == {'commands', 'sticker', 'health', 'metrics'}
+    assert app.test_client().post('/rooms/room_location').json['text'] == 'Resource not found'
+
+
+def test_disabled_blueprints_are_not_imported():
+    env = dict(os.environ, BLUEPRINTS='commands,stickers,interactivity')
+    output = subprocess.run([sys.executable, '-c', LEAN_WORKER], env=env, stdout=subprocess.PIPE, check=True)
+    modules = output.stdout.decode().split()
+
+    assert 'slacker.blueprints.stickers' in modules
+    for heavy in ('slacker.blueprints.rooms', 'slacker.blueprints.ovi_management', 'googleapiclient', 'PIL',
+                  'dateparser', 'bs4'):
+        assert heavy not in modules
+
+
+def test_connections_are_recreated_after_fork(app, mocker):
+    dispose = mocker.patch.object(db.get_engine(app), 'dispose')
+    after_fork = mocker.patch.object(celery, '_after_fork')
+    parent_clients = Cuervot.client, OviBot.client
+
+    reinit_after_fork(app)
+
+    dispose.assert_called_once_with()
+    after_fork.assert_called_once_with()
+    assert Cuervot.client is not parent_clients[0]
+    assert OviBot.client is not parent_clients[1]
+
+
+def test_post_fork_reinits_preloaded_apps(app, mocker):
+    reinit = mocker.patch('slacker.app.reinit_after_fork')
+    server = mocker.MagicMock()
+
+    server.app.callable = None
+    gunicorn_conf.post_fork(server, worker=None)
+    reinit.assert_not_called()
+
+    server.app.callable = app
+    gunicorn_conf.post_fork(server, worker=None)
+    reinit.assert_called_once_with(app)
+
+    server.app.callable = {'flask': app}
+    gunicorn_conf.post_fork(server, worker=None)
+    assert reinit.call_args_list[-1] == mocker.call(app)
@@ -0,0 +1,283 @@
+import asyncio
+import threading
+
+import fakeredis
+import pytest
+
+from slacker import breakers, deadline
+from slacker.breakers import CircuitBreaker, Unavailable, age_note
+from slacker.deadline import DeadlineExceeded
+
+ALERTS = {'entity': []}
+
+
+@pytest.fixture
+def fake_redis(mocker):
+    server = fakeredis.FakeServer()
+    mocker.patch('slacker.breakers.redis.Redis.from_url', lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+    breakers._clients.clear()
+    yield server
+    breakers._clients.clear()
+
+
+@pytest.fixture
+def breaker(fake_redis):
+    return CircuitBreaker('subte', failures=3, cooldown=60, url='redis://breakers')
+
+
+class Api:
+    """Fetch function that answers its payload, or raises while it's down"""
+
+    def __init__(self, payload=ALERTS):
+        self.payload = payload
+        self.down = False
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError('api down')
+        return self.payload
+
+
+class AioApi(Api):
+    """Coroutine function version of Api"""
+
+    async def __call__(self):
+        return super().__call__()
+
+
+class AioResponse:
+    """aiohttp response of a get, answered status and payload"""
+
+    def __init__(self, status, payload):
+        self.status, self.payload = status, payload
+        self.reason = 'Service Unavailable' if status == 503 else 'OK'
+        self.url = 'https://api.test/'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self, content_type=None):
+        return self.payload
+
+
+class AioSession:
+    """aiohttp session whose gets are answered status and payload"""
+
+    def __init__(self, status, payload):
+        self.response = AioResponse(status, payload)
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+def run(coroutine):
+    """Run a coroutine to completion on a loop of its own. asyncio.run is python 3.7+"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def open_breaker(breaker):
+    """Make the api fail until the breaker opens. It had answered once before"""
+    api = Api()
+    breaker.call(api)
+    api.down = True
+    for _ in range(breaker.failures):
+        breaker.call(api)
+    return api
+
+
+def test_good_answers_are_fresh(breaker):
+    assert breaker.call(Api()) == (ALERTS, None)
+
+
+def test_failures_fall_back_on_the_last_good_answer(breaker):
+    api = Api()
+    breaker.call(api)
+    api.down = True
+
+    payload, saved_at = breaker.call(api)
+
+    assert payload == ALERTS
+    assert saved_at is not None
+
+
+def test_failures_without_a_good_answer_raise(breaker):
+    api = Api()
+    api.down = True
+
+    with pytest.raises(Unavailable):
+        breaker.call(api)
+
+
+def test_breaker_opens_after_failures_in_a_row(breaker):
+    api = open_breaker(breaker)
+    calls = api.calls
+
+    payload, saved_at = breaker.call(api)
+
+    assert api.calls == calls, 'The open breaker answers without calling the api'
+    assert payload == ALERTS and saved_at is not None
+
+
+def test_breaker_is_shared_by_every_worker(breaker, fake_redis):
+    api = open_breaker(breaker)
+    other_worker = CircuitBreaker('subte', failures=3, cooldown=60, url='redis://breakers')
+    calls = api.calls
+
+    other_worker.call(api)
+
+    assert api.calls == calls
+
+
+def test_one_call_probes_the_api_after_the_cooldown(breaker, fake_redis):
+    api = open_breaker(breaker)
+    client = breakers.client(breaker.url)
+    client.delete(breaker.keys['open'])  # Cooled down
+    api.down = False
+
+    assert breaker.call(api) == (ALERTS, None)
+    assert client.get(breaker.keys['failures']) is None, 'A good probe closes the breaker'
+
+
+def test_a_failed_probe_opens_the_breaker_again(breaker):
+    api = open_breaker(breaker)
+    client = breakers.client(breaker.url)
+    client.delete(breaker.keys['open'])
+
+    breaker.call(api)
+    calls = api.calls
+    breaker.call(api)
+
+    assert api.calls == calls
+    assert client.exists(breaker.keys['open'])
+
+
+def test_async_calls_go_through_the_breaker(breaker):
+    api = AioApi()
+    assert run(breaker.call_async(api)) == (ALERTS, None)
+    api.down = True
+
+    for _ in range(breaker.failures):
+        payload, saved_at = run(breaker.call_async(api))
+        assert payload == ALERTS and saved_at is not None
+    calls = api.calls
+    run(breaker.call_async(api))
+
+    assert api.calls == calls, 'The open breaker answers without awaiting the api'
+    assert run(breaker.call_async(AioApi())) == (ALERTS, saved_at)
+
+
+def test_async_calls_without_a_good_answer_raise(breaker):
+    api = AioApi()
+    api.down = True
+
+    with pytest.raises(Unavailable):
+        run(breaker.call_async(api))
+
+
+def test_async_calls_reach_redis_off_the_loop(breaker, mocker):
+    client = breakers.client
+    threads = set()
+
+    def recorded_client(url):
+        threads.add(threading.get_ident())
+        return client(url)
+
+    mocker.patch('slacker.breakers.client', recorded_client)
+    api = AioApi()
+    run(breaker.call_async(api))
+    api.down = True
+    run(breaker.call_async(api))
+
+    assert threads and threading.get_ident() not in threads
+
+
+def test_calls_out_of_time_are_not_failures(breaker):
+    api = Api()
+    breaker.call(api)
+
+    with deadline.within(0):
+        payload, saved_at = breaker.call(lambda: deadline.check('GET'))
+
+    assert payload == ALERTS and saved_at is not None
+    assert breakers.client(breaker.url).get(breaker.keys['failures']) is None
+
+
+def test_calls_out_of_time_without_a_good_answer_raise(breaker):
+    with deadline.within(0), pytest.raises(DeadlineExceeded):
+        breaker.call(lambda: deadline.check('GET'))
+
+
+def test_calls_are_made_if_redis_is_down(breaker, fake_redis):
+    fake_redis.connected = False
+    api = Api()
+
+    assert breaker.call(api) == (ALERTS, None)
+    api.down = True
+    with pytest.raises(Unavailable):
+        breaker.call(api)
+
+
+@pytest.mark.parametrize('seconds, note', [
+    (10, 'unos segundos'),
+    (60, '1 minuto'),
+    (150, '2 minutos'),
+    (3 * 3600, '3 horas'),
+    (86400, '1 día'),
+])
+def test_stale_answers_tell_their_age(seconds, note):
+    assert age_note(1000, now=1000 + seconds) == f'\n:warning: _La api no responde. Esto es de hace {note}_'
+    assert age_note(None) == ''
+
+
+def test_subte_answers_with_the_last_alerts_while_down(fake_redis, mocker):
+    from slacker.api.subte import get_subte
+
+    get = mocker.patch('slacker.api.subte.subte.sessions.get')
+    get.return_value.status_code = 200
+    get.return_value.json.return_value = {'entity': []}
+    assert get_subte() == ':check: Los subtes funcionan normalmente'
+
+    get.return_value.status_code = 503
+    assert get_subte().startswith(':check: Los subtes funcionan normalmente\n:warning: _La api no responde')
+
+
+def test_subte_answers_with_the_last_alerts_while_down_on_the_loop(fake_redis):
+    from slacker.api.subte import get_subte_async
+
+    session = AioSession(200, {'entity': []})
+    assert run(get_subte_async(session)) == ':check: Los subtes funcionan normalmente'
+
+    session = AioSession(503, None)
+    assert run(get_subte_async(session)).startswith(
+        ':check: Los subtes funcionan normalmente\n:warning: _La api no responde')
+
+
+def test_feriados_answer_with_the_last_ones_while_down_on_the_loop(fake_redis):
+    from slacker.api.feriados.utils import get_feriados_async
+
+    feriados = [{'motivo': 'Navidad', 'tipo': 'inamovible', 'dia': 25, 'mes': 12, 'id': 'navidad'}]
+    assert run(get_feriados_async(AioSession(200, feriados), 2020)) == (feriados, None)
+
+    stale, saved_at = run(get_feriados_async(AioSession(503, None), 2020))
+    assert stale == feriados and saved_at is not None
+    assert run(get_feriados_async(AioSession(503, None), 2021)) == (None, None)
+
+
+def test_hoypido_answers_with_the_last_menu_while_down_on_the_loop(fake_redis):
+    from slacker.api.hoypido import get_hoypido_async
+
+    menu = [{'active_date': '2020-03-02T00:00:00', 'options': [{'name': 'Milanesa', 'subtype': 'especiales'}]}]
+    fresh = run(get_hoypido_async(AioSession(200, menu), '--all'))
+    assert 'Milanesa' in fresh
+
+    stale = run(get_hoypido_async(AioSession(503, None), '--all'))
+    assert stale.startswith(fresh + '\n:warning: _La api no responde')
@@ -0,0 +1,89 @@
+"""Serve all blueprints from many threads at once, as gthread and gevent workers do"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from slack import WebClient
+
+from slacker.api.rooms.login import get_calendar
+from slacker.models import Sticker
+from slacker.slack_cli import Slack
+from slacker.worker import celery
+
+THREADS = 16
+ROUNDS = 4
+
+
+async def fake_slack_api(self, http_verb, api_url, req_args):
+    """Slack answers users.info with a user built from the requested id"""
+    await asyncio.sleep(0.001)
+    user_id = (req_args['params'] or {}).get('user', 'U0')
+    return {'ok': True, 'user': {'id': user_id, 'profile': {'first_name': user_id}}}
+
+
+@pytest.fixture
+def fake_slack(mocker):
+    mocker.patch.object(WebClient, '_send', fake_slack_api)
+
+
+def slack_requests(n):
+    """Requests of every blueprint. Users and stickers are unique per request number"""
+    user = f'U{n}'
+    ping = {
+        'type': 'block_actions',
+        'user': {'id': user},
+        'channel': {'id': 'C1'},
+        'actions': [{'block_id': f'ping_block:{user}:U0', 'action_id': 'john', 'value': 'YES'}],
+    }
+    return [
+        ('/help', {}),
+        ('/feriados', {}),
+        ('/poll', {'text': 'lunch? pizza sushi', 'channel_id': 'C1'}),
+        ('/retro/start_sprint', {'text': 'sprint', 'user_id': user}),
+        ('/sticker/add', {'text': f'meme{n} https://i.imgur.com/{n}.png', 'user_id': user}),
+        ('/sticker/list', {}),
+        ('/interactive/message_actions', {'payload': json.dumps(ping)}),
+        ('/ovi/my_vms', {'user_id': user}),
+        ('/rooms/request_user_consent', {}),
+        ('/rooms/room_location', {'text': 'nowhere', 'channel_id': 'C1'}),
+    ]
+
+
+def test_blueprints_serve_concurrent_requests(app, db, fake_slack, mocker):
+    mocker.patch('slacker.blueprints.commands.get_feriadosarg', return_value='No hay más feriados este año')
+    mocker.patch.object(celery, 'send_task')
+    app.wsgi_app = getattr(app.wsgi_app, 'app', app.wsgi_app)  # Avoid validating slack signature
+
+    def serve(n):
+        client = app.test_client()
+        return [(url, client.post(url, data=form)) for url, form in slack_requests(n)]
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = [r for responses in pool.map(serve, range(THREADS * ROUNDS)) for r in responses]
+
+    failed = [(url, r.status_code, r.data) for url, r in results if r.status_code != 200 or b'Oops' in r.data]
+    assert not failed
+    assert db.session.query(Sticker).count() == THREADS * ROUNDS
+
+
+def test_slack_client_is_not_shared_between_threads(fake_slack):
+    clients = set()
+
+    def call_slack(n):
+        assert Slack.users_info(user=f'U{n}')['user']['id'] == f'U{n}'
+        clients.add((threading.get_ident(), id(Slack.client)))
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(call_slack, range(THREADS * ROUNDS)))
+
+    threads = {thread for thread, _ in clients}
+    assert len(clients) == len(threads)
+
+
+def test_authorization_url_is_safe_to_share(mocker):
+    with ThreadPoolExecutor(THREADS) as pool:
+        urls = list(pool.map(lambda _: get_calendar().get_authorization_url(), range(THREADS * ROUNDS)))
+
+    assert all(url.startswith('https://accounts.google.com/o/oauth2/auth') for url in urls)
@@ -0,0 +1,116 @@
+import pytest
+import requests
+
+from slacker import deadline
+from slacker.deadline import Deadline, DeadlineExceeded, OUT_OF_TIME_MESSAGE
+from slacker.models.user import User
+from slacker.registry import LATE_MESSAGE
+
+SUBTE = 'slacker.blueprints.commands.get_subte'
+RESPONSE_URL = 'https://hooks.slack.com/commands/1'
+
+
+@pytest.fixture
+def limited(app):
+    app.config['COMMAND_DEADLINE'] = 2.5
+    yield app
+    deadline.clear()
+
+
+def spend_deadline(*args, **kwargs):
+    """A call that times out at the deadline of the request"""
+    deadline.start(-1)
+    raise requests.ReadTimeout()
+
+
+def test_calls_take_the_time_left_if_it_comes_sooner():
+    assert deadline.timeout(5) == 5
+
+    with deadline.within(2):
+        assert 1.9 < deadline.timeout(5) <= 2
+        assert deadline.timeout(1) == 1
+        with deadline.within(10):
+            assert deadline.timeout(5) <= 2, 'The earlier deadline is kept'
+
+        with deadline.within(0), pytest.raises(DeadlineExceeded):
+            deadline.timeout(5)
+
+    assert deadline.remaining() is None
+
+
+def test_deadlines_passed_along_take_the_time_left():
+    assert Deadline().timeout(5) == 5
+
+    limit = Deadline(2)
+    assert 1.9 < limit.timeout(5) <= 2
+    with limit.within():
+        assert deadline.timeout(5) <= 2, 'Blocking calls get it on their thread'
+    assert deadline.remaining() is None
+
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0).timeout(5)
+
+
+def test_requests_get_a_deadline(limited, test_app, mocker):
+    get = mocker.patch('requests.Session.get')
+    get.return_value.status_code = 200
+    get.return_value.json.return_value = {'entity': []}
+
+    test_app.post('/subte')
+
+    assert get.call_args[1]['timeout'] <= 2.5
+    assert deadline.remaining() is None
+
+
+def test_commands_out_of_time_finish_on_the_commands_worker(limited, test_app, mocker):
+    mocker.patch(SUBTE, side_effect=spend_deadline)
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+
+    response = test_app.post('/subte', data={'response_url': RESPONSE_URL})
+
+    assert response.json['text'] == LATE_MESSAGE
+    run_async.assert_called_once_with('slacker.blueprints.commands.subte', {'response_url': RESPONSE_URL})
+
+
+def test_commands_out_of_time_are_not_run_again_unless_idempotent(limited, test_app, mocker):
+    mocker.patch('slacker.blueprints.commands.get_or_create_user', side_effect=spend_deadline)
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+
+    response = test_app.post('/ping', data={'text': '<@U2|pong>', 'user_id': 'U1', 'response_url': RESPONSE_URL})
+
+    assert response.json['text'] == OUT_OF_TIME_MESSAGE
+    run_async.assert_not_called()
+
+
+def test_commands_out_of_time_without_response_url_ask_to_try_again(limited, test_app, mocker):
+    mocker.patch(SUBTE, side_effect=spend_deadline)
+
+    response = test_app.post('/subte')
+
+    assert response.json['text'] == OUT_OF_TIME_MESSAGE
+
+
+def test_errors_within_the_deadline_are_not_hidden(limited, test_app, mocker):
+    mocker.patch(SUBTE, side_effect=ValueError('bad answer'))
+
+    with pytest.raises(ValueError):
+        test_app.post('/subte')
+
+
+def test_queries_fail_fast_once_the_deadline_is_spent(db):
+    with deadline.within(0), pytest.raises(DeadlineExceeded):
+        User.query.all()
+
+    assert User.query.all() == []
+
+
+def test_postgres_transactions_get_a_statement_timeout(mocker):
+    connection = mocker.Mock()
+    connection.dialect.name = 'postgresql'
+
+    with deadline.within(2):
+        deadline._limit_transaction(None, None, connection)
+
+    statement = connection.execute.call_args[0][0]
+    assert statement.startswith('SET LOCAL statement_timeout = ')
+    assert 1900 < int(statement.rsplit(' ', 1)[1]) <= 2000
@@ -0,0 +1,85 @@
+import subprocess
+import sys
+
+from slacker.deferred import run_command, WORKING_MESSAGE, commands
+
+FERIADOS = 'slacker.blueprints.commands.feriados'
+
+HOOKS_WIRED = """
+from celery.signals import task_prerun, worker_init
+import slacker.{module}
+print(len(task_prerun.receivers) + len(worker_init.receivers))
+"""
+
+
+def test_deferrable_commands_are_registered(app):
+    assert FERIADOS in commands
+    assert 'slacker.blueprints.rooms.find' in commands
+
+
+def test_command_runs_inline_if_deferred_mode_is_off(app, test_app, mocker):
+    mocker.patch('slacker.blueprints.commands.get_feriadosarg', return_value='Faltan 3 días')
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+
+    response = test_app.post('/feriados', data={'response_url': 'https://hooks.slack.com/commands/1'})
+
+    assert response.json['text'] == 'Faltan 3 días'
+    run_async.assert_not_called()
+
+
+def test_command_is_deferred(app, test_app, mocker):
+    app.config['DEFERRED_COMMANDS'] = True
+    get_feriados = mocker.patch('slacker.blueprints.commands.get_feriadosarg')
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+
+    form = {'response_url': 'https://hooks.slack.com/commands/1', 'user_id': 'U123'}
+    response = test_app.post('/feriados', data=form)
+
+    assert response.json == {'text': WORKING_MESSAGE, 'response_type': 'ephemeral'}
+    run_async.assert_called_once_with(FERIADOS, form)
+    get_feriados.assert_not_called()
+
+
+def test_command_without_response_url_runs_inline(app, test_app, mocker):
+    app.config['DEFERRED_COMMANDS'] = True
+    mocker.patch('slacker.blueprints.commands.get_feriadosarg', return_value='No hay más feriados este año')
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+
+    response = test_app.post('/feriados')
+
+    assert response.json['text'] == 'No hay más feriados este año'
+    run_async.assert_not_called()
+
+
+def test_worker_posts_view_response_to_response_url(app, mocker):
+    mocker.patch('slacker.deferred._get_app', return_value=app)
+    mocker.patch('slacker.blueprints.commands.get_feriadosarg', return_value='Faltan 3 días')
+    post = mocker.patch('slacker.deferred.requests.post')
+    post.return_value.status_code = 200
+
+    run_command(FERIADOS, {'response_url': 'https://hooks.slack.com/commands/1'})
+
+    url = post.call_args[0][0]
+    payload = post.call_args[1]['json']
+    assert url == 'https://hooks.slack.com/commands/1'
+    assert payload['text'] == 'Faltan 3 días'
+
+
+def test_worker_posts_plain_text_responses(app, mocker):
+    mocker.patch('slacker.deferred._get_app', return_value=app)
+    post = mocker.patch('slacker.deferred.requests.post')
+    post.return_value.status_code = 200
+
+    run_command('slacker.blueprints.retroapp.add_team', {'response_url': 'https://hooks.slack.com/commands/1'})
+
+    assert post.call_args[1]['json'] == {'text': 'Bad usage. i.e `/add_team t1 @john @carla`'}
+
+
+def test_only_the_worker_entry_wires_task_hooks():
+    def hooks_wired_by(module):
+        output = subprocess.run([sys.executable, '-c', HOOKS_WIRED.format(module=module)], stdout=subprocess.PIPE,
+                                check=True)
+        return int(output.stdout.decode().split()[-1])
+
+    assert hooks_wired_by('deferred') == 0
+    assert hooks_wired_by('commands_worker') > 0
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from slacker.app_config import SLACK_API_URL
+from slacker.health import readiness, probe_db, probe_slack, DependencyDown, TIMEOUT
+
+
+@pytest.fixture
+def probes(mocker):
+    """Mocked probes, all up"""
+    mocks = {name: mocker.Mock(__name__=f'probe_{name}') for name in ('db', 'redis', 'slack')}
+    mocker.patch.object(readiness, 'probes', [(name, mocks[name], name != 'slack') for name in mocks])
+    readiness._checked_at = None
+    yield mocks
+    readiness._checked_at = None
+
+
+def test_healthz_is_not_signed(client):
+    response = client.get('/healthz')
+
+    assert response.status_code == 200
+    assert response.json == {'status': 'ok'}
+
+
+def test_commands_are_still_signed(client):
+    assert client.post('/subte').json['error'] == "'Missing required headers'"
+
+
+def test_ready_reports_latency_of_each_dependency(client, probes):
+    response = client.get('/readyz')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'ok'
+    assert set(response.json['checks']) == {'db', 'redis', 'slack'}
+    assert all(check['ok'] and check['latency_ms'] >= 0 for check in response.json['checks'].values())
+
+
+def test_not_ready_if_a_critical_dependency_is_down(client, probes):
+    probes['db'].side_effect = DependencyDown('Pool exhausted')
+
+    response = client.get('/readyz')
+
+    assert response.status_code == 503
+    assert response.json['checks']['db'] == {
+        'ok': False, 'error': "DependencyDown('Pool exhausted')",
+        'latency_ms': response.json['checks']['db']['latency_ms'], 'critical': True,
+    }
+
+
+def test_ready_without_slack(client, probes):
+    probes['slack'].side_effect = DependencyDown('invalid_auth')
+
+    response = client.get('/readyz')
+
+    assert response.status_code == 200
+    assert response.json['checks']['slack']['ok'] is False
+
+
+def test_probes_are_cached(client, probes, mocker):
+    clock = mocker.patch('slacker.health.time.monotonic', return_value=100)
+    for _ in range(3):
+        client.get('/readyz')
+    assert probes['db'].call_count == 1
+
+    clock.return_value = 106
+    assert client.get('/readyz').status_code == 200
+    assert probes['db'].call_count == 2
+
+
+def test_db_probe(db):
+    probe_db()
+
+
+def test_db_probe_gives_up_on_a_hung_db(app, mocker):
+    mocker.patch('slacker.health.select_one', side_effect=lambda: time.sleep(TIMEOUT + 1))
+
+    start = time.perf_counter()
+    with app.app_context(), pytest.raises(DependencyDown, match='No answer'):
+        probe_db()
+
+    assert time.perf_counter() - start < TIMEOUT + 0.5
+
+
+def test_slack_probe_calls_the_configured_api(app, mocker):
+    post = mocker.patch('slacker.health.requests.post')
+    post.return_value.json.return_value = {'ok': True}
+
+    with app.app_context():
+        probe_slack()
+
+    assert post.call_args[0][0] == f'{SLACK_API_URL}auth.test', 'Load tests point SLACK_API_URL to a stand-in'
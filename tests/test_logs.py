@@ -0,0 +1,43 @@
+import pytest
+from loguru import logger
+
+from slacker import logs
+
+
+@pytest.fixture
+def lines():
+    lines = []
+    yield lines
+    logs.configure()
+
+
+def test_debug_lines_are_sampled_per_call_site(lines):
+    logs.configure('DEBUG', debug_sample=3, sink=lines.append, enqueue=False)
+
+    for i in range(7):
+        logger.debug('Chatty {}', i)
+        logger.info('Loud {}', i)
+
+    debug = [line for line in lines if 'Chatty' in line]
+    assert [line.split(' - ')[-1].strip() for line in debug] == ['Chatty 0', 'Chatty 3', 'Chatty 6']
+    assert len([line for line in lines if 'Loud' in line]) == 7
+
+
+def test_records_below_the_level_are_not_formatted(lines):
+    logs.configure('INFO', sink=lines.append, enqueue=False)
+    built = []
+
+    logger.opt(lazy=True).debug('Expensive {}', lambda: built.append(1))
+    logger.opt(lazy=True).info('Cheap {}', lambda: 'args')
+
+    assert built == []
+    assert len(lines) == 1
+    assert 'Cheap args' in lines[0]
+
+
+def test_lines_tell_the_request_id(lines):
+    logs.configure('INFO', sink=lines.append, enqueue=False)
+
+    logger.info('Without request')
+
+    assert ' | - | ' in lines[0]
@@ -0,0 +1,177 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+import celery
+import pytest
+from prometheus_client import REGISTRY
+
+from slacker.deferred import run_command
+from slacker.metrics import QueueLength, instrument_tasks, serve_tasks
+from tests.test_aio import signed_post, subte_status
+
+WORKERS_ADDED_UP = """
+import os
+from slacker.metrics import RESPONSES, collector
+
+for _ in range(2):
+    pid = os.fork()
+    if pid == 0:
+        RESPONSES.labels('commands', '/subte', 200).inc()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+print(collector().get_sample_value('slacker_responses_total',
+                                   {'blueprint': 'commands', 'route': '/subte', 'status': '200'}))
+"""
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def responses(blueprint, route, status=200):
+    return sample('slacker_responses_total', blueprint=blueprint, route=route, status=str(status))
+
+
+def test_requests_are_timed_by_route(test_app, mocker):
+    mocker.patch('slacker.blueprints.commands.get_subte', return_value='Subtes ok')
+    before = sample('slacker_request_duration_seconds_count', blueprint='commands', route='/subte')
+    answered = responses('commands', '/subte')
+
+    test_app.post('/subte')
+    test_app.post('/subte')
+
+    assert sample('slacker_request_duration_seconds_count', blueprint='commands', route='/subte') == before + 2
+    assert responses('commands', '/subte') == answered + 2
+    assert sample('slacker_requests_in_flight', blueprint='commands', route='/subte') == 0
+
+
+def test_routes_with_and_without_slash_are_the_same(db, test_app):
+    listed = responses('sticker', '/sticker/list')
+
+    test_app.post('/sticker/list')
+    test_app.post('/sticker/list/')
+
+    assert responses('sticker', '/sticker/list') == listed + 2
+
+
+def test_unknown_routes_are_counted_together(test_app):
+    # Errors are answered as 200, so that slack shows them
+    not_found = responses('', '<unmatched>')
+
+    test_app.get('/nope')
+    test_app.get('/wp-admin')
+
+    assert responses('', '<unmatched>') == not_found + 2
+
+
+def test_signature_rejections_are_counted(client):
+    rejections = sample('slacker_signature_rejections_total', reason='Missing required headers')
+
+    client.post('/subte')
+
+    assert sample('slacker_signature_rejections_total', reason='Missing required headers') == rejections + 1
+
+
+def test_metrics_are_served_unsigned(client):
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    assert b'slacker_request_duration_seconds_bucket' in response.data
+
+
+def test_coroutine_routes_are_timed_once(aio_client, mocker):
+    mocker.patch('slacker.aio.get_subte_async', subte_status)
+    answered = responses('commands', '/subte')
+
+    signed_post(aio_client, '/subte', 'text=')
+
+    assert responses('commands', '/subte') == answered + 1
+
+
+def test_interactions_left_to_flask_are_timed_once(aio_client, mocker):
+    action = {'type': 'block_actions', 'actions': [{'action_id': 'unknown', 'block_id': 'unknown'}]}
+    answered = responses('interactive', '/interactive/message_actions')
+
+    signed_post(aio_client, '/interactive/message_actions', urlencode({'payload': json.dumps(action)}))
+
+    assert responses('interactive', '/interactive/message_actions') == answered + 1
+
+
+def test_workers_are_added_up(tmp_path):
+    env = dict(os.environ, prometheus_multiproc_dir=str(tmp_path))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    output = subprocess.run([sys.executable, '-c', WORKERS_ADDED_UP], env=env, stdout=subprocess.PIPE, check=True)
+
+    assert output.stdout.decode().split()[-1] == '2.0'
+
+
+@pytest.fixture
+def commands_worker(app, mocker):
+    mocker.patch('slacker.deferred._get_app', return_value=app)
+    mocker.patch('slacker.deferred.respond')
+    instrument_tasks()
+
+    def fail():
+        raise ValueError('Api down')
+
+    mocker.patch.dict('slacker.deferred.commands', {'ping': lambda: 'pong', 'fail': fail})
+
+
+def test_tasks_are_timed_from_their_publish_time(commands_worker):
+    task = 'commands.run_command ping'
+    waited = sample('slacker_task_queue_wait_seconds_count', task=task, queue='')
+    ran = sample('slacker_task_runtime_seconds_count', task=task, state='SUCCESS')
+
+    run_command.apply(args=('ping', {'response_url': 'https://hooks.slack.com/commands/1'}),
+                      headers={'published_at': time.time() - 2})
+
+    assert sample('slacker_task_queue_wait_seconds_count', task=task, queue='') == waited + 1
+    assert sample('slacker_task_queue_wait_seconds_bucket', task=task, queue='', le='1.0') == 0
+    assert sample('slacker_task_runtime_seconds_count', task=task, state='SUCCESS') == ran + 1
+
+
+def test_task_failures_are_counted(commands_worker):
+    task = 'commands.run_command fail'
+    failed = sample('slacker_task_failures_total', task=task, exception='ValueError')
+
+    run_command.apply(args=('fail', {'response_url': 'https://hooks.slack.com/commands/1'}))
+
+    assert sample('slacker_task_failures_total', task=task, exception='ValueError') == failed + 1
+    assert sample('slacker_task_runtime_seconds_count', task=task, state='FAILURE') >= 1
+
+
+def test_queue_length_is_read_from_the_broker():
+    app = celery.Celery('queues', broker='memory://')
+    for _ in range(3):
+        app.send_task('queued')
+
+    [gauge] = QueueLength(app, ['celery', 'commands']).collect()
+
+    assert {sample.labels['queue']: sample.value for sample in gauge.samples} == {'celery': 3, 'commands': 0}
+
+
+def test_worker_empties_only_its_own_metrics_dir(tmp_path, mocker):
+    from celery.signals import worker_init, worker_process_shutdown
+
+    mocker.patch('slacker.metrics.start_http_server')
+    mocker.patch('slacker.metrics.collector')
+    web, worker = tmp_path / 'web', tmp_path / 'worker'
+    for directory in (web, worker):
+        directory.mkdir()
+        (directory / 'counter_1.db').write_bytes(b'')
+
+    serve_tasks(9102, str(worker))
+    try:
+        worker_init.send(sender=mocker.MagicMock())
+    finally:
+        worker_init.disconnect(dispatch_uid='slacker.metrics')
+        worker_process_shutdown.disconnect(dispatch_uid='slacker.metrics')
+
+    assert os.listdir(web) == ['counter_1.db']
+    assert os.listdir(worker) == []
@@ -0,0 +1,104 @@
+import time
+
+import fakeredis
+import pytest
+
+from slacker.app_config import CUERVOT_SIGNATURE, OVIBOT_SIGNATURE
+from slacker.middleware import sign, verify_signature, ReplayCache, MAX_BODY_SIZE
+
+
+def signed_post(client, url, body, secret=CUERVOT_SIGNATURE, timestamp=None):
+    timestamp = timestamp or int(time.time())
+    return client.post(url, data=body, content_type='application/x-www-form-urlencoded', headers={
+        'X-Slack-Signature': sign(timestamp, body.encode('utf-8'), secret),
+        'X-Slack-Request-Timestamp': str(timestamp),
+    })
+
+
+def test_verify_signature():
+    body = b'token=abc&command=/poll&text=why%3F+yes+no'
+    signature = sign(1531420618, body, 'secret')
+    assert verify_signature(1531420618, body, signature, 'secret')
+    assert not verify_signature(1531420618, body, signature, 'another secret')
+    assert not verify_signature(1531420619, body, signature, 'secret')
+
+
+def test_signed_request_reaches_the_app(client):
+    response = signed_post(client, '/', 'text=hi')
+    assert response.json == {'error': 'You must specify a command route.'}
+
+
+def test_body_is_readable_after_verification(db, client):
+    response = signed_post(client, '/sticker/add', 'user_id=U1&text=mymeme+https://mymemeurl.com')
+    assert response.json['text'] == 'Sticker `mymeme` saved'
+
+
+@pytest.mark.parametrize('url, secret', [
+    ('/ovi/', OVIBOT_SIGNATURE),
+    ('/sticker/list', CUERVOT_SIGNATURE),
+])
+def test_secret_is_chosen_by_route(client, url, secret):
+    other_secret = CUERVOT_SIGNATURE if secret == OVIBOT_SIGNATURE else OVIBOT_SIGNATURE
+
+    response = signed_post(client, url, 'text=hi', secret=other_secret)
+
+    assert response.json['error'] == "'Failed request authenticity check. You are not slack..'"
+
+
+def test_old_request_is_rejected(client):
+    response = signed_post(client, '/', 'text=hi', timestamp=int(time.time()) - 60 * 5)
+    assert response.json == {'text': 'Bad request', 'error': "'Request too old'"}
+
+
+def test_big_request_is_rejected(client):
+    response = signed_post(client, '/', 'text=' + 'a' * MAX_BODY_SIZE)
+    assert response.json == {'text': 'Bad request', 'error': "'Request too large'"}
+
+
+def test_replayed_request_is_dropped(client):
+    timestamp = int(time.time())
+    first = signed_post(client, '/', 'text=hi', timestamp=timestamp)
+    replayed = signed_post(client, '/', 'text=hi', timestamp=timestamp)
+
+    assert first.json == {'error': 'You must specify a command route.'}
+    assert replayed.status_code == 200
+    assert replayed.data == b''
+
+
+def test_replay_cache_forgets_expired_signatures():
+    cache = ReplayCache(ttl=10)
+    assert cache.add('v0=abc', now=100)
+    assert not cache.add('v0=abc', now=105)
+    assert cache.add('v0=abc', now=111)
+
+
+def test_replay_cache_is_bounded():
+    cache = ReplayCache(maxsize=2)
+    for signature in ('v0=a', 'v0=b', 'v0=c'):
+        cache.add(signature)
+
+    assert 'v0=a' not in cache
+    assert 'v0=c' in cache
+
+
+@pytest.fixture
+def fake_redis(mocker):
+    server = fakeredis.FakeServer()
+    mocker.patch('slacker.middleware.redis.Redis.from_url', lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+    return server
+
+
+def test_replays_are_shared_by_every_worker(fake_redis):
+    worker, another_worker = ReplayCache('redis://replays'), ReplayCache('redis://replays')
+
+    assert worker.add('v0=abc')
+    assert not another_worker.add('v0=abc')
+    assert another_worker.add('v0=def')
+
+
+def test_replays_are_checked_on_each_worker_while_redis_is_down(fake_redis):
+    cache = ReplayCache('redis://replays')
+    fake_redis.connected = False
+
+    assert cache.add('v0=abc')
+    assert not cache.add('v0=abc')
@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+from celery.signals import task_prerun, task_postrun
+
+from slacker.deferred import run_command
+from slacker.profiler import Sampler, profile_requests, profile_tasks, sampler
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def slow_subte():
+    spin(0.1)
+    return 'Subtes ok'
+
+
+@pytest.fixture
+def task_profiles(tmp_path):
+    profile_tasks(0.05, str(tmp_path))
+    yield tmp_path
+    task_prerun.disconnect(dispatch_uid='slacker.profiler')
+    task_postrun.disconnect(dispatch_uid='slacker.profiler')
+
+
+def test_samples_are_collapsed_stacks():
+    profiler = Sampler(interval=0.001)
+
+    profile = profiler.stop(spin_profiled(profiler))
+
+    assert profile.samples > 10
+    hottest = profile.collapsed().splitlines()[0]
+    assert 'spin_profiled (test_profiler.py' in hottest
+    assert hottest.split(';')[-1].startswith('spin (test_profiler.py:')
+
+
+def spin_profiled(profiler):
+    profile = profiler.start()
+    spin(0.1)
+    return profile
+
+
+def test_slow_requests_are_written_with_route_and_user(app, test_app, mocker, tmp_path):
+    mocker.patch('slacker.blueprints.commands.get_subte', side_effect=slow_subte)
+    profile_requests(app, 0.05, str(tmp_path))
+
+    test_app.post('/subte', data={'user_id': 'U123'})
+
+    [name] = os.listdir(tmp_path)
+    assert '_subte_U123_' in name and name.endswith('ms.collapsed')
+    assert 'slow_subte' in (tmp_path / name).read_text()
+
+
+def test_fast_requests_are_dropped(app, test_app, mocker, tmp_path):
+    mocker.patch('slacker.blueprints.commands.get_subte', return_value='Subtes ok')
+    profile_requests(app, 1, str(tmp_path))
+
+    test_app.post('/subte', data={'user_id': 'U123'})
+
+    assert os.listdir(tmp_path) == []
+    assert not sampler._active.is_set()
+
+
+def test_disabled_by_default(app):
+    assert 'start' not in [f.__name__ for f in app.before_request_funcs.get(None, [])]
+
+
+def test_slow_tasks_are_written_with_command_and_user(app, mocker, task_profiles):
+    mocker.patch('slacker.deferred._get_app', return_value=app)
+    mocker.patch.dict('slacker.deferred.commands', {'slow': slow_subte})
+    mocker.patch('slacker.deferred.respond')
+
+    run_command.apply(args=('slow', {'user_id': 'U9', 'response_url': 'https://hooks.slack.com/commands/1'}))
+
+    [name] = os.listdir(task_profiles)
+    assert '_commands_run_command_slow_U9_' in name
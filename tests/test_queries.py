@@ -0,0 +1,118 @@
+import json
+
+import factory
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from slacker import deadline
+from slacker.deadline import DeadlineExceeded
+from slacker.models.poll import Poll
+from slacker.queries import track, report
+from tests.factorium import OptionFactory, PollFactory, VoteFactory, StickerFactory, UserFactory, SprintFactory
+
+
+def poll_with_votes(db, options=6):
+    poll = PollFactory(question='lunch', options=[OptionFactory(number=n, text=f'option {n}') for n in range(options)])
+    for option in poll.options:
+        VoteFactory(poll=poll, option=option, user_id=f'U{option.number}')
+    db.session.commit()
+    return poll
+
+
+def stickers(db, n):
+    StickerFactory.create_batch(n, author='U1', name=factory.sequence(lambda n: f'sticker{n}'),
+                                image_url='https://i.imgur.com/sticker.png')
+    db.session.commit()
+
+
+def test_queries_are_counted(db):
+    poll_id = poll_with_votes(db).id
+    db.session.expire_all()
+
+    with track() as stats:
+        str(Poll.query.get(poll_id))
+
+    assert stats.count == 8  # The poll, its options and the votes of each option
+    assert stats.seconds > 0
+    assert stats.repeated(5) == [(next(iter(stats.statements.most_common()))[0], 6)]
+
+
+def test_nested_tracking(db):
+    with track() as outer:
+        Poll.query.all()
+        with track() as inner:
+            Poll.query.all()
+
+    assert (outer.count, inner.count) == (2, 1)
+
+
+def test_repeated_statements_are_warned(db, caplog):
+    poll_id = poll_with_votes(db).id
+    db.session.expire_all()
+
+    with track() as stats:
+        str(Poll.query.get(poll_id))
+    report(stats, '/poll', limit=5)
+
+    assert 'Possible N+1 queries. /poll ran 6 times the statement: SELECT vote.' in caplog.text
+
+
+def test_dev_mode_tells_the_queries(app, db, test_app):
+    app.config['DEBUG'] = True
+    stickers(db, 1)
+
+    response = test_app.post('/sticker/list')
+
+    assert response.headers['X-Query-Count'] == '1'
+    assert response.headers['X-Query-Time'].endswith('ms')
+
+
+def test_query_headers_are_dev_only(db, test_app):
+    assert 'X-Query-Count' not in test_app.post('/sticker/list').headers
+
+
+def test_list_stickers_budget(db, test_app, query_budget):
+    stickers(db, 20)
+
+    with query_budget(1):
+        test_app.post('/sticker/list')
+
+
+def test_show_retro_items_budget(db, test_app, query_budget):
+    user = UserFactory(user_id='U1')
+    SprintFactory(team=user.team)
+    db.session.commit()
+
+    with query_budget(4):
+        test_app.post('/retro/show_items', data={'user_id': 'U1'})
+
+
+def test_vote_budget(db, test_app, query_budget, mocker):
+    mocker.patch('slacker.blueprints.interactivity.Slack')
+    mocker.patch('slacker.blueprints.interactivity.send_ephemeral_reply_async')
+    poll = poll_with_votes(db)
+    action = {
+        'type': 'block_actions',
+        'user': {'id': 'U99'},
+        'channel': {'id': 'C1'},
+        'message': {'ts': '1', 'blocks': [{'text': {'text': ''}}]},
+        'actions': [{'action_id': 'poll_vote:1', 'block_id': str(poll.id), 'value': '1'}],
+    }
+
+    # The poll text lazy loads the votes of each option
+    with query_budget(12):
+        test_app.post('/interactive/message_actions', data={'payload': json.dumps(action)})
+
+
+def test_failed_queries_are_not_counted(db):
+    with db.engine.connect() as connection, track() as stats:
+        with deadline.within(0), pytest.raises(DeadlineExceeded):
+            connection.execute('SELECT 1')
+        with pytest.raises(OperationalError):
+            connection.execute('SELECT * FROM missing_table')
+
+        assert not connection.info.get('query_start')
+        connection.execute('SELECT 1')
+
+    assert stats.count == 1
+    assert stats.statements == {'SELECT 1': 1}
@@ -0,0 +1,91 @@
+import fakeredis
+import pytest
+
+from slacker.ratelimit import limiter, parse_limits, Limit
+
+FIND = '/rooms/find_free_rooms'
+
+
+@pytest.fixture
+def fake_redis(app, mocker):
+    app.config['REDIS_URL'] = 'redis://limits'
+    server = fakeredis.FakeServer()
+    mocker.patch('slacker.ratelimit.redis.Redis.from_url', lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+    limiter._scripts.clear()
+    yield server
+    limiter._scripts.clear()
+
+
+@pytest.fixture
+def rooms(mocker):
+    return mocker.patch('slacker.blueprints.rooms.find_free_rooms', return_value='Available rooms: turing')
+
+
+def find_rooms(test_app, user='U1', text=''):
+    """Text of the answer. Rooms are answered as plain text and throttled requests as json"""
+    response = test_app.post(FIND, data={'user_id': user, 'text': text})
+    return response.json['text'] if response.is_json else response.get_data(as_text=True)
+
+
+def test_users_are_throttled_after_their_limit(fake_redis, rooms, test_app):
+    answers = [find_rooms(test_app) for _ in range(4)]
+
+    assert answers[:3] == ['Available rooms: turing'] * 3
+    assert answers[3].startswith('Easy there :snail: `/find_free_rooms` is expensive, you can run it 3 times')
+    assert rooms.call_count == 3
+    assert find_rooms(test_app, user='U2') == 'Available rooms: turing'
+
+
+def test_window_slides(fake_redis, rooms, test_app, mocker):
+    clock = mocker.patch('slacker.ratelimit.time.time', return_value=1000)
+    for _ in range(3):
+        find_rooms(test_app)
+
+    clock.return_value = 1030
+    assert find_rooms(test_app).endswith('Try again in 30 seconds')
+
+    clock.return_value = 1061
+    assert find_rooms(test_app) == 'Available rooms: turing'
+
+
+def test_limit_applies_to_command_args(fake_redis, test_app, mocker):
+    mocker.patch('slacker.blueprints.commands.get_hoypido', side_effect=lambda text: f'Menu {text}')
+
+    assert all(test_app.post('/hoypido', data={'text': f'-d {day}'}).json['text'] == f'Menu -d {day}'
+               for day in 'lmxjv')
+    answers = [test_app.post('/hoypido', data={'text': f'--all {n}'}).json['text'] for n in range(4)]
+    assert answers[3].startswith('Easy there')
+
+
+def test_overrides_keep_the_args_of_the_limit(app, fake_redis, test_app, mocker):
+    app.config['RATE_LIMITS'] = '/hoypido=1/60'
+    mocker.patch('slacker.blueprints.commands.get_hoypido', side_effect=lambda text: f'Menu {text}')
+
+    assert [test_app.post('/hoypido', data={'text': f'-d {day}'}).json['text'] for day in 'lmx'] == [
+        'Menu -d l', 'Menu -d m', 'Menu -d x']
+    answers = [test_app.post('/hoypido', data={'text': f'--all {n}'}).json['text'] for n in range(2)]
+    assert answers[1].startswith('Easy there')
+
+
+def test_limits_are_configurable_per_user(app, fake_redis, rooms, test_app):
+    app.config['RATE_LIMITS'] = '/find_free_rooms=1/60, /find_free_rooms:U2=5/60'
+
+    assert [find_rooms(test_app, 'U1').startswith('Easy') for _ in range(2)] == [False, True]
+    assert not any(find_rooms(test_app, 'U2').startswith('Easy') for _ in range(5))
+
+
+def test_commands_run_if_redis_is_down(app, rooms, test_app):
+    app.config['REDIS_URL'] = 'redis://localhost:1'
+    limiter._scripts.clear()
+
+    assert [find_rooms(test_app) for _ in range(4)] == ['Available rooms: turing'] * 4
+    limiter._scripts.clear()
+
+
+def test_parse_limits():
+    limits = parse_limits('/find_free_rooms=5/60, /ovi_list_vms:U123=10/3600,')
+
+    assert set(limits) == {'/find_free_rooms', '/ovi_list_vms:U123'}
+    assert (limits['/ovi_list_vms:U123'].calls, limits['/ovi_list_vms:U123'].seconds) == (10, 3600)
+    assert Limit(3, 60, args='--all').applies('-d l --all')
+    assert not Limit(3, 60, args='--all').applies('--allergies')
@@ -0,0 +1,99 @@
+import time
+
+from slacker.deferred import WORKING_MESSAGE
+from slacker.registry import registry, MIN_SAMPLES, COOLDOWN
+
+RESPONSE_URL = 'https://hooks.slack.com/commands/1'
+
+
+def test_help_lists_registered_commands_by_section(test_app):
+    text = test_app.post('/help').json['text']
+
+    assert '*General*\n- `/subte` Status of the subway lines' in text
+    assert '- `/find_free_rooms` Rooms free right now' in text
+    assert text.index('*Stickers*') < text.index('*Meta*')
+    assert '- `/skills` Shows this message' in text
+
+
+def test_inline_runs_are_measured(test_app, mocker):
+    mocker.patch('slacker.blueprints.commands.get_feriadosarg', return_value='Faltan 3 días')
+
+    test_app.post('/feriados')
+
+    assert len(registry['/feriados'].latencies) == 1
+
+
+def test_commands_over_budget_are_deferred(app, test_app, mocker):
+    app.config['ADAPTIVE_COMMANDS'] = True
+    get_subte = mocker.patch('slacker.blueprints.commands.get_subte', return_value='Todo normal')
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+    subte = registry['/subte']
+
+    for _ in range(MIN_SAMPLES - 1):
+        subte.record(subte.budget + 1)
+    assert test_app.post('/subte', data={'response_url': RESPONSE_URL}).json['text'] == 'Todo normal'
+
+    response = test_app.post('/subte', data={'response_url': RESPONSE_URL, 'text': 'now'})
+
+    assert response.json == {'text': WORKING_MESSAGE, 'response_type': 'ephemeral'}
+    run_async.assert_called_once_with('slacker.blueprints.commands.subte',
+                                      {'response_url': RESPONSE_URL, 'text': 'now'})
+    get_subte.assert_called_once_with()
+
+
+def test_commands_within_budget_run_inline(app, test_app, mocker):
+    app.config['ADAPTIVE_COMMANDS'] = True
+    mocker.patch('slacker.blueprints.commands.get_subte', return_value='Todo normal')
+    run_async = mocker.patch('slacker.deferred.run_command_async')
+    subte = registry['/subte']
+    for _ in range(MIN_SAMPLES):
+        subte.record(subte.budget / 2)
+
+    response = test_app.post('/subte', data={'response_url': RESPONSE_URL})
+
+    assert response.json['text'] == 'Todo normal'
+    run_async.assert_not_called()
+
+
+def test_deferred_commands_are_measured_again_after_cooldown(app):
+    app.config['ADAPTIVE_COMMANDS'] = True
+    subte = registry['/subte']
+    for _ in range(MIN_SAMPLES):
+        subte.record(subte.budget + 1)
+    assert subte.should_defer(app.config)
+
+    subte.deferred_since = time.monotonic() - COOLDOWN - 1
+
+    assert not subte.should_defer(app.config)
+    assert not subte.latencies
+
+
+def test_commands_without_remote_io_are_never_deferred(app):
+    app.config['DEFERRED_COMMANDS'] = True
+    show_stickers = registry['/show_stickers']
+    for _ in range(MIN_SAMPLES):
+        show_stickers.record(show_stickers.budget + 1)
+
+    assert not show_stickers.should_defer(app.config)
+
+
+def test_cacheable_responses_are_reused_by_command_text(test_app, mocker):
+    get_hoypido = mocker.patch('slacker.blueprints.commands.get_hoypido', side_effect=lambda text: f'Menu {text}')
+
+    first = test_app.post('/hoypido', data={'text': '-d l'})
+    second = test_app.post('/hoypido', data={'text': '-d l'})
+    other_day = test_app.post('/hoypido', data={'text': '-d m'})
+
+    assert first.json == second.json
+    assert other_day.json['text'] == 'Menu -d m'
+    assert get_hoypido.call_count == 2
+
+
+def test_answers_of_a_breaker_that_fell_back_are_not_cached(test_app, mocker):
+    get = mocker.patch('slacker.api.subte.subte.sessions.get')
+    get.return_value.status_code = 503
+
+    answers = [test_app.post('/subte', data={'text': ''}).json['text'] for _ in range(2)]
+
+    assert get.call_count == 2
+    assert answers[0] == answers[1]
@@ -0,0 +1,46 @@
+import json
+
+from slacker.responses import Template, Fragment
+from slacker.utils import sticker_response, command_response
+
+STICKER = {
+    'type': 'image',
+    'title': {'type': 'plain_text', 'text': '{{name}}'},
+    'image_url': '{{url}}',
+}
+
+
+def test_template_fields_are_encoded():
+    template = Template({'blocks': [STICKER], 'ts': '{{ts}}'})
+
+    encoded = template.render(name='say "cheese" </>', url='https://i.imgur.com/1.png', ts=1.5)
+
+    assert json.loads(encoded) == {
+        'blocks': [{
+            'type': 'image',
+            'title': {'type': 'plain_text', 'text': 'say "cheese" </>'},
+            'image_url': 'https://i.imgur.com/1.png',
+        }],
+        'ts': 1.5,
+    }
+
+
+def test_fragments_are_inserted_as_is():
+    template = Template({'elements': '{{buttons}}'})
+    assert template.render(buttons=Fragment(b'[{"type":"button"}]')) == b'{"elements":[{"type":"button"}]}'
+
+
+def test_sticker_response(app):
+    response, status, _ = sticker_response('ricardo', 'https://i.imgur.com/1.png')
+
+    image, actions = response.json['blocks']
+    assert response.json['response_type'] == 'ephemeral'
+    assert image['title']['text'] == image['alt_text'] == 'ricardo'
+    assert actions['elements'][0]['value'] == 'https://i.imgur.com/1.png'
+    assert actions['elements'][0]['action_id'] == 'send_sticker_action_id:ricardo'
+
+
+def test_command_response_extra_fields(app):
+    response, _, _ = command_response('*Stickers*', response_type='ephemeral')
+    assert response.json['response_type'] == 'ephemeral'
+    assert response.json['attachments'][0]['footer'] == 'Cuervot'
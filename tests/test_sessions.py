@@ -0,0 +1,123 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from slacker import deadline, sessions
+from slacker.sessions import Sessions, parse_timeouts
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.calls += 1
+        if server.delay:
+            time.sleep(server.delay)
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    server.calls, server.delay, server.statuses = 0, 0, []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.netloc = f'127.0.0.1:{server.server_address[1]}'
+    server.url = f'http://{server.netloc}/'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pool():
+    pool = Sessions(pool_size=2, retries=2)
+    yield pool
+    pool.close()
+
+
+def opened():
+    return sessions.connections_made['127.0.0.1']
+
+
+def test_calls_reuse_the_connection_of_their_host(server, pool):
+    before = opened()
+    for _ in range(5):
+        assert pool.get(server.url).text == 'ok'
+
+    assert opened() - before == 1
+    assert sessions.stats()['127.0.0.1']['requests'] >= 5
+
+
+def test_failed_gets_are_retried(server, pool, mocker):
+    mocker.patch('slacker.sessions.BACKOFF', 0)
+    server.statuses = [503, 502]
+
+    assert pool.get(server.url).status_code == 200
+    assert server.calls == 3
+
+
+def test_the_last_answer_is_returned_when_retries_run_out(server, pool, mocker):
+    mocker.patch('slacker.sessions.BACKOFF', 0)
+    server.statuses = [503, 503, 503, 503]
+
+    assert pool.get(server.url).status_code == 503
+    assert server.calls == 3
+
+
+def test_host_timeouts_override_the_one_of_the_call(server):
+    server.delay = 0.5
+    pool = Sessions(timeouts='127.0.0.1=0.1')
+
+    start = time.perf_counter()
+    with pytest.raises(requests.ReadTimeout):
+        pool.get(server.url, timeout=5)
+
+    assert time.perf_counter() - start < 0.5
+    assert server.calls == 1, 'Read timeouts are not retried'
+
+
+def test_parse_timeouts():
+    assert parse_timeouts('') == {}
+    assert parse_timeouts('nolaborables.com.ar=2, apitransporte.buenosaires.gob.ar=0.5') == {
+        'nolaborables.com.ar': 2,
+        'apitransporte.buenosaires.gob.ar': 0.5,
+    }
+
+
+def test_forked_workers_open_their_own_connections(server, pool):
+    pool.get(server.url)
+    session = pool.session('http', server.netloc)
+
+    pool.reset()
+
+    assert pool.session('http', server.netloc) is not session
+
+
+@pytest.mark.parametrize('delay', [0.15, 0.3])
+def test_retries_never_outlast_the_deadline(server, delay):
+    server.delay = delay
+    server.statuses = [503] * 10
+    pool = Sessions(retries=10)
+
+    start = time.perf_counter()
+    with deadline.within(0.5):
+        try:
+            assert pool.get(server.url, timeout=5).status_code == 503
+        except requests.ReadTimeout:
+            pass
+
+    assert time.perf_counter() - start < 0.6
+    assert server.calls < 4
+    pool.close()
@@ -0,0 +1,73 @@
+import pytest
+from prometheus_client import REGISTRY
+from slack import WebClient
+from slack.errors import SlackApiError
+
+from slacker import deadline
+from slacker.slack_cli import ThreadLocalClient
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def slack(mocker):
+    """Slack client whose api answers with the fake response"""
+    response = {'data': {'ok': True}, 'headers': {}, 'status_code': 200}
+
+    async def fake_slack_api(self, *, http_verb, api_url, req_args):
+        return response
+
+    mocker.patch.object(WebClient, '_request', fake_slack_api)
+    client = ThreadLocalClient('xoxb-token')
+    client.response = response
+    return client
+
+
+def test_latency_is_measured_by_method(slack):
+    calls = sample('slacker_slack_api_duration_seconds_count', method='chat.postMessage')
+
+    slack.chat_postMessage(channel='C1', text='hi')
+
+    assert sample('slacker_slack_api_duration_seconds_count', method='chat.postMessage') == calls + 1
+
+
+def test_errors_are_counted(slack):
+    slack.response.update(data={'ok': False, 'error': 'channel_not_found'})
+    errors = sample('slacker_slack_api_errors_total', method='chat.update', error='channel_not_found')
+
+    with pytest.raises(SlackApiError):
+        slack.chat_update(channel='C1', ts='1', text='hi')
+
+    assert sample('slacker_slack_api_errors_total', method='chat.update', error='channel_not_found') == errors + 1
+
+
+def test_rate_limits_are_counted_with_their_call_site(slack, caplog):
+    slack.response.update(data={'ok': False, 'error': 'ratelimited'}, headers={'Retry-After': '30'}, status_code=429)
+    limited = sample('slacker_slack_api_rate_limited_total', method='users.info')
+
+    with pytest.raises(SlackApiError):
+        slack.users_info(user='U1')
+
+    assert sample('slacker_slack_api_rate_limited_total', method='users.info') == limited + 1
+    assert sample('slacker_slack_api_retry_after_seconds_bucket', method='users.info', le='30.0') >= 1
+    assert 'Slack rate limited users.info from tests.test_slack_telemetry:' in caplog.text
+    assert 'Retry after 30 seconds' in caplog.text
+
+
+def test_calls_time_out_at_the_deadline_of_the_request(slack, mocker):
+    timeouts = []
+
+    async def fake_slack_api(self, *, http_verb, api_url, req_args):
+        timeouts.append(req_args.get('timeout'))
+        return slack.response
+
+    mocker.patch.object(WebClient, '_request', fake_slack_api)
+
+    with deadline.within(1.5):
+        slack.chat_postMessage(channel='C1', text='hi')
+    slack.chat_postMessage(channel='C1', text='hi')
+
+    assert 1.4 < timeouts[0].total <= 1.5
+    assert timeouts[1] is None
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from celery.signals import task_prerun, task_postrun
+from loguru import logger
+
+from slacker import tracing
+from slacker.deferred import run_command
+from slacker.tasks_proxy import send_message_async
+
+
+@pytest.fixture
+def spans(tmp_path):
+    """Spans exported while the test runs"""
+    path = tmp_path / 'spans.jsonl'
+    tracing.exporter.configure(file=str(path))
+
+    def read():
+        tracing.exporter.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+    yield read
+    tracing.exporter.configure()
+
+
+@pytest.fixture
+def request_ids():
+    """Request ids of the log lines"""
+    ids = []
+    handler_id = logger.add(lambda message: ids.append(message.record['extra']['request_id']))
+    yield ids
+    logger.remove(handler_id)
+
+
+@pytest.fixture
+def send_task(mocker):
+    return mocker.patch('slacker.tasks_proxy.celery.send_task')
+
+
+def test_requests_get_an_id(test_app, mocker, request_ids):
+    mocker.patch('slacker.blueprints.commands.get_subte', side_effect=lambda: logger.info('Checking subtes') or 'Ok')
+
+    response = test_app.post('/subte')
+
+    request_id = response.headers['X-Request-Id']
+    assert len(request_id) == 16
+    assert request_ids and set(request_ids) == {request_id}
+    assert tracing.request_id() is None
+
+
+def test_request_id_is_kept(test_app):
+    assert test_app.post('/', headers={'X-Request-Id': 'abc123'}).headers['X-Request-Id'] == 'abc123'
+
+
+def test_tasks_carry_the_request_id(app, test_app, send_task, spans):
+    app.config['DEFERRED_COMMANDS'] = True
+
+    response = test_app.post('/feriados', data={'response_url': 'https://hooks.slack.com/commands/1'})
+
+    headers = send_task.call_args[1]['headers']
+    assert headers['request_id'] == response.headers['X-Request-Id']
+    enqueue, root = spans()
+    assert headers['parent_span'] == enqueue['id']
+    assert enqueue['name'] == 'enqueue commands.run_command'
+    assert (enqueue['traceId'], enqueue['parentId']) == (root['traceId'], root['id'])
+    assert root['name'] == 'POST /feriados'
+
+
+def test_tasks_sent_outside_requests_start_a_trace(send_task):
+    send_message_async('C1', text='hi')
+
+    assert len(send_task.call_args[1]['headers']['request_id']) == 16
+
+
+def test_worker_traces_tasks(app, mocker, spans, request_ids):
+    mocker.patch('slacker.deferred._get_app', return_value=app)
+    mocker.patch.dict('slacker.deferred.commands', {'ping': lambda: logger.info('Ping') or 'pong'})
+    mocker.patch('slacker.deferred.requests.post').return_value.status_code = 200
+    headers = {'request_id': 'abc123', 'parent_span': 'span1', 'published_at': 1000.0}
+    tracing.trace_tasks()
+
+    try:
+        run_command.apply(args=('ping', {'response_url': 'https://hooks.slack.com/commands/1'}), headers=headers)
+    finally:
+        task_prerun.disconnect(dispatch_uid='slacker.tracing')
+        task_postrun.disconnect(dispatch_uid='slacker.tracing')
+
+    wait, respond, run = spans()
+    assert {span['traceId'] for span in (wait, respond, run)} == {'abc123'}
+    assert (wait['name'], wait['parentId']) == ('queue wait commands.run_command', 'span1')
+    assert wait['timestamp'] == 1000 * 10 ** 6
+    assert (respond['name'], respond['parentId']) == ('slack respond', run['id'])
+    assert run['name'] == 'commands.run_command ping'
+    assert 'abc123' in request_ids
+
+
+def test_spans_are_not_exported_by_default(test_app, mocker):
+    write = mocker.patch.object(tracing.exporter, 'write')
+
+    test_app.post('/')
+
+    write.assert_not_called()